@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compara dois relatórios de benchmark (load_test.py) e destaca regressões
+
+Uso:
+    python benchmarks/compare.py results/base.json results/novo.json --threshold 10
+Retorna código 1 se alguma métrica piorar mais que o limite (%).
+"""
+import sys
+import json
+import argparse
+
+# (caminho da métrica, maior é melhor?)
+METRICS = [
+    (("results", "throughput_rps"), True),
+    (("results", "latency_ms", "p50"), False),
+    (("results", "latency_ms", "p95"), False),
+    (("results", "latency_ms", "p99"), False),
+    (("results", "errors"), False),
+    (("server_rss_mb", "after"), False),
+]
+
+
+def get(report: dict, path):
+    for key in path:
+        if not isinstance(report, dict) or key not in report:
+            return None
+        report = report[key]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara relatórios de benchmark")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Piora máxima tolerada (%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        cand = json.load(f)
+
+    print(f"Baseline: {base.get('commit')}  Candidato: {cand.get('commit')}  Perfil: {cand.get('profile', {}).get('name')}")
+    regressions = 0
+    for path, higher_is_better in METRICS:
+        old, new = get(base, path), get(cand, path)
+        if old is None or new is None:
+            continue
+        change = ((new - old) / old * 100) if old else (0.0 if new == old else float("inf"))
+        worse = -change if higher_is_better else change
+        flag = "❌ REGRESSÃO" if worse > args.threshold else "✅"
+        if worse > args.threshold:
+            regressions += 1
+        print(f"{flag} {'.'.join(path):32} {old:>10} -> {new:>10} ({change:+.1f}%)")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga reprodutível da API contra um Ollama simulado
+
+Sobe o Ollama simulado (benchmarks/mock_ollama.py) e a API (uvicorn) com Redis
+em memória (fakeredis://) ou um Redis informado, reproduz um perfil de tráfego
+(taxa de acerto de cache, concorrência, tamanho do prompt) e grava um JSON com
+throughput, latências p50/p95/p99 e memória do servidor, comparável entre commits.
+
+Uso:
+    python benchmarks/load_test.py --profile cache_hot --output results/cache_hot.json
+    python benchmarks/load_test.py --requests 500 --concurrency 32 --hit-ratio 0.8
+    python benchmarks/load_test.py --target http://localhost:5000   # servidor já em execução
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+BENCHMARKS_DIR = Path(__file__).parent
+PROJECT_ROOT = BENCHMARKS_DIR.parent
+PROFILES_FILE = BENCHMARKS_DIR / "profiles.json"
+
+WORDS = (
+    "pedido entrega prazo pagamento cliente produto estoque relatorio financeiro margem "
+    "receita custo motor oleo revisao garantia suporte sistema erro acesso senha conta "
+    "plano consulta agenda exame resultado codigo funcao classe teste deploy servidor"
+).split()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def process_rss_mb(pid: int) -> Optional[float]:
+    """Memória residente (MB) do processo, via /proc (Linux) ou psutil"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def make_prompt(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + f" #{rng.randrange(10 ** 9)}"
+
+
+def make_conversation(rng: random.Random, profile: dict) -> List[dict]:
+    """
+    Histórico de conversa: mensagem de sistema, `turns - 1` trocas usuário/assistente
+    anteriores e a nova pergunta do usuário (só a pergunta quando turns <= 1)
+    """
+    words = profile["prompt_words"]
+    turns = profile.get("turns", 1)
+    if turns <= 1:
+        return [{"role": "user", "content": make_prompt(rng, words)}]
+    messages = [{"role": "system", "content": profile.get("system_prompt") or make_prompt(rng, words)}]
+    for _ in range(turns - 1):
+        messages.append({"role": "user", "content": make_prompt(rng, words)})
+        messages.append({"role": "assistant", "content": make_prompt(rng, words * 2)})
+    messages.append({"role": "user", "content": make_prompt(rng, words)})
+    return messages
+
+
+def build_workload(profile: dict, seed: int) -> Dict[str, List[List[dict]]]:
+    """Conversas de aquecimento (populares) e sequência medida conforme a taxa de acerto desejada"""
+    rng = random.Random(seed)
+    hot = [make_conversation(rng, profile) for _ in range(profile["hot_prompts"])]
+    sequence = []
+    for _ in range(profile["requests"]):
+        if hot and rng.random() < profile["hit_ratio"]:
+            sequence.append(rng.choice(hot))
+        else:
+            sequence.append(make_conversation(rng, profile))
+    return {"warmup": hot, "sequence": sequence}
+
+
+async def send(session: aiohttp.ClientSession, url: str, messages: List[dict], profile: dict) -> dict:
+    payload = {
+        "model": profile["model"],
+        "messages": messages,
+        "max_tokens": profile["max_tokens"],
+        "temperature": 0.7,
+    }
+    start = time.perf_counter()
+    try:
+        async with session.post(f"{url}/v1/chat/completions", json=payload) as response:
+            body = await response.json()
+            ok = response.status == 200 and "choices" in body
+    except Exception:
+        ok = False
+    return {"latency": time.perf_counter() - start, "ok": ok}
+
+
+async def run_traffic(url: str, workload: Dict[str, List[List[dict]]], profile: dict) -> dict:
+    timeout = aiohttp.ClientTimeout(total=profile.get("timeout", 300))
+    connector = aiohttp.TCPConnector(limit=profile["concurrency"])
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        # Aquecimento: popular o cache com os prompts populares (não medido)
+        for messages in workload["warmup"]:
+            await send(session, url, messages, profile)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for messages in workload["sequence"]:
+            queue.put_nowait(messages)
+        results: List[dict] = []
+
+        async def worker():
+            while True:
+                try:
+                    messages = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results.append(await send(session, url, messages, profile))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(profile["concurrency"])))
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array([r["latency"] for r in results if r["ok"]]) * 1000
+    errors = sum(1 for r in results if not r["ok"])
+    summary = {
+        "requests": len(results),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+    }
+    if len(latencies):
+        summary.update({
+            "latency_ms": {
+                "mean": round(float(latencies.mean()), 2),
+                "p50": round(float(np.percentile(latencies, 50)), 2),
+                "p95": round(float(np.percentile(latencies, 95)), 2),
+                "p99": round(float(np.percentile(latencies, 99)), 2),
+                "max": round(float(latencies.max()), 2),
+            }
+        })
+    return summary
+
+
+def wait_for_http(url: str, timeout: float) -> bool:
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return True
+        except Exception:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def wait_for_startup(url: str, timeout: float) -> bool:
+    """Aguarda todos os componentes da API terminarem de carregar (não medir o modo degradado)"""
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            components = requests.get(f"{url}/health/ready", timeout=2).json().get("components", {})
+            if components and all(c["status"] in ("ready", "failed") for c in components.values()):
+                return True
+        except Exception:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_stack(profile: dict, redis_url: str, startup_timeout: float):
+    """Sobe o Ollama simulado e a API; retorna (url da API, processos)"""
+    mock_port, api_port = free_port(), free_port()
+    mock = subprocess.Popen([
+        sys.executable, str(BENCHMARKS_DIR / "mock_ollama.py"),
+        "--port", str(mock_port),
+        "--token-latency", str(profile["token_latency"]),
+        "--tokens", str(profile["max_tokens"]),
+        "--prompt-latency", str(profile.get("prompt_latency", 0.0)),
+    ])
+
+    env = {
+        **os.environ,
+        "OLLAMA_URL": f"http://127.0.0.1:{mock_port}",
+        "REDIS_URL": redis_url,
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    }
+    env.update({k: str(v) for k, v in profile.get("env", {}).items()})
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.simple_llm_server:app",
+         "--host", "127.0.0.1", "--port", str(api_port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env,
+    )
+
+    url = f"http://127.0.0.1:{api_port}"
+    if not wait_for_http(f"http://127.0.0.1:{mock_port}/api/tags", 30) or not wait_for_startup(url, startup_timeout):
+        for proc in (api, mock):
+            proc.terminate()
+        raise RuntimeError("Falha ao iniciar o Ollama simulado ou a API")
+    return url, [api, mock]
+
+
+def load_profile(args) -> dict:
+    profiles = json.loads(PROFILES_FILE.read_text(encoding="utf-8"))
+    profile = dict(profiles["default"])
+    if args.profile:
+        profile.update(profiles[args.profile])
+    for key in ("requests", "concurrency", "hit_ratio", "prompt_words", "hot_prompts", "turns", "token_latency", "max_tokens", "model"):
+        value = getattr(args, key)
+        if value is not None:
+            profile[key] = value
+    profile["name"] = args.profile or "custom"
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API com Ollama simulado")
+    parser.add_argument("--profile", help=f"Perfil de tráfego definido em {PROFILES_FILE.name}")
+    parser.add_argument("--requests", type=int)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--hit-ratio", dest="hit_ratio", type=float, help="Fração de prompts repetidos (0-1)")
+    parser.add_argument("--prompt-words", dest="prompt_words", type=int)
+    parser.add_argument("--hot-prompts", dest="hot_prompts", type=int)
+    parser.add_argument("--turns", type=int, help="Turnos por conversa (1 = só a pergunta)")
+    parser.add_argument("--token-latency", dest="token_latency", type=float)
+    parser.add_argument("--max-tokens", dest="max_tokens", type=int)
+    parser.add_argument("--model")
+    parser.add_argument("--redis-url", default="fakeredis://", help="Redis usado pela API (padrão: em memória)")
+    parser.add_argument("--target", help="URL de uma API já em execução (não sobe a stack)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    profile = load_profile(args)
+    workload = build_workload(profile, args.seed)
+
+    processes = []
+    url = args.target
+    try:
+        if not url:
+            url, processes = start_stack(profile, args.redis_url, args.startup_timeout)
+
+        rss_before = process_rss_mb(processes[0].pid) if processes else None
+        summary = asyncio.run(run_traffic(url, workload, profile))
+        rss_after = process_rss_mb(processes[0].pid) if processes else None
+    finally:
+        for proc in processes:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "profile": profile,
+        "results": summary,
+        "server_rss_mb": {"before": rss_before, "after": rss_after},
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
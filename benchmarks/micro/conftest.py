@@ -0,0 +1,163 @@
+"""
+Fixtures dos microbenchmarks: embeddings e datasets sintéticos
+
+Nada aqui depende de Redis, Ollama ou do modelo de embeddings reais; o cache
+usa fakeredis e um codificador determinístico, então os números medem apenas
+o código dos caminhos críticos.
+"""
+import os
+import sys
+import random
+import asyncio
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+EMBEDDING_DIM = 384
+CACHE_SIZES = [int(n) for n in os.getenv("BENCH_CACHE_SIZES", "1000,10000,100000").split(",")]
+DOMAIN_COUNTS = [int(n) for n in os.getenv("BENCH_DOMAIN_COUNTS", "1,5,20").split(",")]
+BENCH_MODEL = "deepseek-coder:1.3b"
+PARAPHRASE_SUFFIX = " (reformulado)"
+
+WORDS = (
+    "pedido entrega prazo pagamento cliente produto estoque relatorio financeiro margem "
+    "receita custo motor oleo revisao garantia suporte sistema erro acesso senha conta "
+    "plano consulta agenda exame resultado codigo funcao classe teste deploy servidor "
+    "vendas lucro fluxo caixa imposto nota fiscal boleto cartao juros parcela"
+).split()
+
+
+class SyntheticEncoder:
+    """
+    Substitui o SentenceTransformer: vetor unitário determinístico por texto;
+    a paráfrase (texto + PARAPHRASE_SUFFIX) fica próxima do original (cosseno ~0,999)
+    """
+
+    @staticmethod
+    def _vector(text: str) -> np.ndarray:
+        return np.random.default_rng(zlib.crc32(text.encode())).standard_normal(EMBEDDING_DIM).astype(np.float32)
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        vectors = np.stack([
+            self._vector(text[:-len(PARAPHRASE_SUFFIX)]) + 0.05 * self._vector(text)
+            if text.endswith(PARAPHRASE_SUFFIX) else self._vector(text)
+            for text in batch
+        ])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors[0] if single else vectors
+
+
+def synthetic_prompt(rng: random.Random, index: int, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + f" #{index}"
+
+
+def paraphrase(prompt: str) -> str:
+    """Outro prompt (chave de cache diferente) com o mesmo sentido para o SyntheticEncoder"""
+    return prompt + PARAPHRASE_SUFFIX
+
+
+def synthetic_response(rng: random.Random, index: int) -> str:
+    # Sem o número: is_valid_response recusa respostas com "404", "500"... (índices 404, 500, 1404...)
+    return "Resposta sintética: " + " ".join(rng.choice(WORDS) for _ in range(40))
+
+
+def pytest_collection_modifyitems(items):
+    """Ordena por tamanho para que o cache seja populado de forma incremental"""
+    def size_of(item):
+        callspec = getattr(item, "callspec", None)
+        return callspec.params.get("size", 0) if callspec else 0
+    items.sort(key=size_of)
+
+
+@pytest.fixture(scope="session")
+def event_loop_runner():
+    """Executa corrotinas num loop único (o cliente fakeredis fica preso ao loop)"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def server_module():
+    """Módulo da API com Redis em memória e codificador sintético"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = pytest.importorskip("src.simple_llm_server")
+    from src.metrics import InstrumentedRedis
+
+    original = (server.redis_client, server.redis_records, server.embedding_model)
+    redis_server = fakeredis.FakeServer()
+    server.redis_client = InstrumentedRedis(fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True))
+    server.redis_records = InstrumentedRedis(fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=False))
+    server.embedding_model = SyntheticEncoder()
+    yield server
+    server.redis_client, server.redis_records, server.embedding_model = original
+
+
+@pytest.fixture(scope="session")
+def populated_cache(server_module, event_loop_runner):
+    """Popula o cache até o tamanho pedido (incremental entre tamanhos crescentes)"""
+    state = {"size": 0, "prompts": []}
+    rng = random.Random(42)
+
+    async def fill(target: int):
+        for index in range(state["size"], target):
+            prompt = synthetic_prompt(rng, index)
+            await server_module.cache_response_with_embedding(prompt, BENCH_MODEL, synthetic_response(rng, index))
+            state["prompts"].append(prompt)
+        state["size"] = max(state["size"], target)
+        # cache_response_with_embedding também preenche a camada quente; os benchmarks escolhem a camada
+        server_module.hot_cache.invalidate(everything=True)
+
+    def ensure(size: int):
+        if size < state["size"]:
+            pytest.skip("Tamanhos de cache devem ser executados em ordem crescente")
+        event_loop_runner(fill(size))
+        return state["prompts"][:size]
+
+    return ensure
+
+
+def synthetic_conversations(total: int, domains: int, seed: int = 7):
+    """Dataset sintético no formato de training_data/*.json, dividido entre domínios"""
+    rng = random.Random(seed)
+    conversations = []
+    for index in range(total):
+        domain = f"dominio_{index % domains}"
+        # Vocabulário levemente enviesado por domínio para que o TF-IDF diferencie
+        bias = WORDS[(index % domains) % len(WORDS)]
+        conversations.append({
+            "input": f"{bias} {synthetic_prompt(rng, index)}",
+            "output": synthetic_response(rng, index),
+            "domain": domain,
+        })
+    return conversations
+
+
+@pytest.fixture(scope="session")
+def trained_fine_tuner():
+    """SimplifiedFineTuner treinado com dados sintéticos, memorizado por (tamanho, domínios)"""
+    from src.fine_tuning.real_fine_tuning import SimplifiedFineTuner
+
+    trained = {}
+
+    def build(total: int, domains: int) -> SimplifiedFineTuner:
+        key = (total, domains)
+        if key not in trained:
+            tuner = SimplifiedFineTuner()
+            inputs, outputs, labels = tuner.prepare_training_data(synthetic_conversations(total, domains))
+            tuner.trained_data = list(zip(inputs, outputs, labels))
+            tuner.vectorizer.fit(inputs)
+            tuner.train_domain_specific_models(inputs, outputs, labels)
+            tuner.is_trained = True
+            trained.clear()  # Mantém só um modelo grande em memória
+            trained[key] = tuner
+        return trained[key]
+
+    return build
@@ -0,0 +1,22 @@
+"""
+Microbenchmarks de SimplifiedFineTuner.predict por tamanho de dataset e número de domínios
+"""
+import random
+
+import pytest
+
+from conftest import CACHE_SIZES, DOMAIN_COUNTS, synthetic_prompt
+
+
+@pytest.mark.parametrize("domains", DOMAIN_COUNTS)
+@pytest.mark.parametrize("size", sorted(CACHE_SIZES))
+def test_fine_tuner_predict(benchmark, trained_fine_tuner, size, domains):
+    tuner = trained_fine_tuner(size, domains)
+    benchmark.group = f"fine_tuner_predict[{size}]"
+    rng = random.Random(size + domains)
+
+    def predict():
+        return tuner.predict(synthetic_prompt(rng, rng.randrange(size)), top_k=1)
+
+    results = benchmark.pedantic(predict, rounds=30, iterations=1, warmup_rounds=2)
+    assert results
@@ -0,0 +1,87 @@
+"""
+Microbenchmarks do cache semântico (find_similar_cached_response e
+cache_response_with_embedding) para 1k/10k/100k entradas
+"""
+import random
+
+import pytest
+
+from conftest import CACHE_SIZES, BENCH_MODEL, paraphrase, synthetic_prompt, synthetic_response
+
+
+def rounds_for(size: int) -> int:
+    """Menos rodadas para caches grandes (cada busca varre todas as entradas)"""
+    return max(3, min(50, 100_000 // size))
+
+
+@pytest.mark.parametrize("size", sorted(CACHE_SIZES))
+def test_find_similar_hit(benchmark, server_module, populated_cache, event_loop_runner, size):
+    """Acerto semântico: paráfrase (outra chave) com a camada quente vazia a cada rodada"""
+    prompts = populated_cache(size)
+    benchmark.group = f"find_similar[{size}]"
+    rng = random.Random(size)
+    searches = server_module.semantic_index.searches
+    chosen = []
+
+    def clear_hot():
+        server_module.hot_cache.invalidate(everything=True)
+
+    def lookup():
+        chosen[:] = [rng.choice(prompts)]
+        return event_loop_runner(server_module.find_similar_cached_response(paraphrase(chosen[0]), BENCH_MODEL))
+
+    result = benchmark.pedantic(lookup, setup=clear_hot, rounds=rounds_for(size), iterations=1, warmup_rounds=1)
+    assert result is not None
+    # A última busca (com a camada quente vazia) passou pelo índice e caiu na entrada do prompt original
+    # Vale também com --benchmark-disable, que roda o corpo uma única vez
+    assert server_module.semantic_index.searches > searches
+    original_key = server_module.get_cache_key(chosen[0], BENCH_MODEL, server_module.param_bucket(0.7, 512))
+    assert server_module.hot_cache.get_response(original_key) == result
+
+
+@pytest.mark.parametrize("size", sorted(CACHE_SIZES))
+def test_find_similar_hot_hit(benchmark, server_module, populated_cache, event_loop_runner, size):
+    """Acerto na camada quente: o mesmo prompt já respondido neste processo"""
+    prompts = populated_cache(size)
+    benchmark.group = f"find_similar[{size}]"
+    rng = random.Random(size * 7)
+    chosen = []
+
+    def warm():
+        chosen[:] = [rng.choice(prompts)]
+        event_loop_runner(server_module.find_similar_cached_response(chosen[0], BENCH_MODEL))
+
+    def lookup():
+        return event_loop_runner(server_module.find_similar_cached_response(chosen[0], BENCH_MODEL))
+
+    result = benchmark.pedantic(lookup, setup=warm, rounds=rounds_for(size), iterations=1, warmup_rounds=1)
+    assert result is not None
+
+
+@pytest.mark.parametrize("size", sorted(CACHE_SIZES))
+def test_find_similar_miss(benchmark, server_module, populated_cache, event_loop_runner, size):
+    populated_cache(size)
+    benchmark.group = f"find_similar[{size}]"
+    rng = random.Random(-size)
+
+    def lookup():
+        prompt = synthetic_prompt(rng, rng.randrange(10 ** 9), words=20)
+        return event_loop_runner(server_module.find_similar_cached_response(prompt, BENCH_MODEL))
+
+    result = benchmark.pedantic(lookup, rounds=rounds_for(size), iterations=1, warmup_rounds=1)
+    assert result is None
+
+
+@pytest.mark.parametrize("size", sorted(CACHE_SIZES))
+def test_cache_response_with_embedding(benchmark, server_module, populated_cache, event_loop_runner, size):
+    populated_cache(size)
+    benchmark.group = f"cache_response[{size}]"
+    rng = random.Random(size * 31)
+    counter = iter(range(10 ** 9))
+
+    def store():
+        index = next(counter)
+        prompt = f"escrita {index} " + synthetic_prompt(rng, index)
+        event_loop_runner(server_module.cache_response_with_embedding(prompt, "bench-write", synthetic_response(rng, index)))
+
+    benchmark.pedantic(store, rounds=200, iterations=1, warmup_rounds=5)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Ollama simulado para benchmarks
+
+Implementa /api/tags, /api/ps, /api/generate e /api/chat (com e sem streaming)
+com latência configurável por token, sem precisar de GPU nem de modelos.
+
+Uso:
+    python benchmarks/mock_ollama.py --port 11435 --token-latency 0.01 --tokens 64
+"""
+import time
+import json
+import asyncio
+import argparse
+from aiohttp import web
+
+DEFAULT_MODELS = ["deepseek-coder:1.3b", "deepseek-coder:6.7b"]
+
+
+class MockOllama:
+    """Servidor com o mesmo formato de resposta do Ollama"""
+
+    def __init__(self, token_latency: float = 0.01, tokens: int = 64, prompt_latency: float = 0.0,
+                 load_latency: float = 0.0, models=None):
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.prompt_latency = prompt_latency    # Segundos por 1000 caracteres de prompt
+        self.load_latency = load_latency        # Custo da primeira chamada de cada modelo
+        self.models = models or DEFAULT_MODELS
+        self.loaded = set()
+        self.requests = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_post("/api/chat", self.chat)
+        return app
+
+    async def tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": m, "size": 0} for m in self.models]})
+
+    async def ps(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": m} for m in sorted(self.loaded)]})
+
+    async def _prefill(self, model: str, prompt_chars: int) -> float:
+        """Simula carga do modelo e avaliação do prompt; retorna a duração"""
+        start = time.perf_counter()
+        if model not in self.loaded:
+            await asyncio.sleep(self.load_latency)
+            self.loaded.add(model)
+        await asyncio.sleep(self.prompt_latency * prompt_chars / 1000)
+        return time.perf_counter() - start
+
+    def _tokens(self, options: dict):
+        count = min(self.tokens, int(options.get("num_predict", self.tokens)))
+        return [f"token{i} " for i in range(count)]
+
+    async def _respond(self, request: web.Request, body: dict, prompt_chars: int, chat: bool):
+        self.requests += 1
+        model = body.get("model", "")
+        prefill = await self._prefill(model, prompt_chars)
+        tokens = self._tokens(body.get("options", {}))
+        stats = {
+            "done": True,
+            "model": model,
+            "load_duration": 0,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "prompt_eval_count": prompt_chars // 4,
+            "eval_count": len(tokens),
+        }
+
+        def chunk(text: str) -> dict:
+            if chat:
+                return {"model": model, "message": {"role": "assistant", "content": text}, "done": False}
+            return {"model": model, "response": text, "done": False}
+
+        if body.get("stream", True):
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            for token in tokens:
+                await asyncio.sleep(self.token_latency)
+                await response.write((json.dumps(chunk(token)) + "\n").encode())
+            final = {**stats, "context": [1, 2, 3]} if not chat else {**stats, "message": {"role": "assistant", "content": ""}}
+            await response.write((json.dumps(final) + "\n").encode())
+            await response.write_eof()
+            return response
+
+        await asyncio.sleep(self.token_latency * len(tokens))
+        text = "".join(tokens).strip()
+        if chat:
+            return web.json_response({**stats, "message": {"role": "assistant", "content": text}})
+        return web.json_response({**stats, "response": text, "context": [1, 2, 3]})
+
+    async def generate(self, request: web.Request):
+        body = await request.json()
+        if not body.get("prompt"):
+            # Prompt vazio: apenas carrega o modelo (warm-up)
+            await self._prefill(body.get("model", ""), 0)
+            return web.json_response({"model": body.get("model"), "response": "", "done": True})
+        return await self._respond(request, body, len(body["prompt"]), chat=False)
+
+    async def chat(self, request: web.Request):
+        body = await request.json()
+        chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+        return await self._respond(request, body, chars, chat=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama simulado para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Segundos por token gerado")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens por resposta")
+    parser.add_argument("--prompt-latency", type=float, default=0.0, help="Segundos por 1000 caracteres de prompt")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Segundos para 'carregar' cada modelo")
+    args = parser.parse_args()
+
+    mock = MockOllama(args.token_latency, args.tokens, args.prompt_latency, args.load_latency)
+    web.run_app(mock.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
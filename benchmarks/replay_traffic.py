@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Reproduz uma captura de tráfego (src/traffic_capture.py) contra um servidor
+
+Mantém os intervalos originais entre requisições (ou acelerados por --speed).
+Em capturas só com hash (TRAFFIC_CAPTURE_CONTENT=hash), cada mensagem é
+substituída por um texto sintético determinístico do mesmo tamanho: hashes
+iguais geram prompts iguais, preservando a distribuição de repetições que o
+cache enxerga.
+
+Uso:
+    python benchmarks/replay_traffic.py logs/traffic*.jsonl* --target http://localhost:5000
+    python benchmarks/replay_traffic.py logs/traffic.jsonl --speed 4 --output results/replay.json
+    python benchmarks/replay_traffic.py logs/traffic.jsonl --speed 0   # o mais rápido possível
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.traffic_capture import read_capture
+from load_test import git_commit
+
+WORDS = (
+    "pedido entrega prazo pagamento cliente produto estoque relatorio financeiro margem "
+    "receita custo motor oleo revisao garantia suporte sistema erro acesso senha conta"
+).split()
+
+
+def synthetic_text(digest: str, length: int) -> str:
+    """Texto determinístico derivado do hash, com o tamanho original"""
+    rng = random.Random(digest)
+    words = [digest]
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:max(length, len(digest))]
+
+
+def build_payload(entry: Dict, model_override: Optional[str]) -> Dict:
+    messages = [
+        {"role": m["role"], "content": m["content"] if "content" in m else synthetic_text(m["h"], m["len"])}
+        for m in entry["msgs"]
+    ]
+    payload = {"model": model_override or entry.get("model") or "auto", "messages": messages}
+    if entry.get("temp") is not None:
+        payload["temperature"] = entry["temp"]
+    if entry.get("max_tokens") is not None:
+        payload["max_tokens"] = entry["max_tokens"]
+    if entry.get("sid"):
+        payload["session_id"] = entry["sid"]
+    return payload
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {}
+    data = np.array(values) * 1000
+    return {
+        "count": len(values),
+        "p50": round(float(np.percentile(data, 50)), 2),
+        "p95": round(float(np.percentile(data, 95)), 2),
+        "p99": round(float(np.percentile(data, 99)), 2),
+    }
+
+
+async def replay(entries: List[Dict], target: str, speed: float, concurrency: int, model_override: Optional[str]) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def issue(session: aiohttp.ClientSession, entry: Dict):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{target}/v1/chat/completions", json=build_payload(entry, model_override)) as response:
+                    await response.read()
+                    ok = response.status == 200
+            except Exception:
+                ok = False
+            results.append({"tier": entry.get("tier"), "original": entry.get("lat"), "latency": time.perf_counter() - start, "ok": ok})
+
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        tasks = []
+        origin = entries[0]["ts"]
+        start = time.perf_counter()
+        for entry in entries:
+            if speed > 0:
+                delay = (entry["ts"] - origin) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(issue(session, entry)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    by_tier = defaultdict(list)
+    for r in results:
+        if r["ok"]:
+            by_tier[r["tier"]].append(r["latency"])
+    return {
+        "requests": len(results),
+        "errors": sum(1 for r in results if not r["ok"]),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles([r["latency"] for r in results if r["ok"]]),
+        "original_latency_ms": percentiles([r["original"] for r in results if r["original"] is not None]),
+        "latency_ms_by_original_tier": {tier: percentiles(v) for tier, v in sorted(by_tier.items(), key=lambda i: str(i[0]))},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de tráfego capturado")
+    parser.add_argument("captures", nargs="+", help="Arquivos de captura (.jsonl e .jsonl.N.gz)")
+    parser.add_argument("--target", default="http://localhost:5000")
+    parser.add_argument("--speed", type=float, default=1.0, help="Fator de velocidade (2 = duas vezes mais rápido, 0 = sem espera)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Máximo de requisições simultâneas")
+    parser.add_argument("--limit", type=int, help="Reproduzir apenas as N primeiras requisições")
+    parser.add_argument("--model", help="Forçar o modelo de todas as requisições")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    entries = read_capture(args.captures)
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        sys.exit("Captura vazia")
+
+    summary = asyncio.run(replay(entries, args.target.rstrip("/"), args.speed, args.concurrency, args.model))
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "captures": args.captures,
+        "speed": args.speed,
+        "results": summary,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
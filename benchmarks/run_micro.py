@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Executa os microbenchmarks (pytest-benchmark) e gerencia baselines
+
+Uso:
+    python benchmarks/run_micro.py --save baseline          # grava baseline
+    python benchmarks/run_micro.py --compare baseline       # compara e falha em regressão
+    python benchmarks/run_micro.py --compare --threshold 15 -- -k find_similar
+
+Baselines ficam em benchmarks/baselines/ (uma pasta por máquina/Python).
+Tamanhos e domínios: BENCH_CACHE_SIZES=1000,10000 BENCH_DOMAIN_COUNTS=1,5
+"""
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).parent
+STORAGE = BENCHMARKS_DIR / "baselines"
+
+
+def baseline_id(name: str) -> str:
+    """Número da execução salva mais recente com o nome dado (o pytest-benchmark compara por número)"""
+    saved = sorted(STORAGE.glob(f"*/[0-9][0-9][0-9][0-9]_{name}.json"), key=lambda p: p.name)
+    if not saved:
+        sys.exit(f"Baseline '{name}' não encontrada em {STORAGE}")
+    return saved[-1].name[:4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks dos caminhos críticos do cache")
+    parser.add_argument("--save", metavar="NOME", help="Salvar os resultados como baseline NOME")
+    parser.add_argument("--compare", metavar="NOME", nargs="?", const="", help="Comparar com a baseline NOME (padrão: a mais recente)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Piora máxima tolerada da mediana (%%)")
+    parser.add_argument("pytest_args", nargs="*", help="Argumentos extras para o pytest (após --)")
+    args = parser.parse_args()
+
+    command = [
+        sys.executable, "-m", "pytest", str(BENCHMARKS_DIR / "micro"), "-q",
+        "-p", "no:cacheprovider",
+        f"--benchmark-storage=file://{STORAGE}",
+        "--benchmark-columns=min,median,mean,max,rounds",
+        "--benchmark-sort=name",
+    ]
+    if args.save:
+        command.append(f"--benchmark-save={args.save}")
+    if args.compare is not None:
+        command.append(f"--benchmark-compare={baseline_id(args.compare)}" if args.compare else "--benchmark-compare")
+        command.append(f"--benchmark-compare-fail=median:{args.threshold:g}%")
+    command.extend(args.pytest_args)
+
+    sys.exit(subprocess.call(command))
+
+
+if __name__ == "__main__":
+    main()
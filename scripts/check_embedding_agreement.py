@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Verifica se um backend de embeddings (int8/ONNX) concorda com o modelo de referência
+
+Para um conjunto de textos (inputs de training_data/*.json ou uma captura de
+tráfego com conteúdo), compara o backend candidato com o SentenceTransformer
+torch em:
+  - similaridade cosseno entre os vetores do mesmo texto
+  - recall@k dos vizinhos mais próximos (busca do cache semântico)
+  - concordância da decisão de hit no limiar do cache (0.85)
+  - latência de encode (1 texto por chamada, como no caminho da requisição)
+Sai com código 1 se a concordância ficar abaixo dos mínimos.
+
+Uso:
+    python scripts/check_embedding_agreement.py --backend onnx-int8
+    python scripts/check_embedding_agreement.py --backend torch-int8 --texts logs/traffic.jsonl --min-hit-agreement 0.99
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embeddings import EMBEDDING_MODEL_NAME, load_embedding_encoder
+
+CACHE_THRESHOLD = 0.85
+
+
+def load_texts(path: str, limit: int) -> List[str]:
+    """Textos de training_data/*.json (padrão) ou de uma captura com TRAFFIC_CAPTURE_CONTENT=full"""
+    texts = []
+    source = Path(path)
+    if source.is_dir():
+        for json_file in sorted(source.glob("*.json")):
+            data = json.loads(json_file.read_text(encoding="utf-8"))
+            for conv in data.get("conversations", []) if isinstance(data, dict) else []:
+                if conv.get("input"):
+                    texts.append(conv["input"])
+    else:
+        from src.traffic_capture import read_capture
+        for entry in read_capture([str(source)]):
+            texts.extend(m["content"] for m in entry["msgs"] if m.get("role") == "user" and "content" in m)
+    # Remover duplicados mantendo a ordem
+    return list(dict.fromkeys(texts))[:limit]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9, None)
+
+
+def encode_timed(model, texts: List[str]):
+    """Vetores (em lote) e latência p50/p95 de encode de um texto por vez"""
+    vectors = np.asarray(model.encode(texts, batch_size=32), dtype=np.float32)
+    latencies = []
+    for text in texts[:200]:
+        start = time.perf_counter()
+        model.encode(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return normalize(vectors), np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concordância entre backends de embeddings")
+    parser.add_argument("--backend", required=True, help="torch-int8, onnx ou onnx-int8")
+    parser.add_argument("--reference", default="torch")
+    parser.add_argument("--texts", default="training_data", help="Pasta com datasets ou captura de tráfego")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Cosseno médio mínimo")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Recall@k mínimo")
+    parser.add_argument("--min-hit-agreement", type=float, default=0.98, help="Concordância mínima da decisão de hit")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.limit)
+    if len(texts) < args.k + 1:
+        sys.exit(f"Poucos textos em {args.texts}: {len(texts)}")
+    print(f"📚 {len(texts)} textos | modelo {EMBEDDING_MODEL_NAME}")
+
+    ref_vectors, ref_p50, ref_p95 = encode_timed(load_embedding_encoder(backend=args.reference), texts)
+    cand_vectors, cand_p50, cand_p95 = encode_timed(load_embedding_encoder(backend=args.backend), texts)
+
+    # 1. Mesmo texto: quão próximos ficam os vetores
+    same_text = np.sum(ref_vectors * cand_vectors, axis=1)
+
+    # 2. Vizinhos: cada texto consulta os demais (como a busca do cache)
+    ref_sim = ref_vectors @ ref_vectors.T
+    cand_sim = cand_vectors @ cand_vectors.T
+    np.fill_diagonal(ref_sim, -1)
+    np.fill_diagonal(cand_sim, -1)
+    ref_top = np.argsort(-ref_sim, axis=1)[:, :args.k]
+    cand_top = np.argsort(-cand_sim, axis=1)[:, :args.k]
+    recall = np.mean([len(set(r) & set(c)) / args.k for r, c in zip(ref_top, cand_top)])
+
+    # 3. Decisão de hit no limiar do cache (melhor vizinho acima de 0.85?)
+    ref_hit = ref_sim.max(axis=1) >= CACHE_THRESHOLD
+    cand_hit = cand_sim.max(axis=1) >= CACHE_THRESHOLD
+    hit_agreement = float(np.mean(ref_hit == cand_hit))
+    top1_agreement = float(np.mean(ref_top[:, 0] == cand_top[:, 0]))
+
+    print(f"\n{'Métrica':32} {'Valor':>10} {'Mínimo':>10}")
+    checks = [
+        ("cosseno médio (mesmo texto)", float(same_text.mean()), args.min_cosine),
+        (f"recall@{args.k}", float(recall), args.min_recall),
+        ("concordância de hit (0.85)", hit_agreement, args.min_hit_agreement),
+    ]
+    failed = False
+    for name, value, minimum in checks:
+        ok = value >= minimum
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name:30} {value:>10.4f} {minimum:>10.4f}")
+    print(f"   {'cosseno mínimo (mesmo texto)':30} {float(same_text.min()):>10.4f}")
+    print(f"   {'concordância top-1':30} {top1_agreement:>10.4f}")
+    print(f"   hits referência/candidato: {int(ref_hit.sum())}/{int(cand_hit.sum())}")
+    print(f"\n⏱️  encode (1 texto): {args.reference} p50={ref_p50:.2f}ms p95={ref_p95:.2f}ms | "
+          f"{args.backend} p50={cand_p50:.2f}ms p95={cand_p95:.2f}ms ({ref_p50 / cand_p50:.1f}x)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
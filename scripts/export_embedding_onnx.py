@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Exporta o modelo de embeddings do cache semântico para ONNX (fp32 e int8)
+
+Gera em EMBEDDING_ONNX_DIR (padrão models/embeddings-onnx):
+    model.onnx        - transformer em fp32
+    model_int8.onnx   - quantização dinâmica int8 (pesos), para CPU
+    tokenizer*        - arquivos do tokenizer
+Usar com EMBEDDING_BACKEND=onnx ou onnx-int8 e validar com
+scripts/check_embedding_agreement.py antes de trocar em produção.
+
+Uso:
+    python scripts/export_embedding_onnx.py [--output models/embeddings-onnx]
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embeddings import EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo de embeddings para ONNX")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    print(f"📦 Carregando {args.model}...")
+    st_model = SentenceTransformer(args.model, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    sample = tokenizer(["exemplo de exportação"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = output / "model.onnx"
+    print(f"🔧 Exportando {fp32_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=args.opset,
+            do_constant_folding=True,
+        )
+
+    int8_path = output / "model_int8.onnx"
+    print(f"🔧 Quantizando (int8 dinâmico) {int8_path}...")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(str(output))
+
+    for path in (fp32_path, int8_path):
+        print(f"✅ {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print("➡️  Valide com: python scripts/check_embedding_agreement.py --backend onnx-int8")
+
+
+if __name__ == "__main__":
+    main()
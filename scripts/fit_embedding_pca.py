@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Ajusta a projeção PCA usada para reduzir os embeddings do cache semântico
+
+Calcula média e componentes principais dos embeddings de um conjunto de
+textos (training_data/*.json ou captura de tráfego com conteúdo) e grava em
+EMBEDDING_PCA_FILE. Mostra a variância retida por dimensão para escolher
+EMBEDDING_DIMS. Usar com EMBEDDING_REDUCTION=pca.
+
+Uso:
+    python scripts/fit_embedding_pca.py --texts training_data --output models/embedding_pca.npz
+"""
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embeddings import load_embedding_encoder
+from src.semantic_index import EMBEDDING_PCA_FILE
+from scripts.check_embedding_agreement import load_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajusta PCA para os embeddings do cache")
+    parser.add_argument("--texts", default="training_data", help="Pasta com datasets ou captura de tráfego")
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--output", default=EMBEDDING_PCA_FILE)
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.limit)
+    print(f"📚 {len(texts)} textos")
+    vectors = np.asarray(load_embedding_encoder().encode(texts, batch_size=64), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    mean = vectors.mean(axis=0)
+    _, singular, components = np.linalg.svd(vectors - mean, full_matrices=False)
+    variance = singular ** 2 / np.sum(singular ** 2)
+    retained = np.cumsum(variance)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(args.output, mean=mean, components=components.astype(np.float32), explained_variance=variance)
+    print(f"💾 Projeção salva em {args.output} ({components.shape[0]} componentes)")
+    for dims in (32, 64, 96, 128, 192, 256):
+        if dims <= len(retained):
+            print(f"   EMBEDDING_DIMS={dims:<4} variância retida {retained[dims - 1]:.1%}")
+    if len(texts) < vectors.shape[1]:
+        print("⚠️  Menos textos que dimensões: use mais dados (ex.: uma captura de tráfego) para uma projeção estável")
+
+
+if __name__ == "__main__":
+    main()
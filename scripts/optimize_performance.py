@@ -2,11 +2,17 @@
 """
 Script para pré-aquecer os modelos e otimizar performance
 """
+import os
 import requests
 import time
 import json
 
-OLLAMA_URL = "http://localhost:11434"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+# Mesmos modelos aquecidos pelo servidor (ver src/model_warmup.py)
+WARMUP_MODELS = [
+    m.strip() for m in os.getenv("WARMUP_MODELS", "deepseek-coder:1.3b,deepseek-coder:6.7b").split(",") if m.strip()
+]
+KEEP_ALIVE_MAX = int(os.getenv("KEEP_ALIVE_MAX", "3600"))
 
 def warm_up_model(model_name: str):
     """Pré-aquece um modelo específico"""
@@ -16,6 +22,7 @@ def warm_up_model(model_name: str):
         "model": model_name,
         "prompt": "Hello",
         "stream": False,
+        "keep_alive": KEEP_ALIVE_MAX,
         "options": {
             "num_predict": 1,
             "temperature": 0.1
@@ -41,7 +48,7 @@ def warm_up_model(model_name: str):
 def optimize_models():
     """Otimiza configurações dos modelos"""
     
-    models_to_warm = ["mistral:latest", "llama3.2:3b"]
+    models_to_warm = WARMUP_MODELS
     
     print("🚀 INICIANDO OTIMIZAÇÃO DE PERFORMANCE")
     print("=" * 50)
@@ -63,7 +70,7 @@ def optimize_models():
             print(f"❌ Erro ao verificar modelos: {e}")
     
     print(f"\n✅ Otimização concluída!")
-    print("💡 Dica: Execute este script após reiniciar o Docker para melhor performance")
+    print("💡 Dica: o servidor já aquece estes modelos na inicialização (WARMUP_ENABLED=true)")
 
 if __name__ == "__main__":
     optimize_models()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Pré-aquece o cache semântico a partir de datasets e capturas de tráfego
+
+Pares input/output de training_data/*.json são gravados como estão; prompts
+de capturas (TRAFFIC_CAPTURE_CONTENT=full) são gerados no Ollama, numa taxa
+limitada. Entradas já em cache são puladas e o orçamento do cache
+(CACHE_MAX_MB) nunca é ultrapassado. As réplicas da API recebem as entradas
+novas pelo log do índice semântico, sem reiniciar.
+
+Uso:
+    python scripts/warm_cache.py --source training_data --models deepseek-coder:1.3b
+    python scripts/warm_cache.py --source logs/traffic.jsonl --models deepseek-coder:6.7b --generate-rate 0.5
+    python scripts/warm_cache.py --source training_data --namespace suporte
+"""
+import os
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+import redis.asyncio as redis
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embeddings import EmbeddingClient, load_embedding_encoder
+from src.cache_keys import DEFAULT_NAMESPACE
+from src.cache_policy import CachePolicy
+from src.cache_namespaces import CacheNamespaces
+from src.cache_warming import (
+    CACHE_WARM_BATCH_SIZE, CACHE_WARM_GENERATE_RATE, CACHE_WARM_RATE, WARM_LOCK_KEY,
+    CacheWarmer, load_sources, warm_models, warm_sources,
+)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+
+
+async def run(args):
+    entries = load_sources(args.source, args.models)
+    print(f"📚 {len(entries)} entradas para {', '.join(args.models)}")
+    if not entries:
+        return
+
+    client = EmbeddingClient()
+    encoder = None if client.enabled else load_embedding_encoder()
+
+    async def encode(texts):
+        if encoder is None:
+            return await client.encode(texts)
+        return np.asarray(await asyncio.to_thread(encoder.encode, texts, batch_size=64), dtype=np.float32)
+
+    session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300))
+
+    async def generate(entry):
+        payload = {
+            "model": entry.model,
+            "prompt": entry.prompt,
+            "stream": False,
+            "options": {"temperature": entry.temperature, "num_predict": entry.max_tokens},
+        }
+        try:
+            async with session.post(f"{OLLAMA_URL}/api/generate", json=payload) as resp:
+                if resp.status != 200:
+                    return None
+                return (await resp.json()).get("response", "").strip() or None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"⚠️  Falha ao gerar resposta: {e}")
+            return None
+
+    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    records_client = redis.from_url(REDIS_URL, decode_responses=False)
+    if not await redis_client.set(WARM_LOCK_KEY, "cli", nx=True, ex=3600):
+        print("⚠️  Pré-aquecimento já em andamento (lock llm_cache:warming)")
+        return
+    try:
+        # Cota do namespace conforme CACHE_NAMESPACE_QUOTAS (o padrão usa CACHE_MAX_MB)
+        policy = CacheNamespaces(CachePolicy(ttl=CACHE_TTL), max_namespaces=2).policy(args.namespace)
+        warmer = CacheWarmer(redis_client, records_client, encode, generate, policy=policy, rate=args.rate,
+                             generate_rate=args.generate_rate, batch_size=args.batch_size, namespace=args.namespace)
+        stats = await warmer.warm(entries)
+    finally:
+        await redis_client.delete(WARM_LOCK_KEY)
+        await session.close()
+        await client.close()
+        await redis_client.aclose()
+        await records_client.aclose()
+
+    print(f"✅ {stats['written']} gravadas, {stats['generated']} geradas no Ollama")
+    print(f"   já em cache: {stats['skipped_cached']}, sem resposta: {stats['skipped_no_response']}")
+    if stats["budget_full"]:
+        print("⚠️  Orçamento do cache (CACHE_MAX_MB) cheio: aquecimento interrompido")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-aquece o cache semântico")
+    parser.add_argument("--source", action="append", help="Pasta de datasets ou captura de tráfego (repetível)")
+    parser.add_argument("--models", help="Modelos alvo, separados por vírgula")
+    parser.add_argument("--rate", type=float, default=CACHE_WARM_RATE, help="Entradas gravadas por segundo")
+    parser.add_argument("--generate-rate", type=float, default=CACHE_WARM_GENERATE_RATE,
+                        help="Gerações no Ollama por segundo (0 = só entradas com resposta)")
+    parser.add_argument("--batch-size", type=int, default=CACHE_WARM_BATCH_SIZE)
+    parser.add_argument("--namespace", default=DEFAULT_NAMESPACE, help="Namespace do cache a aquecer")
+    args = parser.parse_args()
+    args.source = args.source or warm_sources()
+    args.models = [m.strip() for m in args.models.split(",") if m.strip()] if args.models else warm_models()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Pool de backends Ollama com balanceamento de carga
+
+- Registro de vários hosts Ollama, cada um com modelos anunciados e capacidade
+- Roteamento por menor número de requisições em andamento (least-outstanding)
+- Remoção temporária (ejeção) de backends com falhas consecutivas
+- Nova tentativa em outro nó para chamadas idempotentes
+- Recarga da configuração (OLLAMA_BACKENDS_FILE) sem reiniciar a API
+- Requisições "hedged" opcionais contra gerações travadas (ver src/hedging.py)
+- Orçamento de erros por (modelo, backend): pares com muitas falhas são
+  evitados e, sem alternativa, a chamada falha na hora (ver src/error_budget.py)
+
+Formato de OLLAMA_BACKENDS / OLLAMA_BACKENDS_FILE (JSON):
+    [{"url": "http://gpu1:11434", "models": ["deepseek-coder:6.7b"], "capacity": 2}, ...]
+OLLAMA_BACKENDS também aceita uma lista simples de URLs separadas por vírgula.
+"""
+import os
+import json
+import time
+import zlib
+import random
+import asyncio
+import aiohttp
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.hedging import HEDGE_ENABLED, HedgePolicy
+from src.error_budget import ErrorBudget
+from src.metrics import BACKEND_ERRORS, BACKEND_SHORT_CIRCUITS, observe_stage
+from src.structured_logging import get_logger
+from src.tracing import start_span
+
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+OLLAMA_BACKENDS_FILE = os.getenv("OLLAMA_BACKENDS_FILE", "")
+BACKEND_DEFAULT_CAPACITY = int(os.getenv("BACKEND_DEFAULT_CAPACITY", "2"))
+BACKEND_EJECT_AFTER = int(os.getenv("BACKEND_EJECT_AFTER", "3"))          # Falhas consecutivas até ejetar
+BACKEND_EJECT_SECONDS = int(os.getenv("BACKEND_EJECT_SECONDS", "30"))     # Tempo fora do pool
+BACKEND_HEALTH_INTERVAL = int(os.getenv("BACKEND_HEALTH_INTERVAL", "15"))
+BACKEND_MAX_ATTEMPTS = int(os.getenv("BACKEND_MAX_ATTEMPTS", "2"))        # Tentativas em nós diferentes
+BACKEND_REQUEST_TIMEOUT = int(os.getenv("BACKEND_REQUEST_TIMEOUT", "180"))
+
+logger = get_logger("backends")
+
+
+@dataclass
+class OllamaBackend:
+    """Um host Ollama do pool"""
+    url: str
+    models: List[str] = field(default_factory=list)       # Modelos anunciados na configuração (vazio = todos)
+    capacity: int = BACKEND_DEFAULT_CAPACITY
+    installed: List[str] = field(default_factory=list)    # Modelos descobertos via /api/tags
+    sizes: Dict[str, int] = field(default_factory=dict)   # Tamanho (bytes) de cada modelo instalado
+    outstanding: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    total_requests: int = 0
+    total_errors: int = 0
+
+    def serves(self, model: str) -> bool:
+        """Indica se o backend atende o modelo"""
+        if self.models:
+            return model in self.models
+        if self.installed:
+            return model in self.installed
+        return True
+
+    def available(self) -> bool:
+        """Backend saudável e fora do período de ejeção"""
+        return self.healthy and self.ejected_until <= time.time()
+
+    def load(self) -> float:
+        """Carga relativa à capacidade"""
+        return self.outstanding / max(1, self.capacity)
+
+
+def parse_backends_config(raw: str) -> List[dict]:
+    """Interpreta a configuração (JSON ou lista de URLs separadas por vírgula)"""
+    raw = raw.strip()
+    if not raw:
+        return []
+    if raw.startswith("["):
+        entries = json.loads(raw)
+        return [{"url": e} if isinstance(e, str) else e for e in entries]
+    return [{"url": url.strip()} for url in raw.split(",") if url.strip()]
+
+
+class BackendPool:
+    """Registro de backends Ollama com roteamento least-outstanding"""
+
+    def __init__(self, default_url: str):
+        self.default_url = default_url
+        self.backends: Dict[str, OllamaBackend] = {}
+        self._config_mtime: Optional[float] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self.hedge_policy = HedgePolicy()
+        self.error_budget = ErrorBudget()
+        self.reload_config(force=True)
+
+    # ------------------------------------------------------------------
+    # Configuração
+    # ------------------------------------------------------------------
+    def _read_config(self) -> List[dict]:
+        if OLLAMA_BACKENDS_FILE and os.path.exists(OLLAMA_BACKENDS_FILE):
+            with open(OLLAMA_BACKENDS_FILE, "r", encoding="utf-8") as f:
+                return parse_backends_config(f.read())
+        return parse_backends_config(OLLAMA_BACKENDS) or [{"url": self.default_url}]
+
+    def reload_config(self, force: bool = False) -> bool:
+        """Recarrega o registro se o arquivo de configuração mudou; preserva o estado dos backends existentes"""
+        mtime = None
+        if OLLAMA_BACKENDS_FILE and os.path.exists(OLLAMA_BACKENDS_FILE):
+            mtime = os.path.getmtime(OLLAMA_BACKENDS_FILE)
+            if not force and mtime == self._config_mtime:
+                return False
+        elif not force:
+            return False
+
+        try:
+            entries = self._read_config()
+        except Exception as e:
+            logger.error("Configuração de backends inválida, mantendo a anterior: %s", e)
+            return False
+
+        updated: Dict[str, OllamaBackend] = {}
+        for entry in entries:
+            url = entry["url"].rstrip("/")
+            backend = self.backends.get(url) or OllamaBackend(url=url)
+            backend.models = list(entry.get("models", []))
+            backend.capacity = int(entry.get("capacity", BACKEND_DEFAULT_CAPACITY))
+            updated[url] = backend
+
+        added = set(updated) - set(self.backends)
+        removed = set(self.backends) - set(updated)
+        self.backends = updated
+        self._config_mtime = mtime
+
+        if added or removed:
+            logger.info("Registro de backends atualizado", extra={"added": sorted(added), "removed": sorted(removed)})
+        return True
+
+    # ------------------------------------------------------------------
+    # Roteamento
+    # ------------------------------------------------------------------
+    def candidates(self, model: Optional[str] = None) -> List[OllamaBackend]:
+        """Backends disponíveis que atendem o modelo"""
+        return [
+            b for b in self.backends.values()
+            if b.available() and (model is None or b.serves(model))
+        ]
+
+    def select(self, model: str, exclude: Tuple[str, ...] = (), affinity_key: Optional[str] = None) -> Optional[OllamaBackend]:
+        """
+        Escolhe o backend com menor carga relativa; empates são resolvidos pela
+        afinidade (mesma conversa no mesmo nó, reaproveitando o cache KV) ou aleatoriamente
+        """
+        self.reload_config()
+
+        def usable(b: OllamaBackend) -> bool:
+            return b.url not in exclude and not self.error_budget.is_open(b.url, model)
+
+        options = [b for b in self.candidates(model) if usable(b)]
+        if not options:
+            # Nenhum nó anuncia o modelo: tentar qualquer nó disponível
+            options = [b for b in self.candidates() if usable(b)]
+        if not options:
+            return None
+
+        lowest = min(b.load() for b in options)
+        least_loaded = sorted((b for b in options if b.load() == lowest), key=lambda b: b.url)
+        if affinity_key:
+            chosen = least_loaded[zlib.crc32(affinity_key.encode()) % len(least_loaded)]
+        else:
+            chosen = random.choice(least_loaded)
+        self.error_budget.acquire(chosen.url, model)
+        return chosen
+
+    def unavailable_error(self, model: str) -> str:
+        """Erro de quando nenhum backend pôde ser escolhido"""
+        if any(b.available() and self.error_budget.is_open(b.url, model) for b in self.backends.values()):
+            BACKEND_SHORT_CIRCUITS.labels(model=model or "unknown").inc()
+            return f"Erro ao conectar com Ollama: modelo {model} com orçamento de erros esgotado em todos os backends"
+        return "Erro ao conectar com Ollama: nenhum backend disponível"
+
+    def urls_for_model(self, model: str) -> List[str]:
+        """URLs dos backends disponíveis que atendem o modelo"""
+        return [b.url for b in self.candidates(model)]
+
+    def installed_models(self) -> Dict[str, int]:
+        """Modelos instalados nos backends disponíveis, pelo último health check -> tamanho em bytes"""
+        models: Dict[str, int] = {}
+        for backend in self.candidates():
+            for name in backend.installed:
+                models.setdefault(name, backend.sizes.get(name, 0))
+        return models
+
+    def any_available(self) -> bool:
+        """Existe pelo menos um backend utilizável"""
+        return bool(self.candidates())
+
+    # ------------------------------------------------------------------
+    # Saúde
+    # ------------------------------------------------------------------
+    def record_success(self, backend: OllamaBackend):
+        backend.consecutive_failures = 0
+        backend.healthy = True
+
+    def record_failure(self, backend: OllamaBackend, model: Optional[str] = None):
+        BACKEND_ERRORS.labels(backend=backend.url, model=model or "unknown").inc()
+        backend.total_errors += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= BACKEND_EJECT_AFTER:
+            backend.ejected_until = time.time() + BACKEND_EJECT_SECONDS
+            logger.warning("Backend ejetado", extra={"backend": backend.url, "seconds": BACKEND_EJECT_SECONDS})
+
+    async def check_backend(self, session: aiohttp.ClientSession, backend: OllamaBackend):
+        """Consulta /api/tags para atualizar saúde e modelos instalados"""
+        try:
+            async with session.get(
+                f"{backend.url}/api/tags",
+                timeout=aiohttp.ClientTimeout(total=5)
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    backend.installed = [m["name"] for m in data.get("models", [])]
+                    backend.sizes = {m["name"]: m.get("size", 0) for m in data.get("models", [])}
+                    backend.healthy = True
+                    backend.consecutive_failures = 0
+                    backend.ejected_until = 0.0
+                    return
+        except Exception:
+            pass
+        backend.healthy = False
+
+    async def check_health(self):
+        """Verifica todos os backends em paralelo"""
+        self.reload_config()
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(self.check_backend(session, b) for b in list(self.backends.values())))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(BACKEND_HEALTH_INTERVAL)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning("Erro no health check: %s", e)
+
+    def start_health_checks(self):
+        """Inicia a verificação periódica em segundo plano"""
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    # ------------------------------------------------------------------
+    # Requisições
+    # ------------------------------------------------------------------
+    async def _request(self, backend: OllamaBackend, endpoint: str, payload: dict, first_token: Optional[asyncio.Event] = None) -> Tuple[Optional[dict], Optional[str], bool]:
+        """
+        Executa a chamada em um backend
+        Retorna (resultado, erro, pode_repetir_em_outro_nó). Com `first_token`,
+        a resposta é lida em streaming e o evento é sinalizado no primeiro token.
+        """
+        model = payload.get("model")
+        backend.outstanding += 1
+        backend.total_requests += 1
+        start_time = time.perf_counter()
+        span_attributes = {"ollama.backend": backend.url, "ollama.endpoint": endpoint, "llm.model": model or ""}
+        try:
+            with start_span("ollama.request", span_attributes) as span:
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(
+                        f"{backend.url}{endpoint}",
+                        json={**payload, "stream": first_token is not None},
+                        timeout=aiohttp.ClientTimeout(total=BACKEND_REQUEST_TIMEOUT)
+                    ) as response:
+
+                        logger.debug("Resposta do backend", extra={"backend": backend.url, "status": response.status})
+
+                        if response.status == 200:
+                            if first_token is None:
+                                result = await response.json()
+                                # Sem streaming: TTFT ≈ carga do modelo + avaliação do prompt (ns)
+                                ttft_ns = result.get("load_duration", 0) + result.get("prompt_eval_duration", 0)
+                                if ttft_ns:
+                                    observe_stage("ollama_ttft", model, ttft_ns / 1e9)
+                            else:
+                                result = await self._read_stream(response, first_token, model, start_time)
+                            observe_stage("ollama_generation", model, time.perf_counter() - start_time)
+                            span.set_attributes({
+                                "llm.prompt_tokens": result.get("prompt_eval_count", 0),
+                                "llm.completion_tokens": result.get("eval_count", 0),
+                            })
+                            self.record_success(backend)
+                            self.error_budget.record(backend.url, model, True)
+                            return result, None, False
+
+                        error_text = await response.text()
+                        logger.error("Erro HTTP do Ollama", extra={"backend": backend.url, "status": response.status, "model": model, "error": error_text[:200]})
+                        error = f"Erro na chamada do Ollama: {response.status}"
+                        if response.status < 500:
+                            # Erro do cliente: outro nó não resolveria. Modelo ausente (404) conta contra o par
+                            self.error_budget.record(backend.url, model, response.status != 404)
+                            return None, error, False
+                        self.record_failure(backend, model)
+                        self.error_budget.record(backend.url, model, False)
+                        return None, error, True
+
+        except asyncio.CancelledError:
+            # Perdedora de um hedge: sem resultado, mas não pode prender a chamada de teste do par
+            self.error_budget.release(backend.url, model)
+            raise
+        except asyncio.TimeoutError:
+            # Não repetir: outro nó levaria o mesmo tempo
+            logger.error("Timeout na requisição", extra={"backend": backend.url, "model": model})
+            self.record_failure(backend, model)
+            self.error_budget.record(backend.url, model, False)
+            return None, f"Timeout na requisição para o modelo {model}", False
+        except Exception as e:
+            logger.error("Exceção no backend %s: %s", backend.url, e)
+            self.record_failure(backend, model)
+            self.error_budget.record(backend.url, model, False)
+            return None, f"Erro ao conectar com Ollama: {str(e)}", True
+        finally:
+            backend.outstanding -= 1
+
+    async def _read_stream(self, response: aiohttp.ClientResponse, first_token: asyncio.Event, model: Optional[str], start_time: float) -> dict:
+        """Agrega a resposta em streaming (NDJSON) no mesmo formato da resposta não-streaming"""
+        parts: List[str] = []
+        final: dict = {}
+        async for line in response.content:
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            text = chunk.get("response") or chunk.get("message", {}).get("content", "")
+            if text:
+                if not parts:
+                    ttft = time.perf_counter() - start_time
+                    observe_stage("ollama_ttft", model, ttft)
+                    # Toda amostra conta para o atraso do hedge, inclusive as que chegam depois dele
+                    self.hedge_policy.record_ttft(model, ttft)
+                parts.append(text)
+                first_token.set()
+            if chunk.get("done"):
+                final = chunk
+
+        content = "".join(parts)
+        if "message" in final:
+            final["message"] = {"role": "assistant", "content": content}
+        else:
+            final["response"] = content
+        return final
+
+    async def _post_hedged(self, endpoint: str, payload: dict, affinity_key: Optional[str]) -> Tuple[Optional[dict], Optional[str]]:
+        """Envia a geração e, se o primeiro token demorar além do percentil, duplica em outro backend"""
+        model = payload.get("model")
+        primary = self.select(model, affinity_key=affinity_key)
+        if primary is None:
+            return None, self.unavailable_error(model)
+
+        self.hedge_policy.on_request()
+        start_time = time.perf_counter()
+        primary_token = asyncio.Event()
+        primary_task = asyncio.create_task(self._request(primary, endpoint, payload, primary_token))
+        token_wait = asyncio.create_task(primary_token.wait())
+
+        await asyncio.wait({primary_task, token_wait}, timeout=self.hedge_policy.delay_for(model), return_when=asyncio.FIRST_COMPLETED)
+        token_wait.cancel()
+
+        # Orçamento antes da escolha: select() pode iniciar a chamada de teste de um par reabrindo
+        secondary = None
+        if not primary_task.done() and not primary_token.is_set() and self.hedge_policy.try_acquire():
+            secondary = self.select(model, exclude=(primary.url,))
+            if secondary is None:
+                self.hedge_policy.release()
+
+        if secondary is None:
+            result, error, retryable = await primary_task
+            if error and retryable:
+                fallback = self.select(model, exclude=(primary.url,))
+                if fallback is not None:
+                    result, error, _ = await self._request(fallback, endpoint, payload)
+            return result, error
+
+        logger.info("Hedge: duplicando geração", extra={"model": model, "primary": primary.url, "secondary": secondary.url})
+        secondary_task = asyncio.create_task(self._request(secondary, endpoint, payload, asyncio.Event()))
+        pending = {primary_task, secondary_task}
+        result, error = None, None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result, error, _ = task.result()
+                if error is None:
+                    if task is secondary_task:
+                        self.hedge_policy.record_win()
+                    # Cancelar a perdedora (fechar a conexão interrompe a geração no Ollama)
+                    for loser in pending:
+                        if loser is primary_task and not primary_token.is_set():
+                            # TTFT da original é pelo menos o tempo já esperado (não descartar amostras lentas)
+                            self.hedge_policy.record_ttft(model, time.perf_counter() - start_time)
+                        loser.cancel()
+                    return result, None
+
+        return result, error
+
+    async def post(self, endpoint: str, payload: dict, idempotent: bool = True, affinity_key: Optional[str] = None) -> Tuple[Optional[dict], Optional[str]]:
+        """
+        Envia o payload ao melhor backend para o modelo
+        Retorna (resultado JSON, None) ou (None, mensagem de erro)
+        """
+        if HEDGE_ENABLED and idempotent and endpoint in ("/api/generate", "/api/chat") and len(self.candidates()) > 1:
+            return await self._post_hedged(endpoint, payload, affinity_key)
+
+        model = payload.get("model")
+        attempts = BACKEND_MAX_ATTEMPTS if idempotent else 1
+        tried: Tuple[str, ...] = ()
+        error = "Erro ao conectar com Ollama: nenhum backend disponível"
+
+        for _ in range(attempts):
+            backend = self.select(model, exclude=tried, affinity_key=affinity_key)
+            if backend is None:
+                if not tried:
+                    error = self.unavailable_error(model)
+                break
+            tried += (backend.url,)
+
+            result, error, retryable = await self._request(backend, endpoint, payload)
+            if error is None or not retryable:
+                return result, error
+
+        return None, error
+
+    def status(self) -> List[dict]:
+        """Estado de cada backend para o health check"""
+        return [
+            {
+                "url": b.url,
+                "available": b.available(),
+                "models": b.models or b.installed,
+                "capacity": b.capacity,
+                "outstanding": b.outstanding,
+                "requests": b.total_requests,
+                "errors": b.total_errors,
+            }
+            for b in self.backends.values()
+        ]
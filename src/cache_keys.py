@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Chaves do cache de respostas: fingerprint canônico da requisição
+
+A chave combina modelo, prompt normalizado (Unicode NFC, espaços colapsados)
+e a faixa ("bucket") dos parâmetros de geração, para que uma resposta gerada
+com temperature=0.7/max_tokens=512 não seja servida a uma requisição
+determinística de 50 tokens. Requisições acima de CACHE_MAX_TEMPERATURE são
+consideradas criativas e não usam o cache. Cada requisição pode ainda pedir
+`cache_control`:
+    default   consulta e grava
+    no-cache  não consulta, mas grava a resposta nova
+    no-store  consulta, mas não grava
+    bypass    nem consulta nem grava
+
+Entradas de namespaces (src/cache_namespaces.py) usam o prefixo
+`llm_cache:<namespace>:`; o namespace padrão mantém as chaves sem prefixo.
+"""
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from src.metrics import CACHE_BUCKET_LOOKUPS
+
+CACHE_TEMPERATURE_BUCKETS = [float(v) for v in os.getenv("CACHE_TEMPERATURE_BUCKETS", "0,0.3,0.7,1.0").split(",")]
+CACHE_MAX_TOKENS_BUCKETS = [int(v) for v in os.getenv("CACHE_MAX_TOKENS_BUCKETS", "128,512,2048").split(",")]
+CACHE_MAX_TEMPERATURE = float(os.getenv("CACHE_MAX_TEMPERATURE", "1.0"))   # Acima disso: sem cache
+DEFAULT_NAMESPACE = "default"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", prompt)).strip()
+
+
+def _upper_edge(value: float, edges: List[float]) -> Optional[float]:
+    """Menor limite da lista que comporta o valor (None se passar de todos)"""
+    for edge in sorted(edges):
+        if value <= edge:
+            return edge
+    return None
+
+
+def param_bucket(temperature: float, max_tokens: int) -> str:
+    """Faixa dos parâmetros de geração, ex.: "t0.3-n512" """
+    t_edge = _upper_edge(temperature, CACHE_TEMPERATURE_BUCKETS)
+    n_edge = _upper_edge(max_tokens, CACHE_MAX_TOKENS_BUCKETS)
+    return f"t{t_edge if t_edge is not None else 'max'}-n{n_edge if n_edge is not None else 'max'}"
+
+
+def request_fingerprint(prompt: str, model: str, bucket: str) -> str:
+    """Hash canônico (modelo, prompt normalizado, faixa de parâmetros)"""
+    canonical = json.dumps({"m": model, "p": normalize_prompt(prompt), "b": bucket}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def namespace_prefix(namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Prefixo das chaves do namespace (o padrão mantém as chaves antigas)"""
+    return "llm_cache:" if namespace == DEFAULT_NAMESPACE else f"llm_cache:{namespace}:"
+
+
+def get_cache_key(prompt: str, model: str, bucket: str, namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Gera chave do cache a partir do fingerprint canônico (modelo, prompt, faixa de parâmetros)"""
+    return f"{namespace_prefix(namespace)}{request_fingerprint(prompt, model, bucket)}"
+
+
+def key_namespace(cache_key: str) -> str:
+    """Namespace de uma chave de resposta (llm_cache:<fp> ou llm_cache:<namespace>:<fp>)"""
+    parts = cache_key.split(":")
+    return parts[1] if len(parts) == 3 else DEFAULT_NAMESPACE
+
+
+def get_embedding_key(cache_key: str) -> str:
+    """Chave do embedding da mesma entrada (mesmo fingerprint da resposta)"""
+    return f"embedding:{cache_key.split(':', 1)[1]}"
+
+
+def index_partition(model: str, bucket: str, namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Partição do índice semântico: só compara prompts do mesmo namespace, modelo e faixa de parâmetros"""
+    return f"{model}|{bucket}" if namespace == DEFAULT_NAMESPACE else f"{namespace}|{model}|{bucket}"
+
+
+def partition_model(partition: str) -> str:
+    """Modelo de uma partição do índice semântico (inverso de index_partition)"""
+    parts = partition.split("|")
+    return parts[-2] if len(parts) >= 2 else partition
+
+
+def format_messages(messages: List[Dict[str, str]]) -> str:
+    """Prompt enviado ao Ollama (e usado na chave do cache) a partir das mensagens"""
+    prefixes = {"system": "System", "user": "User", "assistant": "Assistant"}
+    return "\n\n".join(f"{prefixes[m['role']]}: {m['content']}" for m in messages if m["role"] in prefixes).strip()
+
+
+@dataclass
+class CachePlan:
+    lookup: bool
+    store: bool
+    bucket: str
+    reason: str = ""
+
+
+def cache_plan(temperature: float, max_tokens: int, cache_control: Optional[str] = None) -> CachePlan:
+    """Decide se a requisição consulta e/ou grava o cache"""
+    bucket = param_bucket(temperature, max_tokens)
+    control = cache_control or "default"
+    if temperature > CACHE_MAX_TEMPERATURE:
+        return CachePlan(False, False, bucket, "creative")
+    if control == "bypass":
+        return CachePlan(False, False, bucket, control)
+    return CachePlan(control != "no-cache", control != "no-store", bucket, control)
+
+
+class BucketStats:
+    """Acertos por faixa de parâmetros (mostra se vale a pena separar as chaves)"""
+
+    def __init__(self):
+        self.lookups: Dict[str, int] = {}
+        self.hits: Dict[str, int] = {}
+
+    def record(self, bucket: str, hit: bool):
+        self.lookups[bucket] = self.lookups.get(bucket, 0) + 1
+        if hit:
+            self.hits[bucket] = self.hits.get(bucket, 0) + 1
+        CACHE_BUCKET_LOOKUPS.labels(bucket=bucket, result="hit" if hit else "miss").inc()
+
+    def stats(self) -> dict:
+        return {
+            bucket: {
+                "lookups": lookups,
+                "hits": self.hits.get(bucket, 0),
+                "hit_rate": round(self.hits.get(bucket, 0) / lookups, 4),
+            }
+            for bucket, lookups in sorted(self.lookups.items())
+        }
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Namespaces do cache semântico (multi-tenant)
+
+Cada requisição cai num namespace, vindo do cabeçalho CACHE_NAMESPACE_HEADER
+ou, com CACHE_NAMESPACE_FROM_API_KEY=true, do hash da chave de API
+(`Authorization: Bearer ...`). Nesse modo a chave manda: um cabeçalho que não
+corresponda a ela é recusado, para um cliente não ler nem gravar no cache de
+outro só enviando o cabeçalho. Sem a chave de API, o cabeçalho só vale para os
+namespaces de CACHE_NAMESPACE_ALLOWED e CACHE_NAMESPACE_QUOTAS: nomes
+arbitrários esgotariam CACHE_NAMESPACE_MAX e deixariam os demais sem cache.
+Namespaces ociosos há CACHE_NAMESPACE_IDLE segundos liberam a vaga. Cada namespace tem as suas chaves no Redis
+(`llm_cache:<namespace>:*`), as suas partições do índice semântico (a busca
+só varre o próprio namespace) e a sua política de cache, com cota em bytes e
+remoção próprias: um workflow barulhento só desaloja as próprias entradas.
+Sem cabeçalho nem chave, vale o namespace padrão, com as chaves de sempre e
+o orçamento CACHE_MAX_MB.
+"""
+import os
+import re
+import time
+import hashlib
+from typing import Dict, Mapping, Optional, Set
+
+from src.structured_logging import get_logger
+from src.cache_keys import DEFAULT_NAMESPACE, namespace_prefix
+from src.cache_policy import CACHE_MAX_BYTES, CACHE_SKETCH_WIDTH, CachePolicy
+
+CACHE_NAMESPACE_HEADER = os.getenv("CACHE_NAMESPACE_HEADER", "X-Cache-Namespace")   # Vazio = ignorar cabeçalho
+CACHE_NAMESPACE_FROM_API_KEY = os.getenv("CACHE_NAMESPACE_FROM_API_KEY", "false").lower() == "true"
+CACHE_NAMESPACE_QUOTAS = os.getenv("CACHE_NAMESPACE_QUOTAS", "")                    # ex.: "n8n=64,suporte=128" (MB)
+CACHE_NAMESPACE_DEFAULT_MB = float(os.getenv("CACHE_NAMESPACE_DEFAULT_MB", "32"))  # Cota dos namespaces não listados
+CACHE_NAMESPACE_MAX = int(os.getenv("CACHE_NAMESPACE_MAX", "64"))                  # Namespaces além disso ficam sem cache
+CACHE_NAMESPACE_ALLOWED = os.getenv("CACHE_NAMESPACE_ALLOWED", "")                  # Aceitos no cabeçalho, por vírgula (* = qualquer)
+CACHE_NAMESPACE_IDLE = float(os.getenv("CACHE_NAMESPACE_IDLE", "900"))             # Ociosidade (s) que libera a vaga do namespace
+NAMESPACES_KEY = "llm_cache:namespaces"
+
+_VALID_NAMESPACE = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,47}$")
+
+logger = get_logger("cache_namespaces")
+
+
+def parse_quotas(spec: str) -> Dict[str, int]:
+    """"n8n=64,suporte=128" -> {namespace: bytes}"""
+    quotas = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, mb = item.split("=", 1)
+            quotas[name.strip().lower()] = int(float(mb) * 1024 * 1024)
+    return quotas
+
+
+def allowed_namespaces(spec: str = CACHE_NAMESPACE_ALLOWED, quotas: str = CACHE_NAMESPACE_QUOTAS) -> Optional[Set[str]]:
+    """Namespaces aceitos no cabeçalho: os listados e os com cota (None = qualquer um)"""
+    names = {name.strip().lower() for name in spec.split(",") if name.strip()}
+    if "*" in names:
+        return None
+    return names | set(parse_quotas(quotas)) | {DEFAULT_NAMESPACE}
+
+
+_ALLOWED = allowed_namespaces()
+
+
+def resolve_namespace(headers: Mapping[str, str], allowed: Optional[Set[str]] = _ALLOWED) -> str:
+    """
+    Namespace da requisição; ValueError se o cabeçalho trouxer um nome inválido,
+    fora de `allowed` ou, com CACHE_NAMESPACE_FROM_API_KEY, diferente do namespace
+    da chave de API
+    """
+    requested = None
+    if CACHE_NAMESPACE_HEADER:
+        value = headers.get(CACHE_NAMESPACE_HEADER)
+        if value:
+            requested = value.strip().lower()
+            if not _VALID_NAMESPACE.match(requested):
+                raise ValueError(f"{CACHE_NAMESPACE_HEADER} inválido: use letras, números, '.', '_' ou '-' (até 48)")
+    if CACHE_NAMESPACE_FROM_API_KEY:
+        namespace = DEFAULT_NAMESPACE
+        authorization = headers.get("Authorization", "")
+        if authorization.lower().startswith("bearer ") and authorization[7:].strip():
+            namespace = "key-" + hashlib.sha256(authorization[7:].strip().encode("utf-8")).hexdigest()[:12]
+        if requested and requested != namespace:
+            raise ValueError(f"{CACHE_NAMESPACE_HEADER} não corresponde ao namespace da chave de API")
+        return namespace
+    if requested and allowed is not None and requested not in allowed:
+        raise ValueError(f"{CACHE_NAMESPACE_HEADER} não permitido: {requested}")
+    return requested or DEFAULT_NAMESPACE
+
+
+class CacheNamespaces:
+    """Política de cache (cota, admissão, remoção) e estatísticas de cada namespace"""
+
+    def __init__(self, default_policy: CachePolicy, quotas: Optional[Dict[str, int]] = None,
+                 default_quota: int = int(CACHE_NAMESPACE_DEFAULT_MB * 1024 * 1024), max_namespaces: int = CACHE_NAMESPACE_MAX,
+                 idle_seconds: float = CACHE_NAMESPACE_IDLE):
+        self.default_policy = default_policy
+        self.quotas = parse_quotas(CACHE_NAMESPACE_QUOTAS) if quotas is None else quotas
+        self.default_quota = default_quota
+        self.max_namespaces = max_namespaces
+        self.idle_seconds = idle_seconds
+        self.policies: Dict[str, CachePolicy] = {DEFAULT_NAMESPACE: default_policy}
+        self.last_used: Dict[str, float] = {}
+        self.registered = set()
+        self.lookups: Dict[str, int] = {}
+        self.hits: Dict[str, int] = {}
+        self.refused = 0
+        self.reclaimed = 0
+
+    def policy(self, namespace: str) -> Optional[CachePolicy]:
+        """Política do namespace (criada no primeiro uso); None se o limite de namespaces foi atingido"""
+        policy = self.policies.get(namespace)
+        if policy is None:
+            if len(self.policies) >= self.max_namespaces and namespace not in self.quotas and not self._reclaim():
+                self.refused += 1
+                logger.warning("Limite de namespaces do cache atingido, requisição sem cache", extra={"namespace": namespace})
+                return None
+            quota = self.quotas.get(namespace, self.default_quota)
+            # Sketch proporcional à cota: namespaces pequenos não pagam pela largura do padrão
+            width = max(1024, int(CACHE_SKETCH_WIDTH * quota / CACHE_MAX_BYTES)) if CACHE_MAX_BYTES else CACHE_SKETCH_WIDTH
+            base = self.default_policy
+            policy = CachePolicy(ttl=base.ttl, max_ttl=base.max_ttl, extension=base.extension, max_bytes=quota,
+                                 min_freq=base.min_freq, stale_ttl=base.stale_ttl, namespace=namespace, sketch_width=width)
+            self.policies[namespace] = policy
+        self.last_used[namespace] = time.time()
+        return policy
+
+    def _reclaim(self) -> bool:
+        """
+        Libera a vaga do namespace sem cota ocioso há mais tempo (pelo menos idle_seconds).
+        As entradas dele no Redis seguem com os seus TTLs; a política é recriada se ele voltar
+        """
+        cutoff = time.time() - self.idle_seconds
+        idle = [
+            (used, namespace) for namespace, used in self.last_used.items()
+            if namespace != DEFAULT_NAMESPACE and namespace not in self.quotas and used <= cutoff
+            and not self.policies[namespace].pending_hits
+        ]
+        if not idle:
+            return False
+        _, namespace = min(idle)
+        del self.policies[namespace], self.last_used[namespace]
+        self.lookups.pop(namespace, None)
+        self.hits.pop(namespace, None)
+        self.reclaimed += 1
+        logger.info("Namespace ocioso liberado", extra={"namespace": namespace})
+        return True
+
+    def worst_case_bytes(self, from_api_key: bool = CACHE_NAMESPACE_FROM_API_KEY, allowed: Optional[Set[str]] = _ALLOWED) -> int:
+        """Soma das cotas se todos os namespaces possíveis encherem (padrão + com cota + vagas restantes)"""
+        slots = max(0, self.max_namespaces - 1 - len(self.quotas))
+        if not from_api_key and allowed is not None:
+            slots = min(slots, len(allowed - set(self.quotas) - {DEFAULT_NAMESPACE}))
+        return self.default_policy.max_bytes + sum(self.quotas.values()) + slots * self.default_quota
+
+    async def check_memory(self, redis_client) -> Optional[int]:
+        """
+        Compara a soma das cotas com o maxmemory do Redis; cotas acima dele fazem o Redis
+        despejar entradas por conta própria, fora da contabilidade de cada namespace.
+        Devolve o maxmemory (None se desconhecido ou sem limite)
+        """
+        try:
+            config = await redis_client.config_get("maxmemory")
+            maxmemory = int(config.get("maxmemory", 0))
+        except Exception as e:
+            logger.debug("maxmemory do Redis indisponível: %s", e)
+            return None
+        if not maxmemory:
+            return None
+        total = self.worst_case_bytes()
+        if total > maxmemory:
+            logger.error("Cotas do cache somam mais que o maxmemory do Redis", extra={
+                "quota_mb": round(total / 1024 / 1024, 1), "maxmemory_mb": round(maxmemory / 1024 / 1024, 1),
+                "hint": "reduza CACHE_MAX_MB, CACHE_NAMESPACE_DEFAULT_MB, CACHE_NAMESPACE_MAX ou as cotas",
+            })
+        return maxmemory
+
+    async def register(self, redis_client, namespace: str):
+        """Anota o namespace no Redis (uma vez por processo), para as estatísticas de todas as réplicas"""
+        if namespace != DEFAULT_NAMESPACE and namespace not in self.registered:
+            await redis_client.sadd(NAMESPACES_KEY, namespace)
+            self.registered.add(namespace)
+
+    def record(self, namespace: str, hit: bool):
+        # Namespaces sem política (limite atingido) não acumulam estatísticas
+        if namespace not in self.policies:
+            return
+        self.lookups[namespace] = self.lookups.get(namespace, 0) + 1
+        if hit:
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+
+    async def stats(self, redis_client=None) -> dict:
+        names = set(self.policies)
+        if redis_client:
+            try:
+                names |= set(await redis_client.smembers(NAMESPACES_KEY))
+            except Exception:
+                pass
+        result = {}
+        for namespace in sorted(names):
+            # Só leitura: namespaces vistos em outras réplicas não ganham política neste processo
+            policy = self.policies.get(namespace)
+            if policy is not None:
+                usage = await policy.stats(redis_client)
+            else:
+                usage = {"namespace": namespace, "max_bytes": self.quotas.get(namespace, self.default_quota), "bytes": None}
+                if redis_client:
+                    try:
+                        usage["bytes"] = int(await redis_client.get(f"{namespace_prefix(namespace)}bytes") or 0)
+                    except Exception:
+                        pass
+            lookups = self.lookups.get(namespace, 0)
+            result[namespace] = {
+                **usage,
+                "lookups": lookups,
+                "hits": self.hits.get(namespace, 0),
+                "hit_rate": round(self.hits.get(namespace, 0) / lookups, 4) if lookups else 0.0,
+            }
+        return result
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Política de TTL e admissão do cache semântico no Redis
+
+- TTL adaptativo: cada acerto incrementa o contador da entrada (hash
+  `llm_cache:hits`, acumulado no processo e enviado em lote a cada
+  CACHE_HITS_FLUSH_INTERVAL) e vale CACHE_TTL_EXTENSION a mais de validade,
+  até CACHE_MAX_TTL; respostas populares deixam de ser regeneradas na GPU.
+  A validade só é regravada quando o frescor está a menos de uma extensão
+  do fim, e não a cada acerto
+- Orçamento em bytes (CACHE_MAX_MB): o tamanho de cada entrada (resposta +
+  embedding) é contabilizado em `llm_cache:bytes`; ao estourar, saem primeiro
+  as entradas mais próximas de expirar
+- Admissão estilo TinyLFU: um count-min sketch (por processo, com
+  envelhecimento) estima a frequência de cada prompt; sem espaço, a entrada
+  nova só entra se for mais frequente que a vítima, e prompts abaixo de
+  CACHE_ADMISSION_MIN_FREQ nunca entram
+- Stale-while-revalidate: passado o TTL "suave" (`fresh_until`) a entrada
+  ainda vale por CACHE_STALE_TTL (TTL "duro" = expiração no Redis); nesse
+  intervalo ela é servida e reconstruída em segundo plano
+
+Cada namespace do cache (src/cache_namespaces.py) tem a sua política, com
+chaves de contabilidade e orçamento próprios: um namespace só desaloja as
+suas entradas.
+"""
+import os
+import time
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.structured_logging import get_logger
+from src.metrics import CACHE_ADMISSIONS, CACHE_EVICTIONS
+from src.semantic_index import INDEX_LOG_KEY
+from src.cache_records import pack_record, unpack_record
+from src.cache_keys import DEFAULT_NAMESPACE, namespace_prefix
+
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_TTL = int(os.getenv("CACHE_MAX_TTL", "3600"))                   # Teto do TTL estendido
+CACHE_TTL_EXTENSION = int(os.getenv("CACHE_TTL_EXTENSION", str(CACHE_TTL)))  # Segundos ganhos por acerto
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", str(CACHE_TTL)))        # Janela servindo resposta vencida (0 = desligado)
+CACHE_MAX_BYTES = int(float(os.getenv("CACHE_MAX_MB", "256")) * 1024 * 1024)  # 0 = sem limite
+CACHE_ADMISSION_MIN_FREQ = int(os.getenv("CACHE_ADMISSION_MIN_FREQ", "1"))  # Vezes que o prompt precisa aparecer
+CACHE_SKETCH_WIDTH = int(os.getenv("CACHE_SKETCH_WIDTH", "65536"))
+CACHE_EVICTION_SAMPLE = int(os.getenv("CACHE_EVICTION_SAMPLE", "8"))
+CACHE_SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", "10"))
+CACHE_HITS_FLUSH_INTERVAL = float(os.getenv("CACHE_HITS_FLUSH_INTERVAL", "5"))  # Segundos entre envios dos acertos acumulados
+
+# Chaves de contabilidade (namespace padrão; os demais usam llm_cache:<namespace>:entries etc.)
+#   llm_cache:entries     zset cache_key -> expira em (epoch)
+#   llm_cache:entry_meta  hash cache_key -> {"bytes", "embedding_key"}
+#   llm_cache:hits        hash cache_key -> acertos
+#   llm_cache:bytes       total contabilizado
+
+logger = get_logger("cache_policy")
+
+
+class FrequencySketch:
+    """Count-min sketch de 4 linhas com contadores saturando em 15 e envelhecimento"""
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = CACHE_SKETCH_WIDTH):
+        self.width = 1 << max(4, (width - 1).bit_length())   # Potência de 2
+        self.table = np.zeros((self.DEPTH, self.width), dtype=np.uint8)
+        self.sample_size = self.width * 10
+        self.additions = 0
+        self.resets = 0
+
+    def _indexes(self, key: str):
+        return [hash((seed, key)) & (self.width - 1) for seed in range(self.DEPTH)]
+
+    def increment(self, key: str):
+        added = False
+        for row, col in enumerate(self._indexes(key)):
+            if self.table[row, col] < self.MAX_COUNT:
+                self.table[row, col] += 1
+                added = True
+        if added:
+            self.additions += 1
+            if self.additions >= self.sample_size:
+                self._age()
+
+    def estimate(self, key: str) -> int:
+        return int(min(self.table[row, col] for row, col in enumerate(self._indexes(key))))
+
+    def _age(self):
+        """Divide todos os contadores por 2: frequências antigas perdem peso"""
+        self.table >>= 1
+        self.additions //= 2
+        self.resets += 1
+
+
+@dataclass
+class Eviction:
+    cache_keys: List[str]
+    embedding_keys: List[str]
+
+
+class CachePolicy:
+    """TTL adaptativo, orçamento em bytes e admissão TinyLFU do cache no Redis"""
+
+    def __init__(self, ttl: int = CACHE_TTL, max_ttl: int = CACHE_MAX_TTL, extension: int = CACHE_TTL_EXTENSION,
+                 max_bytes: int = CACHE_MAX_BYTES, min_freq: int = CACHE_ADMISSION_MIN_FREQ, stale_ttl: int = CACHE_STALE_TTL,
+                 namespace: str = DEFAULT_NAMESPACE, sketch_width: int = CACHE_SKETCH_WIDTH):
+        self.namespace = namespace
+        prefix = namespace_prefix(namespace)
+        self.entries_key = f"{prefix}entries"
+        self.meta_key = f"{prefix}entry_meta"
+        self.hits_key = f"{prefix}hits"
+        self.bytes_key = f"{prefix}bytes"
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_ttl = max(max_ttl, ttl)
+        self.extension = extension
+        self.max_bytes = max_bytes
+        self.min_freq = min_freq
+        self.sketch = FrequencySketch(sketch_width)
+        self.pending_hits: Dict[str, int] = {}     # Acertos ainda não enviados ao Redis
+        self.capped: Dict[str, float] = {}         # Entradas no teto do TTL -> frescor final
+        self.last_sweep = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.extended = 0
+
+    def record_access(self, cache_key: str):
+        """Toda consulta conta para a frequência do prompt (acerto ou falha)"""
+        self.sketch.increment(cache_key)
+
+    def ttl_for(self, hits: int) -> int:
+        """TTL suave (frescor) de uma entrada com `hits` acertos"""
+        return min(self.max_ttl, self.ttl + hits * self.extension)
+
+    def hard_ttl(self, ttl: float) -> float:
+        """TTL no Redis: o suave mais a janela em que a resposta vencida ainda é servida"""
+        return ttl + self.stale_ttl
+
+    @staticmethod
+    def fresh_until(cache_info: dict, default_ttl: float) -> float:
+        return cache_info.get("fresh_until", cache_info["timestamp"] + default_ttl)
+
+    def count_hit(self, cache_key: str):
+        """Acerto contado no processo; vai ao Redis no próximo flush_hits (ou on_hit)"""
+        self.pending_hits[cache_key] = self.pending_hits.get(cache_key, 0) + 1
+
+    def needs_extension(self, cache_key: str, fresh_until: float) -> bool:
+        """Vale reler/regravar a entrada: frescor a menos de uma extensão do fim e abaixo do teto"""
+        if not self.extension or fresh_until - time.time() >= self.extension:
+            return False
+        return self.capped.get(cache_key) != fresh_until
+
+    async def flush_hits(self, redis_client) -> int:
+        """Envia os acertos acumulados num único pipeline de HINCRBY; devolve quantas chaves"""
+        now = time.time()
+        self.capped = {key: until for key, until in self.capped.items() if until > now}
+        if not self.pending_hits:
+            return 0
+        pending, self.pending_hits = self.pending_hits, {}
+        pipe = redis_client.pipeline(transaction=False)
+        for cache_key, count in pending.items():
+            pipe.hincrby(self.hits_key, cache_key, count)
+        try:
+            await pipe.execute()
+        except Exception:
+            # Devolver ao acumulado para o próximo envio
+            for cache_key, count in pending.items():
+                self.pending_hits[cache_key] = self.pending_hits.get(cache_key, 0) + count
+            raise
+        return len(pending)
+
+    async def on_hit(self, redis_client, records_client, cache_key: str, cache_info: dict) -> Optional[Tuple[float, float, Optional[str]]]:
+        """
+        Envia os acertos pendentes da entrada e estende o TTL pelo total; se estendeu,
+        devolve (frescor, expiração, chave do embedding). Os registros são relidos/regravados
+        por `records_client` (binário)
+        """
+        hits = await redis_client.hincrby(self.hits_key, cache_key, self.pending_hits.pop(cache_key, 0))
+        fresh_until = cache_info["timestamp"] + self.ttl_for(hits)
+        current = self.fresh_until(cache_info, self.ttl)
+        if fresh_until <= current:
+            # No teto: não reler a entrada a cada acerto até ela vencer
+            self.capped[cache_key] = current
+            return None
+        expires_at = fresh_until + self.stale_ttl
+        raw_meta = await redis_client.hget(self.meta_key, cache_key)
+        embedding_key = json.loads(raw_meta)["embedding_key"] if raw_meta else None
+        embedding_raw = await records_client.get(embedding_key) if embedding_key else None
+
+        cache_info = {**cache_info, "fresh_until": fresh_until, "expires_at": expires_at, "hits": hits}
+        pipe = records_client.pipeline(transaction=False)
+        pipe.set(cache_key, pack_record(cache_info), exat=int(expires_at) + 1)
+        if embedding_raw:
+            record = {**unpack_record(embedding_raw), "expires_at": expires_at}
+            pipe.set(embedding_key, pack_record(record), exat=int(expires_at) + 1)
+            # Reescrito no log: as outras réplicas releem o registro com a nova expiração
+            pipe.zadd(INDEX_LOG_KEY, {embedding_key: time.time()})
+        pipe.zadd(self.entries_key, {cache_key: expires_at})
+        await pipe.execute()
+        self.extended += 1
+        return fresh_until, expires_at, embedding_key
+
+    async def admit(self, redis_client, cache_key: str, size: int, refresh: bool = False) -> Tuple[bool, Eviction]:
+        """Decide se a entrada nova entra; remove vítimas se for preciso abrir espaço"""
+        eviction = Eviction([], [])
+        # Reconstrução de entrada vencida: já conquistou o lugar no cache
+        # A requisição atual conta como uma ocorrência mesmo sem consulta prévia (ex.: cache_control=no-cache)
+        frequency = FrequencySketch.MAX_COUNT + 1 if refresh else max(1, self.sketch.estimate(cache_key))
+        if frequency < self.min_freq:
+            return self._decide(False, cache_key, frequency, "infrequent"), eviction
+        if not self.max_bytes:
+            return self._decide(True, cache_key, frequency), eviction
+
+        await self.sweep(redis_client)
+        used = int(await redis_client.get(self.bytes_key) or 0)
+        while used + size > self.max_bytes:
+            # Vítima: a menos frequente entre as que expiram primeiro
+            candidates = await redis_client.zrange(self.entries_key, 0, CACHE_EVICTION_SAMPLE - 1)
+            if not candidates:
+                break
+            victim = min(candidates, key=self.sketch.estimate)
+            if self.sketch.estimate(victim) >= frequency:
+                return self._decide(False, cache_key, frequency, "budget"), eviction
+            freed, embedding_key = await self._drop(redis_client, victim, delete=True)
+            eviction.cache_keys.append(victim)
+            if embedding_key:
+                eviction.embedding_keys.append(embedding_key)
+            used -= freed
+            self.evicted += 1
+            CACHE_EVICTIONS.inc()
+        return self._decide(True, cache_key, frequency), eviction
+
+    def _decide(self, admitted: bool, cache_key: str, frequency: int, reason: str = "") -> bool:
+        if admitted:
+            self.admitted += 1
+            CACHE_ADMISSIONS.labels(decision="admitted").inc()
+        else:
+            self.rejected += 1
+            CACHE_ADMISSIONS.labels(decision=f"rejected_{reason}").inc()
+            logger.debug("Entrada recusada pelo cache", extra={"cache_key": cache_key, "frequency": frequency, "reason": reason})
+        return admitted
+
+    async def has_room(self, redis_client, size: int) -> bool:
+        """Cabe no orçamento sem remover nada (pré-aquecimento não desaloja entradas vivas)"""
+        if not self.max_bytes:
+            return True
+        await self.sweep(redis_client)
+        return int(await redis_client.get(self.bytes_key) or 0) + size <= self.max_bytes
+
+    async def track(self, redis_client, cache_key: str, embedding_key: str, size: int, expires_at: float):
+        """Registra a entrada gravada na contabilidade de bytes e expiração"""
+        previous = await redis_client.hget(self.meta_key, cache_key)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zadd(self.entries_key, {cache_key: expires_at})
+        pipe.hset(self.meta_key, cache_key, json.dumps({"bytes": size, "embedding_key": embedding_key}))
+        pipe.incrby(self.bytes_key, size - (json.loads(previous)["bytes"] if previous else 0))
+        await pipe.execute()
+
+    async def forget(self, redis_client, cache_keys: List[str]):
+        """Tira da contabilidade entradas removidas por fora (purga)"""
+        for cache_key in cache_keys:
+            await self._drop(redis_client, cache_key, delete=False)
+
+    async def sweep(self, redis_client, force: bool = False) -> int:
+        """Desconta as entradas que já expiraram no Redis (no máximo a cada CACHE_SWEEP_INTERVAL)"""
+        now = time.time()
+        if not force and now - self.last_sweep < CACHE_SWEEP_INTERVAL:
+            return 0
+        self.last_sweep = now
+        expired = await redis_client.zrangebyscore(self.entries_key, "-inf", now)
+        for cache_key in expired:
+            await self._drop(redis_client, cache_key, delete=False)
+        return len(expired)
+
+    async def _drop(self, redis_client, cache_key: str, delete: bool) -> Tuple[int, Optional[str]]:
+        raw_meta = await redis_client.hget(self.meta_key, cache_key)
+        meta = json.loads(raw_meta) if raw_meta else {"bytes": 0, "embedding_key": None}
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zrem(self.entries_key, cache_key)
+        pipe.hdel(self.meta_key, cache_key)
+        pipe.hdel(self.hits_key, cache_key)
+        if meta["bytes"]:
+            pipe.decrby(self.bytes_key, meta["bytes"])
+        if delete:
+            pipe.delete(cache_key, *([meta["embedding_key"]] if meta["embedding_key"] else []))
+        await pipe.execute()
+        return meta["bytes"], meta["embedding_key"]
+
+    async def stats(self, redis_client=None) -> dict:
+        used = None
+        if redis_client:
+            try:
+                used = int(await redis_client.get(self.bytes_key) or 0)
+            except Exception:
+                pass
+        return {
+            "namespace": self.namespace,
+            "ttl": self.ttl,
+            "max_ttl": self.max_ttl,
+            "stale_ttl": self.stale_ttl,
+            "max_bytes": self.max_bytes,
+            "bytes": used,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "extended": self.extended,
+            "sketch_resets": self.sketch.resets,
+        }
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Formato compacto dos registros do cache no Redis
+
+Respostas (`llm_cache:*`) e embeddings (`embedding:*`) são gravados em
+MessagePack, com o vetor em bytes float16 crus (sem base64) e textos longos
+(resposta e prompt) comprimidos com zstd - ou zlib, se o pacote `zstandard`
+não estiver instalado. O prompt fica só no registro do embedding, que
+compartilha o fingerprint com a resposta. Sem `msgpack`, os registros voltam
+a ser JSON compacto. Registros JSON antigos continuam legíveis até expirarem.
+
+Os valores são binários: usar o cliente Redis com decode_responses=False.
+"""
+import os
+import json
+import zlib
+import base64
+
+from src.cache_keys import DEFAULT_NAMESPACE
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+CACHE_RECORD_FORMAT = os.getenv("CACHE_RECORD_FORMAT", "msgpack").lower()   # msgpack ou json
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "512"))  # Textos menores não compensam
+CACHE_COMPRESS_LEVEL = int(os.getenv("CACHE_COMPRESS_LEVEL", "3"))
+
+COMPRESSED_FIELDS = ("response", "prompt")
+MSGPACK_PREFIX = b"M"
+ZSTD_MARKER = b"z"
+ZLIB_MARKER = b"d"
+
+if ZSTD_AVAILABLE:
+    _compressor = zstandard.ZstdCompressor(level=CACHE_COMPRESS_LEVEL)
+    _decompressor = zstandard.ZstdDecompressor()
+
+
+def compress_text(text: str) -> bytes:
+    data = text.encode("utf-8")
+    if ZSTD_AVAILABLE:
+        return ZSTD_MARKER + _compressor.compress(data)
+    return ZLIB_MARKER + zlib.compress(data, CACHE_COMPRESS_LEVEL)
+
+
+def decompress_text(data: bytes) -> str:
+    marker, body = data[:1], data[1:]
+    if marker == ZSTD_MARKER:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("registro comprimido com zstd, mas zstandard não está instalado")
+        return _decompressor.decompress(body).decode("utf-8")
+    return zlib.decompress(body).decode("utf-8")
+
+
+def use_msgpack() -> bool:
+    return MSGPACK_AVAILABLE and CACHE_RECORD_FORMAT == "msgpack"
+
+
+def pack_record(record: dict) -> bytes:
+    """Serializa um registro do cache (resposta ou embedding)"""
+    if use_msgpack():
+        packed = {}
+        for field, value in record.items():
+            if field in COMPRESSED_FIELDS and isinstance(value, str) and len(value) >= CACHE_COMPRESS_MIN_BYTES:
+                value = compress_text(value)
+            packed[field] = value
+        return MSGPACK_PREFIX + msgpack.packb(packed, use_bin_type=True)
+    # JSON: bytes (vetor) em base64
+    record = {field: base64.b64encode(value).decode("ascii") if isinstance(value, bytes) else value for field, value in record.items()}
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def unpack_record(raw) -> dict:
+    """Lê um registro em MessagePack ou JSON (inclusive o formato antigo)"""
+    if isinstance(raw, bytes) and raw[:1] == MSGPACK_PREFIX:
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("registro em MessagePack, mas msgpack não está instalado")
+        record = msgpack.unpackb(raw[1:], raw=False)
+        for field in COMPRESSED_FIELDS:
+            if isinstance(record.get(field), bytes):
+                record[field] = decompress_text(record[field])
+        return record
+    return json.loads(raw)
+
+
+def build_records(prompt: str, model: str, response: str, temperature: float, max_tokens: int, cache_key: str,
+                  partition: str, vector: bytes, codec_id: str, now: float, fresh_until: float, expires_at: float,
+                  namespace: str = DEFAULT_NAMESPACE):
+    """Registros (resposta, embedding) de uma entrada; o prompt vai só no do embedding"""
+    response_data = pack_record({
+        "response": response,
+        "timestamp": now,
+        "fresh_until": fresh_until,
+        "expires_at": expires_at,
+        "model": model,
+        # Parâmetros da geração, para reconstruir a entrada quando vencer
+        "params": {"temperature": temperature, "max_tokens": max_tokens},
+    })
+    embedding_data = pack_record({
+        "v": vector,
+        "codec": codec_id,
+        "prompt": prompt,
+        "model": model,
+        "partition": partition,
+        "namespace": namespace,
+        "cache_key": cache_key,
+        "timestamp": now,
+        "expires_at": expires_at,
+    })
+    return response_data, embedding_data
+
+
+def format_info() -> dict:
+    return {
+        "format": "msgpack" if use_msgpack() else "json",
+        "compression": ("zstd" if ZSTD_AVAILABLE else "zlib") if use_msgpack() else None,
+        "compress_min_bytes": CACHE_COMPRESS_MIN_BYTES,
+    }
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Pré-aquecimento do cache semântico
+
+Popula o cache a partir dos datasets de training_data/ (pares input/output,
+gravados como resposta) e de capturas de tráfego com conteúdo
+(TRAFFIC_CAPTURE_CONTENT=full), cujos prompts são gerados no Ollama. Os
+embeddings são calculados em lote e os registros gravados com pipeline;
+gravação e geração têm limites de taxa próprios para não competir com o
+tráfego real. Entradas já em cache são puladas e nada é removido para abrir
+espaço: o aquecimento para quando o orçamento de bytes (CACHE_MAX_MB) enche.
+
+Usado pelo script scripts/warm_cache.py e pelo job de boot da API
+(CACHE_WARM_ON_STARTUP=true).
+"""
+import os
+import json
+import time
+import asyncio
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.structured_logging import get_logger
+from src.cache_keys import CACHE_MAX_TEMPERATURE, DEFAULT_NAMESPACE, format_messages, get_cache_key, get_embedding_key, index_partition, param_bucket
+from src.cache_records import build_records
+from src.cache_policy import CachePolicy
+from src.semantic_index import INDEX_LOG_KEY, VectorCodec
+
+CACHE_WARM_ON_STARTUP = os.getenv("CACHE_WARM_ON_STARTUP", "false").lower() == "true"
+CACHE_WARM_SOURCES = os.getenv("CACHE_WARM_SOURCES", "training_data")      # Pastas de datasets e/ou capturas, separadas por vírgula
+CACHE_WARM_MODELS = os.getenv("CACHE_WARM_MODELS", "deepseek-coder:1.3b")  # Modelos alvo, separados por vírgula
+CACHE_WARM_RATE = float(os.getenv("CACHE_WARM_RATE", "50"))                # Entradas gravadas por segundo
+CACHE_WARM_GENERATE_RATE = float(os.getenv("CACHE_WARM_GENERATE_RATE", "0.2"))  # Gerações no Ollama por segundo (0 = não gerar)
+CACHE_WARM_BATCH_SIZE = int(os.getenv("CACHE_WARM_BATCH_SIZE", "32"))
+WARM_LOCK_KEY = "llm_cache:warming"
+
+logger = get_logger("cache_warming")
+
+
+@dataclass
+class WarmEntry:
+    prompt: str
+    model: str
+    temperature: float = 0.7
+    max_tokens: int = 512
+    response: Optional[str] = None   # None: gerar no Ollama
+
+
+def load_dataset_entries(path: str, models: List[str]) -> List[WarmEntry]:
+    """Pares input/output de training_data/*.json, para cada modelo alvo"""
+    entries = []
+    for json_file in sorted(Path(path).glob("*.json")):
+        try:
+            data = json.loads(json_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Dataset ignorado %s: %s", json_file, e)
+            continue
+        for conv in data.get("conversations", []) if isinstance(data, dict) else []:
+            if not conv.get("input") or not conv.get("output"):
+                continue
+            prompt = format_messages([{"role": "user", "content": conv["input"]}])
+            entries.extend(WarmEntry(prompt, model, response=conv["output"]) for model in models)
+    return entries
+
+
+def load_capture_entries(paths: List[str], models: List[str]) -> List[WarmEntry]:
+    """Prompts distintos de capturas de tráfego (com conteúdo), dos modelos alvo, mais frequentes primeiro"""
+    from src.traffic_capture import read_capture
+
+    counts: Dict[tuple, int] = {}
+    entries: Dict[tuple, WarmEntry] = {}
+    for entry in read_capture(paths):
+        model = entry.get("routed") or entry.get("model")
+        messages = entry.get("msgs", [])
+        if model not in models or entry.get("status", 200) != 200 or not all("content" in m for m in messages):
+            continue
+        temperature = entry.get("temp") if entry.get("temp") is not None else 0.7
+        max_tokens = entry.get("max_tokens") or 512
+        if temperature > CACHE_MAX_TEMPERATURE:
+            continue
+        prompt = format_messages(messages)
+        key = (prompt, model, param_bucket(temperature, max_tokens))
+        counts[key] = counts.get(key, 0) + 1
+        entries.setdefault(key, WarmEntry(prompt, model, temperature, max_tokens))
+    return [entries[key] for key in sorted(entries, key=lambda k: -counts[k])]
+
+
+def load_sources(sources: Iterable[str], models: List[str]) -> List[WarmEntry]:
+    """Pastas viram datasets; arquivos (.jsonl/.gz) viram capturas"""
+    entries, captures = [], []
+    for source in sources:
+        if Path(source).is_dir():
+            entries.extend(load_dataset_entries(source, models))
+        elif Path(source).exists():
+            captures.append(source)
+        else:
+            logger.warning("Fonte de aquecimento inexistente: %s", source)
+    if captures:
+        entries.extend(load_capture_entries(captures, models))
+    # Datasets repetem perguntas entre arquivos: uma entrada por chave do cache
+    unique = {}
+    for entry in entries:
+        unique.setdefault(get_cache_key(entry.prompt, entry.model, param_bucket(entry.temperature, entry.max_tokens)), entry)
+    return list(unique.values())
+
+
+class RateLimiter:
+    """Intervalo mínimo entre operações (taxa por segundo)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = 0.0
+
+    async def wait(self, count: int = 1):
+        now = time.monotonic()
+        if self.next_at > now:
+            await asyncio.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval * count
+
+
+class CacheWarmer:
+    """Grava entradas no cache em lotes, com limites de taxa"""
+
+    def __init__(self, redis_client, records_client, encode: Callable[[List[str]], Awaitable[Optional[np.ndarray]]],
+                 generate: Optional[Callable[[WarmEntry], Awaitable[Optional[str]]]] = None,
+                 codec: Optional[VectorCodec] = None, policy: Optional[CachePolicy] = None,
+                 rate: float = CACHE_WARM_RATE, generate_rate: float = CACHE_WARM_GENERATE_RATE,
+                 batch_size: int = CACHE_WARM_BATCH_SIZE, namespace: str = DEFAULT_NAMESPACE):
+        self.redis_client = redis_client
+        self.records_client = records_client
+        self.encode = encode
+        self.generate = generate if generate_rate > 0 else None
+        self.codec = codec or VectorCodec()
+        self.namespace = namespace
+        self.policy = policy or CachePolicy(namespace=namespace)
+        self.write_limiter = RateLimiter(rate)
+        self.generate_limiter = RateLimiter(generate_rate)
+        self.batch_size = batch_size
+        self.stats = {"written": 0, "skipped_cached": 0, "skipped_no_response": 0, "generated": 0, "budget_full": False}
+
+    async def warm(self, entries: List[WarmEntry]) -> dict:
+        for start in range(0, len(entries), self.batch_size):
+            if not await self._warm_batch(entries[start:start + self.batch_size]):
+                self.stats["budget_full"] = True
+                logger.info("Orçamento do cache cheio: aquecimento interrompido")
+                break
+            logger.info("Aquecimento do cache", extra={**self.stats, "progress": f"{min(start + self.batch_size, len(entries))}/{len(entries)}"})
+        return self.stats
+
+    async def _warm_batch(self, batch: List[WarmEntry]) -> bool:
+        keys = [get_cache_key(e.prompt, e.model, param_bucket(e.temperature, e.max_tokens), self.namespace) for e in batch]
+        pipe = self.records_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(key)
+        cached = await pipe.execute()
+
+        pending = []
+        for entry, key, exists in zip(batch, keys, cached):
+            if exists:
+                self.stats["skipped_cached"] += 1
+                continue
+            if entry.response is None and self.generate:
+                await self.generate_limiter.wait()
+                entry.response = await self.generate(entry)
+                if entry.response:
+                    self.stats["generated"] += 1
+            if not entry.response:
+                self.stats["skipped_no_response"] += 1
+                continue
+            pending.append((entry, key))
+        if not pending:
+            return True
+
+        # Embeddings do lote de uma vez
+        vectors = await self.encode([entry.prompt for entry, _ in pending])
+        if vectors is None:
+            raise RuntimeError("Embeddings indisponíveis")
+
+        await self.write_limiter.wait(len(pending))
+        now = time.time()
+        fresh_until = now + self.policy.ttl
+        hard_ttl = self.policy.hard_ttl(self.policy.ttl)
+        expires_at = now + hard_ttl
+        records, tracked = [], []
+        for (entry, cache_key), vector in zip(pending, vectors):
+            bucket = param_bucket(entry.temperature, entry.max_tokens)
+            reduced = self.codec.reduce(vector)
+            cache_data, embedding_data = build_records(
+                entry.prompt, entry.model, entry.response, entry.temperature, entry.max_tokens, cache_key,
+                index_partition(entry.model, bucket, self.namespace), self.codec.to_bytes(reduced), self.codec.codec_id,
+                now, fresh_until, expires_at, self.namespace
+            )
+            size = len(cache_data) + len(embedding_data)
+            if not await self.policy.has_room(self.redis_client, size + sum(t[2] for t in tracked)):
+                break
+            records.append((cache_key, cache_data, get_embedding_key(cache_key), embedding_data))
+            tracked.append((cache_key, get_embedding_key(cache_key), size))
+        if not records:
+            return False
+
+        pipe = self.records_client.pipeline(transaction=False)
+        for cache_key, cache_data, embedding_key, embedding_data in records:
+            pipe.setex(cache_key, hard_ttl, cache_data)
+            pipe.setex(embedding_key, hard_ttl, embedding_data)
+        pipe.zadd(INDEX_LOG_KEY, {embedding_key: now for _, _, embedding_key, _ in records})
+        await pipe.execute()
+        for cache_key, embedding_key, size in tracked:
+            await self.policy.track(self.redis_client, cache_key, embedding_key, size, expires_at)
+        self.stats["written"] += len(records)
+        return len(records) == len(pending)
+
+
+def warm_models() -> List[str]:
+    return [model.strip() for model in CACHE_WARM_MODELS.split(",") if model.strip()]
+
+
+def warm_sources() -> List[str]:
+    return [source.strip() for source in CACHE_WARM_SOURCES.split(",") if source.strip()]
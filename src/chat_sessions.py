@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Sessões de chat com reaproveitamento do prefixo da conversa no Ollama
+
+Modos (CHAT_SESSION_MODE):
+- "chat":    usa /api/chat com a lista de mensagens; o Ollama reaproveita o
+             cache KV do prefixo já processado da conversa
+- "context": usa /api/generate com os tokens de `context` devolvidos no turno
+             anterior, enviando apenas as mensagens novas
+- "off":     comportamento antigo (conversa achatada em um único prompt)
+"""
+import os
+import time
+import hashlib
+import json
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+CHAT_SESSION_MODE = os.getenv("CHAT_SESSION_MODE", "chat").lower()
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))   # Sessões mantidas em memória
+CHAT_SESSION_TTL = int(os.getenv("CHAT_SESSION_TTL", "1800"))   # Sessão ociosa expira em 30 min
+
+
+def conversation_hash(model: str, messages: List[Dict[str, str]]) -> str:
+    """Hash estável de uma conversa (modelo + papéis + conteúdos)"""
+    payload = json.dumps(
+        [model] + [[m["role"], m["content"]] for m in messages],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def conversation_root(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Início fixo da conversa: mensagens até a primeira do usuário (system + pergunta inicial)"""
+    for i, message in enumerate(messages):
+        if message["role"] == "user":
+            return messages[:i + 1]
+    return messages[:1]
+
+
+@dataclass
+class ChatSessionState:
+    """Estado de uma conversa já processada pelo Ollama"""
+    history_hash: str       # Hash da conversa que originou o context
+    message_count: int      # Mensagens cobertas pelo context
+    context: array          # Tokens de context do Ollama (compacto)
+    updated_at: float
+
+
+class ChatSessionStore:
+    """Mapa sessão -> context do Ollama com expiração por TTL e remoção LRU"""
+
+    def __init__(self, max_sessions: int = CHAT_SESSION_MAX, ttl: int = CHAT_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, ChatSessionState]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def session_key(self, model: str, messages: List[Dict[str, str]], session_id: Optional[str] = None) -> str:
+        """
+        Chave da sessão: o session_id explícito, ou o hash da raiz da conversa
+        (igual em todos os turnos, já que o cliente reenvia a conversa inteira);
+        também é a chave de afinidade de backend
+        """
+        if session_id:
+            return f"{model}:{session_id}"
+        return conversation_hash(model, conversation_root(messages))
+
+    def lookup(self, model: str, messages: List[Dict[str, str]], session_id: Optional[str] = None) -> Optional[ChatSessionState]:
+        """Retorna o estado reaproveitável para a conversa, se o prefixo conferir"""
+        key = self.session_key(model, messages, session_id)
+        state = self._sessions.get(key)
+
+        if state is None or time.time() - state.updated_at > self.ttl:
+            if state is not None:
+                del self._sessions[key]
+            self.misses += 1
+            return None
+
+        # O context só vale se a conversa atual começa exatamente pelo histórico armazenado
+        if (
+            state.message_count >= len(messages)
+            or conversation_hash(model, messages[:state.message_count]) != state.history_hash
+        ):
+            del self._sessions[key]
+            self.misses += 1
+            return None
+
+        self._sessions.move_to_end(key)
+        self.hits += 1
+        return state
+
+    def store(self, model: str, messages: List[Dict[str, str]], context: List[int], session_id: Optional[str] = None):
+        """Armazena o context após um turno (messages já inclui a resposta do assistente)"""
+        if not context:
+            return
+
+        history_hash = conversation_hash(model, messages)
+        key = self.session_key(model, messages, session_id)
+
+        self._sessions[key] = ChatSessionState(
+            history_hash=history_hash,
+            message_count=len(messages),
+            context=array("i", context),
+            updated_at=time.time(),
+        )
+        self._sessions.move_to_end(key)
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Estatísticas do mapa de sessões"""
+        return {
+            "mode": CHAT_SESSION_MODE,
+            "sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
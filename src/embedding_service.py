@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Microserviço interno de embeddings compartilhado pelas réplicas da API
+
+Carrega o modelo uma única vez e agrupa requisições concorrentes em lotes
+(EMBEDDING_BATCH_SIZE / EMBEDDING_BATCH_WAIT_MS). As réplicas apontam
+EMBEDDING_SERVICE_URL para cá.
+
+Uso:
+    python src/embedding_service.py --port 5100
+    python src/embedding_service.py --uds /tmp/embeddings.sock
+"""
+import sys
+import argparse
+from pathlib import Path
+from typing import List
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+# Adicionar path para importar módulos do projeto (src.*)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embeddings import EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, BatchingEncoder, load_embedding_encoder, pack_vectors
+from src.structured_logging import get_logger
+
+logger = get_logger("embedding_service")
+
+app = FastAPI(title="Embedding Service", version="1.0.0")
+encoder: BatchingEncoder = None
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+
+@app.on_event("startup")
+async def startup_event():
+    global encoder
+    logger.info("Carregando modelo de embeddings", extra={"model": EMBEDDING_MODEL_NAME, "backend": EMBEDDING_BACKEND})
+    encoder = BatchingEncoder(load_embedding_encoder())
+    encoder.start()
+    logger.info("Serviço de embeddings pronto")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if encoder:
+        await encoder.stop()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "model": EMBEDDING_MODEL_NAME, "backend": EMBEDDING_BACKEND, "batching": encoder.stats() if encoder else None}
+
+
+@app.post("/embed")
+async def embed(request: EmbedRequest):
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="texts vazio")
+    vectors = await encoder.encode(request.texts)
+    return {"model": EMBEDDING_MODEL_NAME, **pack_vectors(vectors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microserviço de embeddings")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--uds", help="Escutar num socket Unix em vez de TCP")
+    args = parser.parse_args()
+
+    if args.uds:
+        uvicorn.run(app, uds=args.uds, log_level="warning")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
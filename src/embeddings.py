@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Embeddings do cache semântico: carga do modelo, codificação em lote e cliente
+do microserviço de embeddings
+
+- Backends (EMBEDDING_BACKEND): torch, torch-int8, onnx, onnx-int8
+- `BatchingEncoder`: junta chamadas concorrentes num único `model.encode`
+  (usado pelo microserviço src/embedding_service.py)
+- `EmbeddingClient`: chama o microserviço (HTTP ou socket Unix) de forma
+  assíncrona; se ele falhar, a API volta a codificar localmente
+"""
+import os
+import time
+import base64
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+import aiohttp
+
+from src.structured_logging import get_logger
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()      # torch, torch-int8, onnx ou onnx-int8
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/embeddings-onnx")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))              # 0 = padrão do runtime
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "")        # http://host:porta ou unix:///caminho.sock
+EMBEDDING_SERVICE_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", "2.0"))
+EMBEDDING_SERVICE_RETRY_AFTER = float(os.getenv("EMBEDDING_SERVICE_RETRY_AFTER", "30"))
+EMBEDDING_LOCAL_FALLBACK = os.getenv("EMBEDDING_LOCAL_FALLBACK", "true").lower() == "true"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+logger = get_logger("embeddings")
+
+
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+
+
+class OnnxEncoder:
+    """
+    Encoder com ONNX Runtime (exportado por scripts/export_embedding_onnx.py),
+    mesma interface de `SentenceTransformer.encode`: tokenização + transformer +
+    mean pooling, sem carregar torch
+    """
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_DIR, file_name: str = "model.onnx", threads: int = EMBEDDING_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(model_dir, file_name), options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_length = int(os.getenv("EMBEDDING_MAX_LENGTH", "128"))
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        inputs = {name: tokens[name].astype(np.int64) for name in tokens if name in self.input_names}
+        hidden = self.session.run(None, inputs)[0]
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        vectors = np.concatenate([
+            self._encode_batch(batch[i:i + batch_size]) for i in range(0, len(batch), batch_size)
+        ]).astype(np.float32)
+        return vectors[0] if single else vectors
+
+
+def load_embedding_encoder(name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND):
+    """
+    Carrega o encoder de embeddings (bloqueante: pode baixar o modelo)
+
+    - torch: SentenceTransformer de referência
+    - torch-int8: quantização dinâmica int8 das camadas Linear (CPU)
+    - onnx / onnx-int8: ONNX Runtime a partir de EMBEDDING_ONNX_DIR
+    """
+    # Validar antes de carregar: um erro de digitação não deve custar a carga do modelo
+    if backend not in ONNX_FILES and backend not in ("torch", "torch-int8"):
+        raise ValueError(f"EMBEDDING_BACKEND inválido: {backend}")
+    if backend in ONNX_FILES:
+        return OnnxEncoder(EMBEDDING_ONNX_DIR, ONNX_FILES[backend])
+
+    # Import tardio: sentence_transformers/torch são pesados
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(name, device="cpu")
+    if backend == "torch-int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+    return model
+
+
+def pack_vectors(vectors: np.ndarray) -> dict:
+    """Serializa vetores float32 de forma compacta (base64) para o transporte"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    return {"shape": list(vectors.shape), "data": base64.b64encode(vectors.tobytes()).decode("ascii")}
+
+
+def unpack_vectors(payload: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32).reshape(payload["shape"])
+
+
+class BatchingEncoder:
+    """Agrupa textos de requisições concorrentes e codifica em lote numa thread"""
+
+    def __init__(self, model, batch_size: int = EMBEDDING_BATCH_SIZE, max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.texts = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        futures = []
+        loop = asyncio.get_running_loop()
+        for text in texts:
+            future = loop.create_future()
+            self._queue.put_nowait((text, future))
+            futures.append(future)
+        return np.stack(await asyncio.gather(*futures))
+
+    async def _run(self):
+        while True:
+            items = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            # Janela curta para juntar mais textos no mesmo lote
+            while len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in items]
+            try:
+                vectors = await asyncio.to_thread(self.model.encode, texts, batch_size=self.batch_size)
+                for (_, future), vector in zip(items, vectors):
+                    if not future.done():
+                        future.set_result(np.asarray(vector, dtype=np.float32))
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batches += 1
+            self.texts += len(items)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+
+class EmbeddingClient:
+    """Cliente assíncrono do microserviço de embeddings"""
+
+    def __init__(self, url: str = EMBEDDING_SERVICE_URL, timeout: float = EMBEDDING_SERVICE_TIMEOUT,
+                 retry_after: float = EMBEDDING_SERVICE_RETRY_AFTER):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def available(self) -> bool:
+        return self.enabled and time.time() >= self.down_until
+
+    def _base_url(self) -> str:
+        return "http://embedding-service" if self.url.startswith("unix://") else self.url
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Sessão criada no event loop de cada worker (nunca herdada do fork)
+        if self._session is None or self._session.closed:
+            connector = aiohttp.UnixConnector(path=self.url[len("unix://"):]) if self.url.startswith("unix://") else None
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Vetores dos textos, ou None se o serviço estiver indisponível"""
+        if not self.available():
+            return None
+        self.requests += 1
+        try:
+            async with self._get_session().post(f"{self._base_url()}/embed", json={"texts": texts}) as response:
+                response.raise_for_status()
+                return unpack_vectors(await response.json())
+        except Exception as e:
+            self.failures += 1
+            self.down_until = time.time() + self.retry_after
+            logger.warning("Serviço de embeddings indisponível, usando modelo local: %s", e)
+            return None
+
+    async def check_health(self) -> bool:
+        try:
+            async with self._get_session().get(f"{self._base_url()}/health") as response:
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        self.down_until = 0.0 if ok else time.time() + self.retry_after
+        return ok
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def status(self) -> dict:
+        return {
+            "url": self.url or None,
+            "available": self.available(),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Orçamento de erros por (modelo, backend)
+
+Cada par acumula o resultado das chamadas recentes (janela de
+ERROR_BUDGET_WINDOW segundos). Quando a taxa de erro passa de
+ERROR_BUDGET_MAX_ERROR_RATE (com ao menos ERROR_BUDGET_MIN_REQUESTS chamadas),
+o par fica aberto por ERROR_BUDGET_COOLDOWN segundos: o pool não envia mais
+esse modelo para esse backend e, sem outro nó, a chamada falha na hora em vez
+de esperar o timeout. Passado o intervalo, uma única chamada de teste decide:
+sucesso fecha o par, falha reabre com o dobro do intervalo (até
+ERROR_BUDGET_MAX_COOLDOWN). Diferente da ejeção do backend inteiro
+(BACKEND_EJECT_AFTER), cobre também o modelo ausente num nó só (HTTP 404).
+"""
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+ERROR_BUDGET_ENABLED = os.getenv("ERROR_BUDGET_ENABLED", "true").lower() == "true"
+ERROR_BUDGET_WINDOW = float(os.getenv("ERROR_BUDGET_WINDOW", "60"))             # Janela (s) das chamadas consideradas
+ERROR_BUDGET_MIN_REQUESTS = int(os.getenv("ERROR_BUDGET_MIN_REQUESTS", "3"))    # Chamadas mínimas na janela para abrir
+ERROR_BUDGET_MAX_ERROR_RATE = float(os.getenv("ERROR_BUDGET_MAX_ERROR_RATE", "0.5"))
+ERROR_BUDGET_COOLDOWN = float(os.getenv("ERROR_BUDGET_COOLDOWN", "30"))          # Tempo aberto (s)
+ERROR_BUDGET_MAX_COOLDOWN = float(os.getenv("ERROR_BUDGET_MAX_COOLDOWN", "300"))
+ERROR_BUDGET_PROBE_TIMEOUT = float(os.getenv("ERROR_BUDGET_PROBE_TIMEOUT", "180"))  # Teste sem resultado libera outro
+
+
+class _PairState:
+    __slots__ = ("samples", "open_until", "tripped", "cooldown", "probe_started", "trips")
+
+    def __init__(self):
+        self.samples: Deque[Tuple[float, bool]] = deque()
+        self.open_until = 0.0
+        self.tripped = False
+        self.cooldown = ERROR_BUDGET_COOLDOWN
+        self.probe_started = 0.0
+        self.trips = 0
+
+
+class ErrorBudget:
+    """Abre (modelo, backend) com taxa de erro alta; reabre aos poucos com chamadas de teste"""
+
+    def __init__(self, enabled: bool = ERROR_BUDGET_ENABLED):
+        self.enabled = enabled
+        self.pairs: Dict[Tuple[str, str], _PairState] = {}
+
+    def _state(self, backend: str, model: str) -> _PairState:
+        return self.pairs.setdefault((backend, model or ""), _PairState())
+
+    def is_open(self, backend: str, model: str) -> bool:
+        """Par bloqueado: dentro do intervalo ou com a chamada de teste em andamento"""
+        state = self.pairs.get((backend, model or ""))
+        if not self.enabled or state is None or not state.tripped:
+            return False
+        now = time.time()
+        return state.open_until > now or now - state.probe_started < ERROR_BUDGET_PROBE_TIMEOUT
+
+    def acquire(self, backend: str, model: str):
+        """Chamada escolhida para o par; se ele estiver reabrindo, é a chamada de teste"""
+        state = self.pairs.get((backend, model or ""))
+        if state is not None and state.tripped:
+            state.probe_started = time.time()
+
+    def release(self, backend: str, model: str):
+        """Chamada cancelada sem resultado: se era a de teste, libera outra"""
+        state = self.pairs.get((backend, model or ""))
+        if state is not None and state.tripped:
+            state.probe_started = 0.0
+
+    def record(self, backend: str, model: str, ok: bool):
+        if not self.enabled:
+            return
+        state = self._state(backend, model)
+        now = time.time()
+        if state.tripped:
+            # Resultado da chamada de teste
+            state.probe_started = 0.0
+            if ok:
+                state.tripped = False
+                state.samples.clear()
+                state.cooldown = ERROR_BUDGET_COOLDOWN
+            elif state.open_until <= now:
+                state.cooldown = min(ERROR_BUDGET_MAX_COOLDOWN, state.cooldown * 2)
+                state.open_until = now + state.cooldown
+            return
+
+        state.samples.append((now, ok))
+        while state.samples and state.samples[0][0] < now - ERROR_BUDGET_WINDOW:
+            state.samples.popleft()
+        errors = sum(1 for _, success in state.samples if not success)
+        if len(state.samples) >= ERROR_BUDGET_MIN_REQUESTS and errors / len(state.samples) >= ERROR_BUDGET_MAX_ERROR_RATE:
+            state.tripped = True
+            state.trips += 1
+            state.open_until = now + state.cooldown
+            state.samples.clear()
+
+    def stats(self) -> list:
+        now = time.time()
+        return [
+            {
+                "backend": backend,
+                "model": model,
+                "open": state.tripped and state.open_until > now,
+                "open_for": round(max(0.0, state.open_until - now), 1) if state.tripped else 0.0,
+                "recent_errors": sum(1 for _, ok in state.samples if not ok),
+                "recent_requests": len(state.samples),
+                "trips": state.trips,
+            }
+            for (backend, model), state in sorted(self.pairs.items())
+        ]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Configuração do gunicorn para o modo com vários workers
+
+O app é importado no master (preload_app) e os modelos somente leitura
+(SentenceTransformer e fine-tuned) são carregados lá antes do fork. Os workers
+herdam essas páginas por copy-on-write; gc.freeze() impede que o coletor de lixo
+dos workers toque nos objetos herdados e force a cópia das páginas.
+Redis, health checks e sessões HTTP continuam sendo criados por worker.
+As métricas Prometheus usam o modo multiprocesso (PROMETHEUS_MULTIPROC_DIR,
+definido aqui antes de o app ser importado) para /metrics somar os workers.
+
+Uso:
+    gunicorn -c src/gunicorn_conf.py src.simple_llm_server:app
+    API_WORKERS=4 python src/simple_llm_server.py
+"""
+import gc
+import os
+import glob
+import tempfile
+import multiprocessing
+
+# Antes de importar o app: prometheus_client escolhe o armazenamento dos valores na importação
+# (preload_app importa o app antes dos hooks do master: limpar os arquivos da execução anterior já aqui)
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "llm-api-metrics")
+)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+for _stale in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+    os.remove(_stale)
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '5000')}"
+workers = int(os.getenv("API_WORKERS", "0")) or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("API_WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
+# Threads de inferência por worker (evita workers * núcleos threads disputando CPU)
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0")) or max(1, multiprocessing.cpu_count() // workers)
+
+
+def when_ready(server):
+    """No master, após importar o app e antes do fork: carregar modelos e congelar o heap"""
+    from src.simple_llm_server import preload_shared_models
+    preload_shared_models()
+    gc.collect()
+    gc.freeze()
+    server.log.info("Modelos pré-carregados no master; %s workers compartilham via copy-on-write", workers)
+
+
+def child_exit(server, worker):
+    """Worker encerrado: seus gauges "livesum" deixam de contar"""
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+    except ImportError:
+        pass
+
+
+def post_fork(server, worker):
+    try:
+        import torch
+        torch.set_num_threads(TORCH_THREADS_PER_WORKER)
+    except ImportError:
+        pass
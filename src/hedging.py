@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Política de requisições "hedged" (duplicadas) para reduzir a latência de cauda
+
+Se uma geração não produz o primeiro token dentro de um atraso baseado no
+percentil do tempo até o primeiro token (TTFT), uma cópia é enviada para outro
+backend; vence quem responder primeiro. Um orçamento limita a fração de
+requisições que podem ser duplicadas.
+"""
+import os
+from collections import deque
+from typing import Deque, Dict
+
+import numpy as np
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))     # Percentil do TTFT usado como atraso
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2.0"))      # Atraso mínimo (s)
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "10.0"))  # Atraso sem amostras suficientes
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))           # Fração máxima de requisições duplicadas
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "3"))  # Duplicações acumuláveis no orçamento
+
+
+class HedgePolicy:
+    """Atraso de hedge por modelo (percentil do TTFT) e orçamento tipo token bucket"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self.ttft: Dict[str, Deque[float]] = {}
+        self.tokens = HEDGE_BUDGET_BURST
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record_ttft(self, model: str, seconds: float):
+        """Registra o tempo até o primeiro token de uma geração"""
+        self.ttft.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def delay_for(self, model: str) -> float:
+        """Atraso antes de duplicar: percentil do TTFT recente do modelo"""
+        samples = self.ttft.get(model)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, float(np.percentile(samples, HEDGE_PERCENTILE)))
+
+    def on_request(self):
+        """Cada requisição credita uma fração de duplicação ao orçamento"""
+        self.requests += 1
+        self.tokens = min(HEDGE_BUDGET_BURST, self.tokens + HEDGE_BUDGET)
+
+    def try_acquire(self) -> bool:
+        """Consome uma duplicação do orçamento, se houver"""
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        self.hedged += 1
+        return True
+
+    def release(self):
+        """Devolve ao orçamento uma duplicação que não chegou a ser enviada"""
+        self.tokens = min(HEDGE_BUDGET_BURST, self.tokens + 1.0)
+        self.hedged -= 1
+
+    def record_win(self):
+        """A cópia duplicada respondeu antes da original"""
+        self.hedge_wins += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": HEDGE_ENABLED,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_ratio": self.hedged / self.requests if self.requests else 0.0,
+            "delays": {model: round(self.delay_for(model), 3) for model in self.ttft},
+        }
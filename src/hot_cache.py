@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Camada quente do cache, em memória de cada processo, na frente do Redis
+
+Guarda respostas recentes (por chave de cache) e embeddings de prompts
+recentes, com limite em bytes e remoção LRU ou LFU aproximada. Quando uma
+entrada é sobrescrita ou removida numa réplica, a invalidação é publicada no
+canal Redis `llm_cache:invalidate` e as demais réplicas descartam a cópia local.
+"""
+import os
+import sys
+import time
+import json
+import uuid
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from src.structured_logging import get_logger
+
+HOT_CACHE_ENABLED = os.getenv("HOT_CACHE_ENABLED", "true").lower() == "true"
+HOT_CACHE_MAX_MB = float(os.getenv("HOT_CACHE_MAX_MB", "64"))
+HOT_CACHE_POLICY = os.getenv("HOT_CACHE_POLICY", "lru").lower()          # lru ou lfu
+HOT_CACHE_LFU_SAMPLE = int(os.getenv("HOT_CACHE_LFU_SAMPLE", "8"))       # Candidatos avaliados por remoção (lfu)
+INVALIDATION_CHANNEL = "llm_cache:invalidate"
+
+logger = get_logger("hot_cache")
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "hits")
+
+    def __init__(self, value, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.hits = 0
+
+
+class BoundedCache:
+    """Mapa limitado por bytes com expiração e remoção LRU/LFU"""
+
+    def __init__(self, max_bytes: int, policy: str = HOT_CACHE_POLICY):
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            self.discard(key)
+            self.misses += 1
+            return None
+        entry.hits += 1
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: str, value, size: int, expires_at: float):
+        if size > self.max_bytes:
+            return
+        self.discard(key)
+        self.entries[key] = _Entry(value, expires_at, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._evict()
+
+    def discard(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def _evict(self):
+        if self.policy == "lfu":
+            # LFU aproximado: entre as N entradas menos recentes, a menos usada
+            sample = []
+            for key, entry in self.entries.items():
+                sample.append((entry.hits, key))
+                if len(sample) >= HOT_CACHE_LFU_SAMPLE:
+                    break
+            victim = min(sample)[1]
+        else:
+            victim = next(iter(self.entries))
+        self.discard(victim)
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+class HotCache:
+    """Respostas e embeddings recentes do processo, invalidados via pub/sub"""
+
+    def __init__(self, max_mb: float = HOT_CACHE_MAX_MB, enabled: bool = HOT_CACHE_ENABLED, policy: str = HOT_CACHE_POLICY):
+        self.enabled = enabled
+        max_bytes = int(max_mb * 1024 * 1024)
+        # 3/4 para respostas, 1/4 para embeddings de prompts
+        self.responses = BoundedCache(max_bytes * 3 // 4, policy)
+        self.embeddings = BoundedCache(max_bytes // 4, policy)
+        self.origin = uuid.uuid4().hex
+        self.invalidations_received = 0
+        self._listener: Optional[asyncio.Task] = None
+        self.on_invalidate: Optional[Callable[[dict], None]] = None
+
+    # Respostas
+    def get_response(self, cache_key: str) -> Optional[str]:
+        return self.responses.get(cache_key) if self.enabled else None
+
+    def response_fresh_until(self, cache_key: str) -> Optional[float]:
+        """Frescor da resposta guardada (sem contar como acesso)"""
+        entry = self.responses.entries.get(cache_key)
+        return entry.expires_at if entry is not None else None
+
+    def put_response(self, cache_key: str, response: str, expires_at: float):
+        if self.enabled:
+            self.responses.put(cache_key, response, sys.getsizeof(response) + 100, expires_at)
+
+    # Embeddings de prompts (evita recodificar prompts repetidos)
+    def get_embedding(self, prompt: str) -> Optional[np.ndarray]:
+        return self.embeddings.get(prompt_key(prompt)) if self.enabled else None
+
+    def put_embedding(self, prompt: str, vector: np.ndarray, ttl: float):
+        if self.enabled:
+            self.embeddings.put(prompt_key(prompt), vector, vector.nbytes + 150, time.time() + ttl)
+
+    def invalidate(self, cache_keys: Iterable[str] = (), everything: bool = False):
+        """Invalidação local"""
+        if everything:
+            self.responses.clear()
+            return
+        for key in cache_keys:
+            self.responses.discard(key)
+
+    async def publish_invalidation(self, redis_client, cache_keys: Iterable[str] = (), embedding_keys: Iterable[str] = (),
+                                   everything: bool = False, model: Optional[str] = None):
+        """Invalida localmente e avisa as outras réplicas"""
+        message = {
+            "origin": self.origin,
+            "cache_keys": list(cache_keys),
+            "embedding_keys": list(embedding_keys),
+            "all": everything,
+            "model": model,
+        }
+        self.invalidate(message["cache_keys"], everything)
+        try:
+            await redis_client.publish(INVALIDATION_CHANNEL, json.dumps(message))
+        except Exception as e:
+            logger.warning("Falha ao publicar invalidação: %s", e)
+
+    def _handle(self, raw: str):
+        message = json.loads(raw)
+        if message.get("origin") == self.origin:
+            return
+        self.invalidations_received += 1
+        self.invalidate(message.get("cache_keys", []), message.get("all", False))
+        if self.on_invalidate:
+            self.on_invalidate(message)
+
+    async def _listen(self, redis_client):
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        try:
+                            self._handle(message["data"])
+                        except (ValueError, KeyError) as e:
+                            logger.debug("Invalidação inválida: %s", e)
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except Exception as e:
+                # Sem o canal, a cópia local pode ficar velha: esvaziar e reconectar
+                logger.warning("Canal de invalidação caiu, limpando camada quente: %s", e)
+                self.invalidate(everything=True)
+                await asyncio.sleep(5)
+
+    def start_listener(self, redis_client):
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen(redis_client))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "policy": self.responses.policy,
+            "responses": self.responses.stats(),
+            "embeddings": self.embeddings.stats(),
+            "invalidations_received": self.invalidations_received,
+        }
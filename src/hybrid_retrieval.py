@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Recuperação híbrida (léxica + densa) do cache semântico
+
+- Índice invertido BM25 por partição do índice semântico, sobre os prompts
+  em cache (minúsculas, sem acentos, sem os rótulos User/System/Assistant).
+  Termos presentes em mais de SEMANTIC_LEXICAL_MAX_DF das entradas são
+  ignorados, como stopwords
+- Pré-filtro: os SEMANTIC_LEXICAL_CANDIDATES prompts com maior BM25 viram os
+  candidatos da busca densa, em vez da partição inteira
+- Fusão: a similaridade densa (cosseno) ganha um bônus pela cobertura léxica
+  normalizada (0 a 1, BM25 dividido pelo BM25 do prompt consigo mesmo):
+  `densa + SEMANTIC_LEXICAL_WEIGHT * max(0, léxica - 0.5)`. Paráfrases com
+  vocabulário parecido ganham; sem termos em comum, vale só o cosseno
+- Limiar adaptativo por modelo: o ruído (pontuação entre a consulta e
+  entradas sorteadas da partição, que quase nunca são equivalentes) é
+  acompanhado por média/variância exponenciais e o limiar calibrado é média +
+  SEMANTIC_THRESHOLD_Z desvios. Ele só sobe acima do pedido quando o ruído é
+  alto; descer abaixo dele (prompts longos, ruído baixo) é opcional, até
+  SEMANTIC_THRESHOLD_MAX_DROP (padrão 0). Prompts curtos (poucos termos) nunca
+  ficam abaixo do pedido e exigem SEMANTIC_SHORT_PROMPT_PENALTY a mais
+"""
+import os
+import re
+import math
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SEMANTIC_RETRIEVAL = os.getenv("SEMANTIC_RETRIEVAL", "hybrid").lower()                  # hybrid ou dense
+SEMANTIC_LEXICAL_CANDIDATES = int(os.getenv("SEMANTIC_LEXICAL_CANDIDATES", "128"))      # Candidatos da busca densa
+SEMANTIC_LEXICAL_MIN_ENTRIES = int(os.getenv("SEMANTIC_LEXICAL_MIN_ENTRIES", "2048"))   # Abaixo disso: também varredura densa completa
+SEMANTIC_LEXICAL_MAX_DF = float(os.getenv("SEMANTIC_LEXICAL_MAX_DF", "0.25"))           # Fração de documentos acima da qual o termo é ignorado
+SEMANTIC_LEXICAL_WEIGHT = float(os.getenv("SEMANTIC_LEXICAL_WEIGHT", "0.1"))            # Peso do ajuste léxico sobre o cosseno
+SEMANTIC_ADAPTIVE_THRESHOLD = os.getenv("SEMANTIC_ADAPTIVE_THRESHOLD", "true").lower() == "true"
+SEMANTIC_THRESHOLD_Z = float(os.getenv("SEMANTIC_THRESHOLD_Z", "3.0"))                  # Desvios acima do ruído
+SEMANTIC_THRESHOLD_MAX = float(os.getenv("SEMANTIC_THRESHOLD_MAX", "0.97"))
+SEMANTIC_THRESHOLD_MAX_DROP = float(os.getenv("SEMANTIC_THRESHOLD_MAX_DROP", "0"))     # Quanto o limiar pode descer (prompts longos; 0 = nunca)
+SEMANTIC_SHORT_PROMPT_TERMS = int(os.getenv("SEMANTIC_SHORT_PROMPT_TERMS", "4"))        # Prompts com menos termos são "curtos"
+SEMANTIC_SHORT_PROMPT_PENALTY = float(os.getenv("SEMANTIC_SHORT_PROMPT_PENALTY", "0.05"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+NOISE_SAMPLES_PER_SEARCH = 4
+NOISE_MIN_SAMPLES = 50
+NOISE_DECAY = 0.01
+LEXICAL_MIN_COVERAGE = 0.3     # Melhor candidato léxico abaixo disso: também varredura densa completa
+
+_TOKEN = re.compile(r"\w+")
+_ROLE_TOKENS = {"system", "user", "assistant"}
+
+
+def tokenize(text: str) -> List[str]:
+    """Termos do prompt: minúsculas, sem acentos, sem os rótulos de papel de format_messages"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [token for token in _TOKEN.findall(text) if len(token) > 1 and token not in _ROLE_TOKENS]
+
+
+class LexicalIndex:
+    """Índice invertido BM25 das linhas de uma partição"""
+
+    def __init__(self, capacity: int = 1024):
+        self.postings: Dict[str, List[int]] = {}
+        self.frequencies: Dict[str, List[int]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.doc_len = np.zeros(capacity, dtype=np.float32)
+        self.docs = 0
+        self.total_len = 0
+
+    def add(self, row: int, text: str):
+        """Indexa a linha nova `row` (linhas já indexadas não mudam de prompt)"""
+        if row < self.docs:
+            return
+        if row >= len(self.doc_len):
+            grown = np.zeros(max(row + 1, len(self.doc_len) * 2), dtype=np.float32)
+            grown[:self.docs] = self.doc_len[:self.docs]
+            self.doc_len = grown
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            self.postings.setdefault(token, []).append(row)
+            self.frequencies.setdefault(token, []).append(count)
+        self.doc_len[row] = len(tokens)
+        self.docs = row + 1
+        self.total_len += len(tokens)
+
+    def remap(self, mapping: np.ndarray):
+        """Renumera as linhas depois da compactação (mapping[antiga] = nova, ou -1)"""
+        for token in list(self.postings):
+            rows = mapping[np.asarray(self.postings[token])]
+            keep = rows >= 0
+            if not keep.any():
+                del self.postings[token], self.frequencies[token]
+                continue
+            self.postings[token] = rows[keep].tolist()
+            self.frequencies[token] = np.asarray(self.frequencies[token])[keep].tolist()
+        alive = mapping[:self.docs] >= 0
+        lengths = self.doc_len[:self.docs][alive]
+        self.doc_len = np.zeros(max(1024, len(lengths) * 2), dtype=np.float32)
+        self.doc_len[:len(lengths)] = lengths
+        self.docs = len(lengths)
+        self.total_len = int(lengths.sum())
+        self._arrays.clear()
+
+    def _posting_arrays(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        rows = self.postings[token]
+        cached = self._arrays.get(token)
+        if cached is None or len(cached[0]) != len(rows):
+            cached = (np.asarray(rows, dtype=np.int64), np.asarray(self.frequencies[token], dtype=np.float32))
+            self._arrays[token] = cached
+        return cached
+
+    def scores(self, terms: List[str], size: int, max_df: float = SEMANTIC_LEXICAL_MAX_DF) -> Tuple[Optional[np.ndarray], float]:
+        """
+        BM25 da consulta contra as `size` primeiras linhas e o BM25 máximo possível
+        (a consulta contra si mesma). (None, 0) se todos os termos forem comuns demais
+        """
+        if not self.docs:
+            return None, 0.0
+        avgdl = max(1.0, self.total_len / self.docs)
+        df_limit = max(max_df * self.docs, 50)
+        query_len = len(terms)
+        rows_parts, weights_parts = [], []
+        best = 0.0
+        for term in set(terms):
+            df = len(self.postings.get(term, ()))
+            if df > df_limit:
+                continue
+            # Termo ausente do índice conta no máximo: nenhuma entrada o cobre
+            idf = math.log(1 + (self.docs - df + 0.5) / (df + 0.5))
+            best += idf * (BM25_K1 + 1) / (1 + BM25_K1 * (1 - BM25_B + BM25_B * query_len / avgdl))
+            if not df:
+                continue
+            rows, tf = self._posting_arrays(term)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[rows] / avgdl)
+            rows_parts.append(rows)
+            weights_parts.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+        if not best:
+            return None, 0.0
+        if not rows_parts:
+            return np.zeros(size), best
+        rows = np.concatenate(rows_parts)
+        weights = np.concatenate(weights_parts)
+        inside = rows < size
+        return np.bincount(rows[inside], weights=weights[inside], minlength=size)[:size], best
+
+
+class AdaptiveThreshold:
+    """Piso de ruído por modelo (média e variância exponenciais) para calibrar o limiar"""
+
+    def __init__(self, enabled: bool = SEMANTIC_ADAPTIVE_THRESHOLD, max_drop: float = SEMANTIC_THRESHOLD_MAX_DROP):
+        self.enabled = enabled
+        self.max_drop = max(0.0, max_drop)
+        self.noise: Dict[str, List[float]] = {}   # modelo -> [média, variância, amostras]
+
+    def observe(self, model: str, scores: np.ndarray):
+        """Pontuações entre a consulta e entradas sorteadas (não equivalentes, em geral)"""
+        if not self.enabled:
+            return
+        state = self.noise.setdefault(model, [0.0, 0.0, 0])
+        for score in scores:
+            score = float(score)
+            if state[2] == 0:
+                state[0] = score
+            else:
+                decay = max(NOISE_DECAY, 1.0 / (state[2] + 1))
+                delta = score - state[0]
+                state[0] += decay * delta
+                state[1] = (1 - decay) * (state[1] + decay * delta * delta)
+            state[2] += 1
+
+    def calibrated(self, model: str) -> Optional[float]:
+        """Média + Z desvios do ruído do modelo (None enquanto há poucas amostras)"""
+        state = self.noise.get(model)
+        if not state or state[2] < NOISE_MIN_SAMPLES:
+            return None
+        return state[0] + SEMANTIC_THRESHOLD_Z * math.sqrt(state[1])
+
+    def threshold(self, model: str, base: float, query_terms: Optional[int] = None) -> float:
+        """Limiar para o modelo; `query_terms` = termos distintos da consulta (None = desconhecido)"""
+        if not self.enabled:
+            return base
+        short = query_terms is not None and query_terms < SEMANTIC_SHORT_PROMPT_TERMS
+        threshold = base
+        calibrated = self.calibrated(model)
+        if calibrated is not None:
+            # Ruído alto obriga a subir; descer só se configurado e só para prompts longos
+            threshold = max(base if short else base - self.max_drop, calibrated)
+        if short:
+            threshold += SEMANTIC_SHORT_PROMPT_PENALTY
+        return min(max(base, SEMANTIC_THRESHOLD_MAX), threshold)
+
+    def stats(self) -> dict:
+        result = {}
+        for model, (mean, var, samples) in sorted(self.noise.items()):
+            calibrated = self.calibrated(model)
+            result[model] = {
+                "noise_mean": round(mean, 4),
+                "noise_std": round(math.sqrt(var), 4),
+                "samples": samples,
+                "calibrated": round(calibrated, 4) if calibrated is not None else None,
+            }
+        return result
+
+
+def fuse(dense: np.ndarray, lexical: Optional[np.ndarray]) -> np.ndarray:
+    """Cosseno com bônus pela cobertura léxica acima da metade (nunca penaliza a falta de termos em comum)"""
+    if lexical is None:
+        return dense
+    return np.minimum(1.0, dense + SEMANTIC_LEXICAL_WEIGHT * np.maximum(0.0, lexical - 0.5))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Métricas Prometheus da API (endpoint /metrics)
+
+Histogramas de latência por etapa da requisição, contadores de cache por
+camada, erros de backend e profundidade da fila, rotulados por modelo.
+Se `prometheus_client` não estiver instalado, as métricas viram no-op.
+Com vários workers (gunicorn), PROMETHEUS_MULTIPROC_DIR ativa o modo
+multiprocesso: cada worker grava os valores em arquivos e /metrics agrega
+todos, em vez de devolver só os contadores do worker que atendeu.
+"""
+import os
+import time
+import inspect
+from contextlib import contextmanager
+from typing import Optional
+
+from src.tracing import start_span
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+    class _NoopMetric:
+        """Substituto quando prometheus_client não está disponível"""
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def labels(self, *args, **kwargs):
+            return self
+
+        def observe(self, *args, **kwargs):
+            pass
+
+        def inc(self, *args, **kwargs):
+            pass
+
+        def set(self, *args, **kwargs):
+            pass
+
+    Counter = Gauge = Histogram = _NoopMetric
+
+    def generate_latest(*args, **kwargs) -> bytes:
+        return b"# prometheus_client nao instalado\n"
+
+# Buckets cobrindo desde lookups em memória (ms) até gerações longas (minutos)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180)
+
+STAGE_LATENCY = Histogram(
+    "llm_stage_duration_seconds",
+    "Latência de cada etapa da requisição",
+    ["stage", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_LATENCY = Histogram(
+    "llm_redis_command_duration_seconds",
+    "Latência de ida e volta dos comandos Redis",
+    ["command"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "Latência total de /v1/chat/completions",
+    ["model", "backend"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_HITS = Counter("llm_cache_hits_total", "Acertos de cache por camada", ["tier", "model"])
+CACHE_MISSES = Counter("llm_cache_misses_total", "Falhas de cache por camada", ["tier", "model"])
+CACHE_ADMISSIONS = Counter("llm_cache_admissions_total", "Decisões de admissão de novas entradas no cache", ["decision"])
+CACHE_EVICTIONS = Counter("llm_cache_evictions_total", "Entradas removidas para respeitar o orçamento de bytes do cache")
+CACHE_REFRESHES = Counter("llm_cache_refreshes_total", "Reconstruções em segundo plano de entradas vencidas", ["result"])
+CACHE_BUCKET_LOOKUPS = Counter("llm_cache_bucket_lookups_total", "Consultas ao cache por faixa de parâmetros de geração", ["bucket", "result"])
+BACKEND_ERRORS = Counter("llm_backend_errors_total", "Erros de chamadas aos backends Ollama", ["backend", "model"])
+BACKEND_SHORT_CIRCUITS = Counter("llm_backend_short_circuits_total", "Chamadas recusadas na hora pelo orçamento de erros", ["model"])
+FALLBACK_RESPONSES = Counter("llm_fallback_responses_total", "Respostas de reserva após falha do modelo pedido", ["model", "kind"])
+# livesum: no modo multiprocesso, soma dos workers vivos
+QUEUE_DEPTH = Gauge("llm_queue_depth", "Requisições em fila/andamento por modelo", ["model"], multiprocess_mode="livesum")
+BACKEND_OUTSTANDING = Gauge("llm_backend_outstanding", "Requisições em andamento por backend", ["backend"], multiprocess_mode="livesum")
+
+
+def observe_stage(stage: str, model: str, seconds: float):
+    """Registra a duração de uma etapa"""
+    STAGE_LATENCY.labels(stage=stage, model=model or "unknown").observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage: str, model: Optional[str] = None):
+    """Mede a duração do bloco como uma etapa da requisição"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, model, time.perf_counter() - start)
+
+
+class InstrumentedRedis:
+    """Proxy do cliente Redis assíncrono que mede (e rastreia) cada comando aguardado"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            # Pipelines também são "awaitable", mas são devolvidos intactos
+            if not inspect.iscoroutine(result):
+                return result
+
+            async def timed():
+                start = time.perf_counter()
+                with start_span(f"redis.{name}", {"db.system": "redis", "db.operation": name.upper()}):
+                    try:
+                        return await result
+                    finally:
+                        REDIS_LATENCY.labels(command=name).observe(time.perf_counter() - start)
+            return timed()
+
+        return wrapper
+
+
+def render_metrics() -> bytes:
+    """Exposição no formato texto do Prometheus (agregando os workers no modo multiprocesso)"""
+    if METRICS_AVAILABLE and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
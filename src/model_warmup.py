@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Gerenciador de aquecimento (warm-up) e keep-alive dos modelos Ollama
+Mantém residentes os modelos DeepSeek usados pelo servidor, ajustando o
+keep_alive de cada modelo conforme o tráfego recente
+"""
+import os
+import time
+import asyncio
+import aiohttp
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from src.structured_logging import get_logger
+
+# Configurações de warm-up / keep-alive
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_MODELS = [
+    m.strip() for m in os.getenv("WARMUP_MODELS", "deepseek-coder:1.3b,deepseek-coder:6.7b").split(",") if m.strip()
+]
+# Por padrão os modelos aquecidos ficam residentes: com keep_alive de 5 min (o padrão do Ollama)
+# eles descarregariam no primeiro intervalo ocioso e a primeira requisição voltaria a pagar a carga
+KEEP_ALIVE_PINNED = [
+    m.strip() for m in os.getenv("KEEP_ALIVE_PINNED", ",".join(WARMUP_MODELS) if WARMUP_ENABLED else "").split(",") if m.strip()
+]
+KEEP_ALIVE_MIN = int(os.getenv("KEEP_ALIVE_MIN", "1800"))       # Modelo sem tráfego (não fixo): 30 min
+KEEP_ALIVE_MAX = int(os.getenv("KEEP_ALIVE_MAX", "3600"))       # Modelo muito usado: 1 h
+KEEP_ALIVE_WINDOW = int(os.getenv("KEEP_ALIVE_WINDOW", "900"))  # Janela de tráfego analisada (s)
+KEEP_ALIVE_HOT_REQUESTS = int(os.getenv("KEEP_ALIVE_HOT_REQUESTS", "30"))  # Requisições na janela para keep_alive máximo
+
+logger = get_logger("warmup")
+
+
+class ModelWarmupManager:
+    """
+    Controla warm-up na inicialização, keep_alive por modelo e pré-carregamento
+    do modelo previsto para as próximas requisições
+    """
+
+    def __init__(self, backend_pool, history_size: int = 200):
+        self.backend_pool = backend_pool
+        self.history: Deque[Tuple[float, str]] = deque(maxlen=history_size)
+        self.pending: Counter = Counter()        # Requisições em fila/andamento por modelo
+        self.resident_until: Dict[str, float] = {}
+        self.warmup_times: Dict[str, float] = {}
+        self._preloading: set = set()
+
+    # ------------------------------------------------------------------
+    # Tráfego
+    # ------------------------------------------------------------------
+    def begin_request(self, model: str):
+        """Registra uma requisição que vai usar o modelo"""
+        self.pending[model] += 1
+        self.history.append((time.time(), model))
+
+    def end_request(self, model: str):
+        """Registra o fim de uma requisição e atualiza a residência do modelo"""
+        if self.pending[model] > 0:
+            self.pending[model] -= 1
+        if self.pending[model] == 0:
+            del self.pending[model]
+        self.resident_until[model] = time.time() + self.keep_alive_for(model)
+
+    def recent_requests(self, model: str) -> int:
+        """Quantidade de requisições do modelo dentro da janela de tráfego"""
+        cutoff = time.time() - KEEP_ALIVE_WINDOW
+        return sum(1 for ts, m in self.history if m == model and ts >= cutoff)
+
+    def keep_alive_for(self, model: str) -> int:
+        """Calcula o keep_alive (segundos) proporcional ao tráfego recente; -1 mantém o modelo fixo"""
+        if model in KEEP_ALIVE_PINNED:
+            return -1
+        ratio = min(1.0, self.recent_requests(model) / max(1, KEEP_ALIVE_HOT_REQUESTS))
+        return int(KEEP_ALIVE_MIN + (KEEP_ALIVE_MAX - KEEP_ALIVE_MIN) * ratio)
+
+    def is_resident(self, model: str) -> bool:
+        """Estimativa local de que o modelo continua carregado no Ollama"""
+        if model in KEEP_ALIVE_PINNED and model in self.resident_until:
+            return True
+        return self.resident_until.get(model, 0) > time.time()
+
+    def predict_next_model(self) -> Optional[str]:
+        """Prevê o modelo das próximas requisições (fila atual, senão histórico recente)"""
+        if self.pending:
+            return self.pending.most_common(1)[0][0]
+
+        cutoff = time.time() - KEEP_ALIVE_WINDOW
+        recent = Counter(m for ts, m in self.history if ts >= cutoff)
+        if recent:
+            return recent.most_common(1)[0][0]
+        return None
+
+    # ------------------------------------------------------------------
+    # Chamadas ao Ollama
+    # ------------------------------------------------------------------
+    async def list_installed_models(self) -> List[str]:
+        """Lista modelos instalados em algum backend do pool"""
+        await self.backend_pool.check_health()
+        installed = set()
+        for backend in self.backend_pool.candidates():
+            installed.update(backend.installed)
+        return sorted(installed)
+
+    async def _load_on_backend(self, session: aiohttp.ClientSession, url: str, payload: dict) -> bool:
+        try:
+            async with session.post(
+                f"{url}/api/generate",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=180)
+            ) as response:
+                if response.status != 200:
+                    logger.error("Falha ao carregar modelo", extra={"model": payload["model"], "backend": url, "status": response.status})
+                    return False
+                await response.read()
+                return True
+        except Exception as e:
+            logger.error("Exceção ao carregar modelo %s em %s: %s", payload["model"], url, e)
+            return False
+
+    async def load_model(self, model: str) -> bool:
+        """Carrega o modelo (prompt vazio) em todos os backends que o atendem, aplicando o keep_alive"""
+        urls = self.backend_pool.urls_for_model(model)
+        if model in self._preloading or not urls:
+            return False
+
+        self._preloading.add(model)
+        keep_alive = self.keep_alive_for(model)
+        payload = {"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive}
+
+        try:
+            start_time = time.time()
+            async with aiohttp.ClientSession() as session:
+                results = await asyncio.gather(*(self._load_on_backend(session, url, payload) for url in urls))
+            if not any(results):
+                return False
+
+            elapsed = time.time() - start_time
+            self.warmup_times[model] = elapsed
+            self.resident_until[model] = time.time() + (keep_alive if keep_alive > 0 else 10 ** 9)
+            logger.info("Modelo carregado", extra={"model": model, "backends": sum(results), "elapsed": round(elapsed, 2), "keep_alive": keep_alive})
+            return True
+        finally:
+            self._preloading.discard(model)
+
+    async def warm_up(self):
+        """Aquece os modelos configurados que estão instalados no Ollama"""
+        if not WARMUP_ENABLED:
+            return
+
+        installed = await self.list_installed_models()
+        for model in WARMUP_MODELS:
+            if model not in installed:
+                logger.warning("Modelo não instalado, ignorando warm-up", extra={"model": model})
+                continue
+            await self.load_model(model)
+
+    def schedule_preload(self, model: Optional[str] = None):
+        """
+        Pré-carrega em segundo plano o modelo informado (ou o previsto para as
+        próximas requisições), se ainda não estiver residente
+        """
+        if not WARMUP_ENABLED:
+            return
+
+        model = model or self.predict_next_model()
+        if not model or self.is_resident(model) or model in self._preloading:
+            return
+        asyncio.create_task(self.load_model(model))
+
+    def status(self) -> dict:
+        """Resumo do estado de warm-up para o health check"""
+        return {
+            "enabled": WARMUP_ENABLED,
+            "predicted_next": self.predict_next_model(),
+            "pending": dict(self.pending),
+            "models": {
+                model: {
+                    "resident": self.is_resident(model),
+                    "keep_alive": self.keep_alive_for(model),
+                    "recent_requests": self.recent_requests(model),
+                    "last_warmup_seconds": self.warmup_times.get(model),
+                }
+                for model in sorted(set(WARMUP_MODELS) | set(self.resident_until))
+            },
+        }
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Cache negativo: falhas recentes de geração, com TTL curto
+
+Quando a geração de um prompt falha (timeout, backend sobrecarregado, modelo
+ausente), o erro fica memorizado no Redis por NEGATIVE_CACHE_TTL segundos,
+compartilhado entre as réplicas. A mesma requisição nesse intervalo não volta
+ao backend: vai direto para o modelo reserva (OLLAMA_FALLBACK_MODELS) ou para
+uma resposta aproximada do cache semântico (FALLBACK_SIMILARITY), e só
+devolve o erro memorizado se nenhum dos dois servir.
+"""
+import os
+from typing import Dict, Optional
+
+from src.structured_logging import get_logger
+
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "15"))     # Segundos (0 = desligado)
+OLLAMA_FALLBACK_MODELS = os.getenv("OLLAMA_FALLBACK_MODELS", "deepseek-coder:6.7b=deepseek-coder:1.3b")  # modelo=reserva, por vírgula
+FALLBACK_SIMILARITY = float(os.getenv("FALLBACK_SIMILARITY", "0.75"))  # Similaridade mínima da resposta aproximada (0 = desligado)
+
+logger = get_logger("negative_cache")
+
+
+def parse_fallback_models(spec: str) -> Dict[str, str]:
+    """"a=b,c=d" -> {"a": "b", "c": "d"}"""
+    models = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, fallback = item.split("=", 1)
+            if model.strip() and fallback.strip():
+                models[model.strip()] = fallback.strip()
+    return models
+
+
+class NegativeCache:
+    """Erros recentes por chave de requisição (llm_cache:error:<chave>)"""
+
+    def __init__(self, ttl: int = NEGATIVE_CACHE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.stored = 0
+
+    @staticmethod
+    def _key(cache_key: str) -> str:
+        return f"llm_cache:error:{cache_key}"
+
+    async def get(self, redis_client, cache_key: str) -> Optional[str]:
+        if not self.ttl or not redis_client:
+            return None
+        try:
+            error = await redis_client.get(self._key(cache_key))
+        except Exception as e:
+            logger.debug("Falha ao consultar cache negativo: %s", e)
+            return None
+        if error is not None:
+            self.hits += 1
+        return error
+
+    async def put(self, redis_client, cache_key: str, error: str):
+        if not self.ttl or not redis_client:
+            return
+        try:
+            await redis_client.set(self._key(cache_key), error, ex=self.ttl)
+            self.stored += 1
+        except Exception as e:
+            logger.debug("Falha ao gravar no cache negativo: %s", e)
+
+    def stats(self) -> dict:
+        return {"ttl": self.ttl, "hits": self.hits, "stored": self.stored}
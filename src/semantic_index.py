@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Índice vetorial em memória do cache semântico
+
+- Vetores reduzidos (truncamento ou PCA) e gravados no Redis em float16
+  compacto (base64) em vez de listas JSON de 384 floats
+- Busca em dois estágios: varredura grossa em códigos int8 (quantização
+  escalar por vetor) e rerank exato, em float16, dos melhores candidatos
+- Sincronização entre réplicas pelo sorted set `embedding_index:log`
+  (score = horário de escrita): cada processo lê só as chaves novas, com MGET.
+  Cada sync relê os últimos SEMANTIC_SYNC_OVERLAP segundos do log (réplica com
+  relógio atrasado, gravação concluída depois da leitura) e pula as chaves já
+  aplicadas com a mesma pontuação
+- Snapshots periódicos em disco (arrays .npy + metadados): no boot o índice é
+  mapeado com mmap e só o log posterior ao snapshot é relido do Redis
+- Recuperação híbrida (SEMANTIC_RETRIEVAL=hybrid): um índice BM25 dos prompts
+  escolhe os candidatos da busca densa e ajusta a pontuação; o limiar se
+  adapta por modelo (ver src/hybrid_retrieval.py)
+"""
+import os
+import time
+import json
+import glob
+import shutil
+import base64
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.structured_logging import get_logger
+from src.cache_keys import partition_model
+from src.cache_records import unpack_record
+from src.hybrid_retrieval import (
+    LEXICAL_MIN_COVERAGE, NOISE_SAMPLES_PER_SEARCH, SEMANTIC_LEXICAL_CANDIDATES, SEMANTIC_LEXICAL_MIN_ENTRIES,
+    SEMANTIC_RETRIEVAL, AdaptiveThreshold, LexicalIndex, fuse, tokenize,
+)
+
+EMBEDDING_REDUCTION = os.getenv("EMBEDDING_REDUCTION", "none").lower()   # none, truncate ou pca
+EMBEDDING_DIMS = int(os.getenv("EMBEDDING_DIMS", "0"))                    # 0 = manter a dimensão do modelo
+EMBEDDING_PCA_FILE = os.getenv("EMBEDDING_PCA_FILE", "models/embedding_pca.npz")
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "int8").lower()   # int8 ou none (busca grossa)
+SEMANTIC_RERANK_CANDIDATES = int(os.getenv("SEMANTIC_RERANK_CANDIDATES", "32"))
+SEMANTIC_SYNC_INTERVAL = float(os.getenv("SEMANTIC_SYNC_INTERVAL", "1.0"))
+SEMANTIC_SYNC_OVERLAP = float(os.getenv("SEMANTIC_SYNC_OVERLAP", "5.0"))   # Segundos do log relidos a cada sync
+SEMANTIC_SNAPSHOT_DIR = os.getenv("SEMANTIC_SNAPSHOT_DIR", "data/semantic_index")   # Vazio = sem snapshots
+SEMANTIC_SNAPSHOT_INTERVAL = float(os.getenv("SEMANTIC_SNAPSHOT_INTERVAL", "300"))
+
+INDEX_LOG_KEY = "embedding_index:log"
+SCAN_CHUNK = 8192
+MGET_CHUNK = 500
+
+logger = get_logger("semantic_index")
+
+
+class VectorCodec:
+    """Redução de dimensão + serialização compacta dos embeddings"""
+
+    def __init__(self, reduction: str = EMBEDDING_REDUCTION, dims: int = EMBEDDING_DIMS, pca_file: str = EMBEDDING_PCA_FILE):
+        self.reduction = reduction
+        self.dims = dims
+        self.mean = None
+        self.components = None
+        if reduction == "pca":
+            data = np.load(pca_file)
+            self.mean = data["mean"].astype(np.float32)
+            components = data["components"].astype(np.float32)
+            self.components = components[:dims] if dims else components
+            self.dims = self.components.shape[0]
+        elif reduction not in ("none", "truncate"):
+            raise ValueError(f"EMBEDDING_REDUCTION inválido: {reduction}")
+
+    @property
+    def codec_id(self) -> str:
+        """Identifica o formato; registros de outro codec são ignorados"""
+        return "full" if self.reduction == "none" or not self.dims else f"{self.reduction}{self.dims}"
+
+    def reduce(self, vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.reduction == "pca":
+            vector = (vector - self.mean) @ self.components.T
+        elif self.reduction == "truncate" and self.dims:
+            vector = vector[:self.dims]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, reduced: np.ndarray) -> str:
+        return base64.b64encode(self.to_bytes(reduced)).decode("ascii")
+
+    def to_bytes(self, reduced: np.ndarray) -> bytes:
+        return reduced.astype(np.float16).tobytes()
+
+    def decode(self, data) -> np.ndarray:
+        """Vetor de bytes float16 crus (MessagePack) ou em base64 (JSON)"""
+        raw = data if isinstance(data, bytes) else base64.b64decode(data)
+        return np.frombuffer(raw, dtype=np.float16)
+
+    def vector_from_record(self, record: dict) -> Optional[np.ndarray]:
+        """Vetor reduzido de um registro do Redis (aceita o formato JSON antigo)"""
+        if "v" in record:
+            return self.decode(record["v"]) if record.get("codec") == self.codec_id else None
+        if "embedding" in record:
+            return self.reduce(np.array(record["embedding"], dtype=np.float32)).astype(np.float16)
+        return None
+
+
+def quantize_int8(vectors: np.ndarray):
+    """Quantização escalar simétrica por vetor: códigos int8 + escala"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+@dataclass
+class SemanticMatch:
+    cache_key: str
+    similarity: float
+    prompt: str
+    embedding_key: str
+    dense: float = 0.0         # Cosseno puro (similarity inclui o ajuste léxico)
+    lexical: float = 0.0       # Cobertura léxica normalizada (0 a 1)
+
+
+class _Partition:
+    """Vetores de um modelo, em arrays pré-alocados que dobram de tamanho"""
+
+    def __init__(self, dims: int, capacity: int = 1024, lexical: bool = True):
+        self.dims = dims
+        self.size = 0
+        self.dead = 0
+        self.vectors = np.zeros((capacity, dims), dtype=np.float16)
+        self.codes = np.zeros((capacity, dims), dtype=np.int8)
+        self.scales = np.zeros(capacity, dtype=np.float32)
+        self.expires = np.zeros(capacity, dtype=np.float64)
+        self.keys: List[str] = []          # chave do embedding
+        self.cache_keys: List[str] = []
+        self.prompts: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.lexical: Optional[LexicalIndex] = LexicalIndex(capacity) if lexical else None
+
+    def rebuild_lexical(self):
+        """Reconstrói o índice BM25 a partir dos prompts (após carregar um snapshot)"""
+        self.lexical = LexicalIndex(max(1024, self.size))
+        for row, prompt in enumerate(self.prompts[:self.size]):
+            self.lexical.add(row, prompt)
+
+    def _grow(self):
+        capacity = self.vectors.shape[0] * 2
+        for name in ("vectors", "codes"):
+            grown = np.zeros((capacity, self.dims), dtype=getattr(self, name).dtype)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+        for name in ("scales", "expires"):
+            grown = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, key: str, vector: np.ndarray, cache_key: str, prompt: str, expires_at: float):
+        codes, scales = quantize_int8(vector)
+        row = self.rows.get(key)
+        if row is None:
+            if self.size == self.vectors.shape[0]:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.keys.append(key)
+            self.cache_keys.append(cache_key)
+            self.prompts.append(prompt)
+            self.rows[key] = row
+        else:
+            if self.expires[row] == 0:
+                self.dead -= 1
+            self.cache_keys[row] = cache_key
+            self.prompts[row] = prompt
+        if self.lexical is not None:
+            self.lexical.add(row, prompt)
+        self.vectors[row] = vector
+        self.codes[row] = codes[0]
+        self.scales[row] = scales[0]
+        self.expires[row] = expires_at
+
+    def remove(self, key: str):
+        row = self.rows.get(key)
+        if row is not None and self.expires[row] != 0:
+            self.expires[row] = 0
+            self.dead += 1
+
+    def compact(self):
+        """Remove linhas mortas/expiradas quando passam de metade do índice"""
+        now = time.time()
+        alive = np.nonzero(self.expires[:self.size] > now)[0]
+        if self.size - len(alive) < max(1024, self.size // 2):
+            return
+        if self.lexical is not None:
+            mapping = np.full(self.size, -1, dtype=np.int64)
+            mapping[alive] = np.arange(len(alive))
+            self.lexical.remap(mapping)
+        self.vectors[:len(alive)] = self.vectors[alive]
+        self.codes[:len(alive)] = self.codes[alive]
+        self.scales[:len(alive)] = self.scales[alive]
+        self.expires[:len(alive)] = self.expires[alive]
+        self.keys = [self.keys[i] for i in alive]
+        self.cache_keys = [self.cache_keys[i] for i in alive]
+        self.prompts = [self.prompts[i] for i in alive]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.size = len(alive)
+        self.dead = 0
+
+    def coarse_scores(self, query: np.ndarray, quantized: bool) -> np.ndarray:
+        """Similaridade aproximada com todas as linhas (int8), em blocos"""
+        scores = np.empty(self.size, dtype=np.float32)
+        if quantized:
+            for start in range(0, self.size, SCAN_CHUNK):
+                end = min(start + SCAN_CHUNK, self.size)
+                scores[start:end] = (self.codes[start:end].astype(np.float32) @ query) * self.scales[start:end]
+        else:
+            for start in range(0, self.size, SCAN_CHUNK):
+                end = min(start + SCAN_CHUNK, self.size)
+                scores[start:end] = self.vectors[start:end].astype(np.float32) @ query
+        return scores
+
+
+class SemanticIndex:
+    """Índice dos embeddings do cache semântico, particionado por modelo (e faixa de parâmetros)"""
+
+    def __init__(self, codec: Optional[VectorCodec] = None, rerank_candidates: int = SEMANTIC_RERANK_CANDIDATES,
+                 quantization: str = EMBEDDING_QUANTIZATION, sync_interval: float = SEMANTIC_SYNC_INTERVAL,
+                 retrieval: str = SEMANTIC_RETRIEVAL, lexical_candidates: int = SEMANTIC_LEXICAL_CANDIDATES,
+                 sync_overlap: float = SEMANTIC_SYNC_OVERLAP):
+        self.codec = codec or VectorCodec()
+        self.rerank_candidates = rerank_candidates
+        self.quantized = quantization == "int8"
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.hybrid = retrieval == "hybrid"
+        self.lexical_candidates = lexical_candidates
+        self.thresholds = AdaptiveThreshold()
+        self.full_scans = 0
+        self._rng = np.random.default_rng()
+        self.partitions: Dict[str, _Partition] = {}
+        self.key_model: Dict[str, str] = {}
+        self.last_log_score = 0.0
+        self.log_seen: Dict[str, float] = {}   # Chaves da janela de sobreposição já aplicadas -> pontuação
+        self.last_sync = 0.0
+        self.searches = 0
+        self.snapshot_loaded: Optional[dict] = None
+        self.snapshot_saved: Optional[float] = None
+
+    def add(self, key: str, model: str, vector: np.ndarray, cache_key: str, prompt: str, expires_at: float):
+        """Adiciona (ou atualiza) um vetor já reduzido"""
+        partition = self.partitions.get(model)
+        if partition is None:
+            partition = self.partitions[model] = _Partition(len(vector), lexical=self.hybrid)
+        elif len(vector) != partition.dims:
+            return  # Dimensão diferente (codec mudou): ignorar
+        partition.add(key, vector, cache_key, prompt, expires_at)
+        self.key_model[key] = model
+
+    def add_record(self, key: str, record: dict, ttl: float) -> bool:
+        """Adiciona a partir de um registro `embedding:*` do Redis"""
+        vector = self.codec.vector_from_record(record)
+        if vector is None:
+            return False
+        expires_at = record.get("expires_at") or record.get("timestamp", time.time()) + ttl
+        self.add(key, record.get("partition", record["model"]), vector, record["cache_key"], record.get("prompt", ""), expires_at)
+        return True
+
+    def remove(self, key: str):
+        model = self.key_model.pop(key, None)
+        if model in self.partitions:
+            self.partitions[model].remove(key)
+
+    def extend(self, key: str, expires_at: float):
+        """Atualiza a expiração de uma entrada (TTL estendido por acertos)"""
+        model = self.key_model.get(key)
+        partition = self.partitions.get(model)
+        row = partition.rows.get(key) if partition else None
+        if row is not None and partition.expires[row] != 0:
+            partition.expires[row] = expires_at
+
+    def search(self, model: str, query: np.ndarray, threshold: float, text: str = "") -> Optional[SemanticMatch]:
+        """
+        Candidatos pelo BM25 do prompt `text` (modo híbrido) ou pela varredura int8,
+        similaridade exata nos candidatos e limiar adaptado ao modelo
+        """
+        partition = self.partitions.get(model)
+        if partition is None or partition.size == 0:
+            return None
+        self.searches += 1
+        size = partition.size
+        alive = partition.expires[:size] > time.time()
+
+        terms = tokenize(text) if text else []
+        lexical, best_lexical = None, 0.0
+        candidates = np.empty(0, dtype=np.int64)
+        if self.hybrid and terms and partition.lexical is not None:
+            lexical, best_lexical = partition.lexical.scores(terms, size)
+        if lexical is not None:
+            lexical[~alive] = 0
+            matched = int(np.count_nonzero(lexical))
+            k = min(self.lexical_candidates, matched)
+            if k:
+                candidates = np.argpartition(-lexical, k - 1)[:k]
+            lexical = np.clip(lexical / best_lexical, 0.0, 1.0) if best_lexical else None
+        # Poucos candidatos léxicos (ou nenhum bom): a paráfrase pode não ter termos em comum
+        if (lexical is None or size < SEMANTIC_LEXICAL_MIN_ENTRIES or len(candidates) < self.rerank_candidates
+                or float(lexical[candidates].max()) < LEXICAL_MIN_COVERAGE):
+            self.full_scans += 1
+            scores = partition.coarse_scores(query, self.quantized)
+            scores[~alive] = -np.inf
+            k = min(self.rerank_candidates, size)
+            coarse = np.argpartition(-scores, k - 1)[:k]
+            candidates = np.union1d(candidates, coarse[np.isfinite(scores[coarse])])
+        if len(candidates) == 0:
+            return None
+
+        dense = partition.vectors[candidates].astype(np.float32) @ query
+        fused = fuse(dense, lexical[candidates] if lexical is not None else None)
+        best = int(np.argmax(fused))
+        row = int(candidates[best])
+
+        # Piso de ruído do modelo: entradas sorteadas da partição contra a consulta
+        model_name = partition_model(model)
+        sample = self._rng.integers(0, size, NOISE_SAMPLES_PER_SEARCH)
+        sample = sample[alive[sample] & (sample != row)]
+        if len(sample):
+            noise = partition.vectors[sample].astype(np.float32) @ query
+            self.thresholds.observe(model_name, fuse(noise, lexical[sample] if lexical is not None else None))
+
+        similarity = float(fused[best])
+        if similarity < self.thresholds.threshold(model_name, threshold, len(set(terms)) if text else None):
+            return None
+        return SemanticMatch(partition.cache_keys[row], similarity, partition.prompts[row], partition.keys[row],
+                             dense=float(dense[best]), lexical=float(lexical[row]) if lexical is not None else 0.0)
+
+    async def sync(self, redis_client, ttl: float, force: bool = False, records_client=None) -> int:
+        """
+        Lê do Redis as entradas escritas (por qualquer réplica) desde a última sincronização;
+        os registros binários são lidos por `records_client` (sem decode_responses)
+        """
+        records_client = records_client or redis_client
+        now = time.time()
+        if not force and now - self.last_sync < self.sync_interval:
+            return 0
+        self.last_sync = now
+
+        # Relê a janela de sobreposição: pontuações são relógios de cada réplica, não uma sequência
+        entries = await redis_client.zrangebyscore(INDEX_LOG_KEY, max(0.0, self.last_log_score - self.sync_overlap),
+                                                   "+inf", withscores=True)
+        entries = [(key, score) for key, score in entries if self.log_seen.get(key) != score]
+        if not entries:
+            return 0
+        keys = [key for key, _ in entries]
+        added = 0
+        for start in range(0, len(keys), MGET_CHUNK):
+            chunk = keys[start:start + MGET_CHUNK]
+            for key, raw in zip(chunk, await records_client.mget(chunk)):
+                if raw is None:
+                    self.remove(key)
+                    continue
+                try:
+                    added += self.add_record(key, unpack_record(raw), ttl)
+                except (ValueError, KeyError) as e:
+                    logger.debug("Registro de embedding inválido %s: %s", key, e)
+        self.last_log_score = max(self.last_log_score, max(score for _, score in entries))
+        cutoff = self.last_log_score - self.sync_overlap
+        self.log_seen = {key: score for key, score in self.log_seen.items() if score >= cutoff}
+        self.log_seen.update((key, score) for key, score in entries if score >= cutoff)
+        for partition in self.partitions.values():
+            partition.compact()
+        return added
+
+    def snapshot_data(self) -> dict:
+        """Cópia das linhas vivas (rápida, no event loop); a gravação vai para uma thread"""
+        now = time.time()
+        partitions = {}
+        for name, partition in self.partitions.items():
+            alive = np.nonzero(partition.expires[:partition.size] > now)[0]
+            if len(alive) == 0:
+                continue
+            partitions[name] = {
+                "vectors": partition.vectors[alive],
+                "codes": partition.codes[alive],
+                "scales": partition.scales[alive],
+                "expires": partition.expires[alive],
+                "keys": [partition.keys[i] for i in alive],
+                "cache_keys": [partition.cache_keys[i] for i in alive],
+                "prompts": [partition.prompts[i] for i in alive],
+            }
+        return {"taken_at": now, "last_log_score": self.last_log_score, "codec": self.codec.codec_id, "partitions": partitions}
+
+    def write_snapshot(self, data: dict, directory: str = SEMANTIC_SNAPSHOT_DIR, keep: int = 2) -> str:
+        """Grava o snapshot num diretório novo e troca o ponteiro LATEST de forma atômica"""
+        os.makedirs(directory, exist_ok=True)
+        name = f"snapshot-{int(data['taken_at'] * 1000)}-{os.getpid()}"
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        os.makedirs(tmp_path, exist_ok=True)
+        meta = {key: data[key] for key in ("taken_at", "last_log_score", "codec")}
+        meta["partitions"] = {}
+        for i, (partition_name, part) in enumerate(data["partitions"].items()):
+            prefix = f"p{i}"
+            for array in ("vectors", "codes", "scales", "expires"):
+                np.save(os.path.join(tmp_path, f"{prefix}_{array}.npy"), part[array])
+            with open(os.path.join(tmp_path, f"{prefix}_keys.json"), "w", encoding="utf-8") as f:
+                json.dump({"keys": part["keys"], "cache_keys": part["cache_keys"], "prompts": part["prompts"]}, f, ensure_ascii=False)
+            meta["partitions"][partition_name] = {"prefix": prefix, "rows": len(part["keys"])}
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+        latest_tmp = os.path.join(directory, f".LATEST.{os.getpid()}")
+        with open(latest_tmp, "w") as f:
+            f.write(name)
+        os.replace(latest_tmp, os.path.join(directory, "LATEST"))
+
+        # Manter só os mais recentes (réplicas podem estar lendo o anterior)
+        for old in sorted(glob.glob(os.path.join(directory, "snapshot-*")), key=os.path.getmtime)[:-keep]:
+            shutil.rmtree(old, ignore_errors=True)
+        self.snapshot_saved = data["taken_at"]
+        return os.path.join(directory, name)
+
+    def snapshot_age(self, directory: str = SEMANTIC_SNAPSHOT_DIR) -> Optional[float]:
+        """Idade do último snapshot gravado por qualquer processo (None se não houver)"""
+        try:
+            return time.time() - os.path.getmtime(os.path.join(directory, "LATEST"))
+        except OSError:
+            return None
+
+    def load_snapshot(self, directory: str = SEMANTIC_SNAPSHOT_DIR) -> int:
+        """Carrega o último snapshot (arrays mapeados com mmap copy-on-write); devolve as linhas carregadas"""
+        try:
+            with open(os.path.join(directory, "LATEST")) as f:
+                path = os.path.join(directory, f.read().strip())
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if meta.get("codec") != self.codec.codec_id:
+            logger.warning("Snapshot do índice com outro codec, ignorado", extra={"snapshot": meta.get("codec"), "codec": self.codec.codec_id})
+            return 0
+
+        loaded = 0
+        for partition_name, info in meta["partitions"].items():
+            prefix = os.path.join(path, info["prefix"])
+            with open(f"{prefix}_keys.json", encoding="utf-8") as f:
+                ids = json.load(f)
+            vectors = np.load(f"{prefix}_vectors.npy", mmap_mode="c")
+            partition = _Partition(vectors.shape[1], capacity=1, lexical=False)
+            partition.vectors = vectors
+            partition.codes = np.load(f"{prefix}_codes.npy", mmap_mode="c")
+            partition.scales = np.load(f"{prefix}_scales.npy", mmap_mode="c")
+            partition.expires = np.load(f"{prefix}_expires.npy", mmap_mode="c")
+            partition.keys, partition.cache_keys, partition.prompts = ids["keys"], ids["cache_keys"], ids["prompts"]
+            partition.rows = {key: row for row, key in enumerate(partition.keys)}
+            partition.size = len(partition.keys)
+            if self.hybrid:
+                partition.rebuild_lexical()
+            self.partitions[partition_name] = partition
+            for key in partition.keys:
+                self.key_model[key] = partition_name
+            loaded += partition.size
+
+        # Só o que foi escrito depois do snapshot precisa ser relido do Redis
+        self.last_log_score = meta["last_log_score"]
+        self.snapshot_loaded = {"path": path, "taken_at": meta["taken_at"], "entries": loaded}
+        return loaded
+
+    def stats(self) -> dict:
+        return {
+            "codec": self.codec.codec_id,
+            "quantization": "int8" if self.quantized else "none",
+            "entries": {model: p.size - p.dead for model, p in self.partitions.items()},
+            "bytes": sum(p.vectors.nbytes + p.codes.nbytes for p in self.partitions.values()),
+            "searches": self.searches,
+            "retrieval": "hybrid" if self.hybrid else "dense",
+            "full_scans": self.full_scans,
+            "lexical_terms": sum(len(p.lexical.postings) for p in self.partitions.values() if p.lexical is not None),
+            "thresholds": self.thresholds.stats(),
+            "snapshot_loaded": self.snapshot_loaded,
+            "snapshot_saved": self.snapshot_saved,
+        }
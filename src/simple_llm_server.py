@@ -8,20 +8,50 @@ import os
 import time
 import uuid
 import asyncio
-import aiohttp
-import hashlib
-import json
 import numpy as np
 import redis.asyncio as redis
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-from sentence_transformers import SentenceTransformer
+from typing import List, Literal, Optional, Dict, Any
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import uvicorn
 import requests
+import sys
+from pathlib import Path
+
+# Adicionar path para importar módulos do projeto (src.*)
+current_dir = Path(__file__).parent
+project_root = current_dir.parent
+sys.path.insert(0, str(project_root))
+
+from src.structured_logging import get_logger, log_payload, request_id_var
+from src.tracing import setup_tracing, start_span, current_span
+from src.model_warmup import ModelWarmupManager
+from src.chat_sessions import CHAT_SESSION_MODE, ChatSessionStore
+from src.backend_pool import BackendPool
+from src.traffic_capture import TrafficRecorder
+from src.startup import StartupOrchestrator
+from src.semantic_index import INDEX_LOG_KEY, SEMANTIC_SNAPSHOT_DIR, SEMANTIC_SNAPSHOT_INTERVAL, SemanticIndex
+from src.hot_cache import HotCache
+from src.cache_policy import CACHE_HITS_FLUSH_INTERVAL, CachePolicy
+from src.cache_keys import (
+    DEFAULT_NAMESPACE, BucketStats, cache_plan, format_messages, get_cache_key, get_embedding_key, index_partition,
+    key_namespace, param_bucket
+)
+from src.cache_namespaces import CacheNamespaces, resolve_namespace
+from src.negative_cache import FALLBACK_SIMILARITY, OLLAMA_FALLBACK_MODELS, NegativeCache, parse_fallback_models
+from src.cache_records import build_records, format_info, unpack_record
+from src.cache_warming import CACHE_WARM_ON_STARTUP, WARM_LOCK_KEY, CacheWarmer, load_sources, warm_models, warm_sources
+from src.embeddings import EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_LOCAL_FALLBACK, EmbeddingClient, load_embedding_encoder
+from src.metrics import (
+    CACHE_HITS, CACHE_MISSES, CACHE_REFRESHES, FALLBACK_RESPONSES, QUEUE_DEPTH, BACKEND_OUTSTANDING, REQUEST_LATENCY,
+    CONTENT_TYPE_LATEST, InstrumentedRedis, observe_stage, render_metrics, stage_timer
+)
+
+logger = get_logger("server")
+setup_tracing()
 
 # Configuração Redis
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -38,6 +68,8 @@ class ChatCompletionRequest(BaseModel):
     temperature: float = 0.7
     max_tokens: int = 512
     stream: bool = False
+    session_id: Optional[str] = None  # Identificador opcional da conversa (reuso de context)
+    cache_control: Optional[Literal["default", "no-cache", "no-store", "bypass"]] = None  # Uso do cache nesta requisição
 
 class ChatCompletionResponse(BaseModel):
     id: str
@@ -51,32 +83,46 @@ class ChatCompletionResponse(BaseModel):
 API_KEY = os.getenv("API_KEY", "dfdjhasdfgldfugydlsuiflhgd")
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")  # Ollama configurável via env
 
-# Carregar modelo fine-tuned se disponível
+# Pool de backends Ollama (OLLAMA_BACKENDS / OLLAMA_BACKENDS_FILE; padrão: apenas OLLAMA_URL)
+backend_pool = BackendPool(OLLAMA_URL)
+
+# Gerenciador de warm-up e keep-alive dos modelos
+warmup_manager = ModelWarmupManager(backend_pool)
+
+# Mapa sessão -> context do Ollama para conversas com vários turnos
+chat_session_store = ChatSessionStore()
+
+# Captura amostrada de requisições para replay (TRAFFIC_CAPTURE_ENABLED)
+traffic_recorder = TrafficRecorder()
+
+# Componentes pesados carregados em segundo plano no startup
+startup = StartupOrchestrator()
+
+# Modelo fine-tuned (carregado por load_fine_tuned_model, fora do import)
 fine_tuned_model = None
-try:
-    import sys
-    from pathlib import Path
-    
-    # Adicionar path para importar módulos de fine-tuning
-    current_dir = Path(__file__).parent
-    project_root = current_dir.parent
-    sys.path.insert(0, str(project_root))
-    
-    # Verificar se existe modelo fine-tuned
-    fine_tuned_path = current_dir / "current_fine_tuned_model.pkl"
-    if fine_tuned_path.exists():
+
+def load_fine_tuned_model() -> bool:
+    """Carrega o modelo fine-tuned se disponível (bloqueante: executar em thread)"""
+    global fine_tuned_model
+    if fine_tuned_model is not None:
+        return True  # Já carregado no master (gunicorn preload)
+    try:
+        # Verificar se existe modelo fine-tuned
+        fine_tuned_path = current_dir / "current_fine_tuned_model.pkl"
+        if not fine_tuned_path.exists():
+            logger.info("Nenhum modelo fine-tuned encontrado, usando apenas Ollama")
+            return False
         from src.fine_tuning.real_fine_tuning import SimplifiedFineTuner
-        fine_tuned_model = SimplifiedFineTuner()
-        if fine_tuned_model.load_model(str(fine_tuned_path)):
-            print(f"✅ Modelo fine-tuned carregado: {fine_tuned_path}")
-        else:
-            fine_tuned_model = None
-            print(f"❌ Falha ao carregar modelo fine-tuned")
-    else:
-        print(f"ℹ️  Nenhum modelo fine-tuned encontrado, usando apenas Ollama")
-except Exception as e:
-    print(f"⚠️  Erro ao carregar modelo fine-tuned: {e}")
-    fine_tuned_model = None
+        model = SimplifiedFineTuner()
+        if not model.load_model(str(fine_tuned_path)):
+            logger.error("Falha ao carregar modelo fine-tuned")
+            return False
+        fine_tuned_model = model
+        logger.info("Modelo fine-tuned carregado", extra={"path": str(fine_tuned_path)})
+        return True
+    except Exception as e:
+        logger.warning("Erro ao carregar modelo fine-tuned: %s", e)
+        return False
 
 # Inicializar FastAPI
 app = FastAPI(title="Simple LLM API", version="1.0.0")
@@ -90,13 +136,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def check_ollama():
-    """Verifica se o Ollama está disponível"""
+@app.middleware("http")
+async def tracing_middleware(request: Request, call_next):
+    """Um trace por chamada de chat (continua o traceparent recebido, se houver)"""
+    if request.url.path not in ("/v1/chat/completions", "/chat/completions"):
+        return await call_next(request)
+    
+    with start_span(f"{request.method} {request.url.path}", {"http.route": request.url.path}, headers=dict(request.headers)) as span:
+        span.set_attribute("request.id", request_id_var.get())
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        return response
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Associa um ID a cada requisição (cabeçalho X-Request-ID) para correlacionar os logs"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    token = request_id_var.set(request_id)
     try:
-        response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+def check_ollama():
+    """Verifica se há algum backend Ollama disponível (estado mantido pelos health checks do pool)"""
+    return backend_pool.any_available()
 
 def try_fine_tuned_response(prompt: str) -> dict:
     """Tenta obter resposta do modelo fine-tuned primeiro"""
@@ -107,7 +173,9 @@ def try_fine_tuned_response(prompt: str) -> dict:
     
     try:
         # Usar o modelo fine-tuned para gerar resposta
-        results = fine_tuned_model.predict(prompt, top_k=1)
+        with stage_timer("fine_tuned_lookup", "fine-tuned"), start_span("try_fine_tuned_response") as span:
+            results = fine_tuned_model.predict(prompt, top_k=1)
+            span.set_attribute("fine_tuned.confidence", float(results[0].get("confidence", 0)) if results else 0.0)
         
         if results and len(results) > 0:
             best_result = results[0]
@@ -122,121 +190,316 @@ def try_fine_tuned_response(prompt: str) -> dict:
                     "fine_tuned": True
                 }
     except Exception as e:
-        print(f"⚠️  Erro no modelo fine-tuned: {e}")
+        logger.warning("Erro no modelo fine-tuned: %s", e)
     
     return None
 
 def format_messages_for_ollama(messages: List[ChatMessage]) -> str:
     """Formata mensagens para o Ollama"""
-    formatted = ""
-    
-    for msg in messages:
-        if msg.role == "system":
-            formatted += f"System: {msg.content}\n\n"
-        elif msg.role == "user":
-            formatted += f"User: {msg.content}\n\n"
-        elif msg.role == "assistant":
-            formatted += f"Assistant: {msg.content}\n\n"
-    
-    return formatted.strip()
+    return format_messages([{"role": msg.role, "content": msg.content} for msg in messages])
 
 # Cliente Redis global e modelo de embeddings
 redis_client = None
+redis_records = None  # Mesmo Redis, sem decode: registros binários do cache (src/cache_records.py)
 embedding_model = None
 
-async def init_redis():
-    """Inicializa conexão Redis e modelo de embeddings"""
-    global redis_client, embedding_model
+# Microserviço de embeddings compartilhado (EMBEDDING_SERVICE_URL), com fallback local
+embedding_client = EmbeddingClient()
+
+# Índice vetorial em memória (sincronizado pelo log embedding_index:log no Redis)
+semantic_index = SemanticIndex()
+
+# Camada quente por processo (respostas e embeddings recentes), invalidada via pub/sub
+hot_cache = HotCache()
+
+def drop_invalidated_embeddings(message: dict):
+    """Invalidação de outra réplica: tirar do índice local os embeddings removidos"""
+    for key in message.get("embedding_keys", []):
+        semantic_index.remove(key)
+
+hot_cache.on_invalidate = drop_invalidated_embeddings
+
+# TTL adaptativo, orçamento em bytes e admissão TinyLFU do cache no Redis
+cache_policy = CachePolicy(ttl=CACHE_TTL)
+# Namespaces (cabeçalho ou chave de API), cada um com cota e remoção próprias; o padrão usa cache_policy
+cache_namespaces = CacheNamespaces(cache_policy)
+hit_updates_in_flight = set()
+
+def schedule_cache_hit(policy: CachePolicy, cache_key: str, fresh_until: float, cache_info: Optional[dict] = None):
+    """
+    Conta o acerto no processo (enviado em lote por flush_cache_hits_periodically); só relê
+    e regrava a entrada quando o TTL precisa ser estendido (uma atualização por chave de cada vez)
+    """
+    policy.count_hit(cache_key)
+    if cache_key in hit_updates_in_flight or not policy.needs_extension(cache_key, fresh_until):
+        return
+    hit_updates_in_flight.add(cache_key)
+
+    async def update():
+        try:
+            info = cache_info
+            if info is None:
+                raw = await redis_records.get(cache_key)
+                if not raw:
+                    return
+                info = unpack_record(raw)
+            extended = await policy.on_hit(redis_client, redis_records, cache_key, info)
+            if extended:
+                fresh_until, expires_at, embedding_key = extended
+                hot_cache.put_response(cache_key, info["response"], fresh_until)
+                if embedding_key:
+                    semantic_index.extend(embedding_key, expires_at)
+        except Exception as e:
+            logger.debug("Falha ao registrar acerto do cache: %s", e)
+        finally:
+            hit_updates_in_flight.discard(cache_key)
+
+    asyncio.create_task(update())
+
+CACHE_REFRESH_LOCK_TTL = int(os.getenv("CACHE_REFRESH_LOCK_TTL", "120"))
+refreshes_in_flight = set()
+
+def schedule_cache_refresh(cache_key: str, cache_info: dict):
+    """Reconstrói em segundo plano uma entrada vencida (uma única geração entre todas as réplicas)"""
+    if cache_key in refreshes_in_flight:
+        return
+    refreshes_in_flight.add(cache_key)
+
+    async def refresh():
+        lock_key = f"llm_cache:refresh:{cache_key}"
+        try:
+            if not await redis_client.set(lock_key, hot_cache.origin, nx=True, ex=CACHE_REFRESH_LOCK_TTL):
+                CACHE_REFRESHES.labels(result="skipped").inc()
+                return
+            # O prompt fica só no registro do embedding (mesmo fingerprint)
+            raw = await redis_records.get(get_embedding_key(cache_key))
+            if not raw:
+                return
+            embedding_record = unpack_record(raw)
+            prompt = embedding_record["prompt"]
+            params = cache_info.get("params", {})
+            with stage_timer("cache_refresh", cache_info["model"]):
+                response, error = await call_ollama_async(
+                    prompt,
+                    cache_info["model"],
+                    params.get("temperature", 0.7),
+                    params.get("max_tokens", 512)
+                )
+            if error is None:
+                await cache_response_with_embedding(prompt, cache_info["model"], response,
+                                                    params.get("temperature", 0.7), params.get("max_tokens", 512), refresh=True,
+                                                    namespace=embedding_record.get("namespace", DEFAULT_NAMESPACE))
+                CACHE_REFRESHES.labels(result="refreshed").inc()
+                await redis_client.delete(lock_key)
+            else:
+                # A trava fica até expirar: evita martelar um backend com falha
+                CACHE_REFRESHES.labels(result="failed").inc()
+        except Exception as e:
+            CACHE_REFRESHES.labels(result="failed").inc()
+            logger.warning("Falha ao reconstruir entrada vencida do cache: %s", e)
+        finally:
+            refreshes_in_flight.discard(cache_key)
+
+    asyncio.create_task(refresh())
+
+async def init_redis() -> bool:
+    """Inicializa conexão Redis"""
+    global redis_client, redis_records
     try:
-        redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+        if REDIS_URL.startswith("fakeredis://"):
+            # Redis em memória (benchmarks/testes locais, requer o pacote fakeredis)
+            import fakeredis
+            server = fakeredis.FakeServer()
+            raw_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+            records_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=False)
+        else:
+            raw_client = redis.from_url(REDIS_URL, decode_responses=True)
+            records_client = redis.from_url(REDIS_URL, decode_responses=False)
+        redis_client = InstrumentedRedis(raw_client)
+        redis_records = InstrumentedRedis(records_client)
         await redis_client.ping()
-        print(f"🟢 [REDIS] Conectado ao Redis em {REDIS_URL}")
+        logger.info("Conectado ao Redis", extra={"redis_url": REDIS_URL})
+        await cache_namespaces.check_memory(redis_client)
         
-        # Inicializar modelo de embeddings (leve e rápido)
-        print("🧠 [EMBEDDINGS] Carregando modelo semântico...")
-        embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        print("✅ [EMBEDDINGS] Modelo semântico carregado")
+        # Carregar o índice semântico: snapshot em disco + log do Redis posterior a ele
+        restored = 0
+        if SEMANTIC_SNAPSHOT_DIR and not semantic_index.partitions:
+            restored = await asyncio.to_thread(semantic_index.load_snapshot)
+        loaded = await semantic_index.sync(redis_client, CACHE_TTL, force=True, records_client=redis_records)
+        logger.info("Índice semântico carregado", extra={"snapshot_entries": restored, "entries": loaded})
         
+        # Invalidações publicadas pelas outras réplicas
+        hot_cache.start_listener(redis_client)
+        if SEMANTIC_SNAPSHOT_DIR:
+            asyncio.create_task(snapshot_semantic_index_periodically())
+        asyncio.create_task(flush_cache_hits_periodically())
+        return True
     except Exception as e:
-        print(f"🔴 [INIT] Erro ao inicializar: {e}")
+        logger.error("Erro ao conectar ao Redis: %s", e)
         redis_client = None
+        return False
+
+async def save_semantic_index_snapshot():
+    """Grava o snapshot do índice (cópia no event loop, escrita em disco numa thread)"""
+    if not semantic_index.partitions:
+        return
+    data = semantic_index.snapshot_data()
+    path = await asyncio.to_thread(semantic_index.write_snapshot, data)
+    logger.info("Snapshot do índice semântico gravado", extra={"path": path, "entries": sum(len(p["keys"]) for p in data["partitions"].values())})
+
+async def snapshot_semantic_index_periodically():
+    while True:
+        await asyncio.sleep(SEMANTIC_SNAPSHOT_INTERVAL)
+        # Outro worker/réplica no mesmo diretório gravou há pouco: não repetir
+        age = semantic_index.snapshot_age()
+        if age is not None and age < SEMANTIC_SNAPSHOT_INTERVAL * 0.9:
+            continue
+        try:
+            await save_semantic_index_snapshot()
+        except Exception as e:
+            logger.warning("Falha ao gravar snapshot do índice semântico: %s", e)
+
+async def flush_cache_hits():
+    """Envia ao Redis os acertos acumulados de cada namespace (um pipeline por namespace)"""
+    for policy in list(cache_namespaces.policies.values()):
+        try:
+            await policy.flush_hits(redis_client)
+        except Exception as e:
+            logger.debug("Falha ao enviar acertos do cache: %s", e)
+
+async def flush_cache_hits_periodically():
+    while True:
+        await asyncio.sleep(CACHE_HITS_FLUSH_INTERVAL)
+        await flush_cache_hits()
+
+async def load_embedding_model() -> bool:
+    """Carrega o modelo de embeddings numa thread (o cache semântico fica inativo até lá)"""
+    global embedding_model
+    if embedding_client.enabled:
+        service_ok = await embedding_client.check_health()
+        logger.info("Serviço de embeddings", extra={"url": embedding_client.url, "available": service_ok})
+        if not EMBEDDING_LOCAL_FALLBACK:
+            return service_ok
+    if embedding_model is not None:
+        return True  # Já carregado no master (gunicorn preload)
+    try:
+        logger.info("Carregando modelo semântico", extra={"model": EMBEDDING_MODEL_NAME, "backend": EMBEDDING_BACKEND})
+        embedding_model = await asyncio.to_thread(load_embedding_encoder)
+        logger.info("Modelo semântico carregado")
+        return True
+    except Exception as e:
+        logger.error("Erro ao carregar modelo de embeddings: %s", e)
         embedding_model = None
+        return False
+
+def embeddings_available() -> bool:
+    """Há como gerar embeddings (serviço compartilhado ou modelo local)"""
+    return embedding_model is not None or embedding_client.available()
+
+async def encode_text(text: str) -> Optional[np.ndarray]:
+    """Embedding do texto: microserviço compartilhado primeiro, modelo local como fallback"""
+    if embedding_client.enabled:
+        vectors = await embedding_client.encode([text])
+        if vectors is not None:
+            return vectors[0]
+    if embedding_model is None:
+        return None
+    return embedding_model.encode(text)
 
-def cosine_similarity(a, b):
-    """Calcula similaridade cosseno entre dois vetores"""
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+async def encode_texts(texts: List[str]) -> Optional[np.ndarray]:
+    """Embeddings em lote (pré-aquecimento do cache)"""
+    if embedding_client.enabled:
+        vectors = await embedding_client.encode(texts)
+        if vectors is not None:
+            return vectors
+    if embedding_model is None:
+        return None
+    return await asyncio.to_thread(embedding_model.encode, texts, batch_size=64)
 
-def get_cache_key(prompt: str, model: str) -> str:
-    """Gera chave do cache baseada no prompt e modelo"""
-    content = f"{model}:{prompt}"
-    return f"llm_cache:{hashlib.md5(content.encode()).hexdigest()}"
+# Acertos por faixa de parâmetros
+cache_bucket_stats = BucketStats()
 
-def get_embedding_key(prompt: str) -> str:
-    """Gera chave para o embedding do prompt"""
-    return f"embedding:{hashlib.md5(prompt.encode()).hexdigest()}"
+# Falhas recentes de geração (TTL curto) e modelos reserva
+negative_cache = NegativeCache()
+fallback_models = parse_fallback_models(OLLAMA_FALLBACK_MODELS)
 
-async def find_similar_cached_response(prompt: str, model: str, similarity_threshold: float = 0.85) -> Optional[str]:
-    """Busca resposta semanticamente similar no cache Redis"""
-    if not redis_client or not embedding_model:
+async def find_similar_cached_response(prompt: str, model: str, similarity_threshold: float = 0.85,
+                                       temperature: float = 0.7, max_tokens: int = 512,
+                                       namespace: str = DEFAULT_NAMESPACE) -> Optional[str]:
+    """Busca resposta semanticamente similar no cache Redis (mesmo namespace, modelo e faixa de parâmetros)"""
+    policy = cache_namespaces.policy(namespace)
+    if not redis_client or not embeddings_available() or policy is None:
         return None
     
     try:
-        # Gerar embedding da pergunta atual
-        current_embedding = embedding_model.encode(prompt)
-        
-        # Buscar todas as chaves de embedding
-        embedding_keys = await redis_client.keys("embedding:*")
+        # Mesmo prompt já respondido neste processo: sem embedding nem Redis
+        bucket = param_bucket(temperature, max_tokens)
+        cache_key = get_cache_key(prompt, model, bucket, namespace)
+        policy.record_access(cache_key)
+        hot_response = hot_cache.get_response(cache_key)
+        if hot_response is not None:
+            CACHE_HITS.labels(tier="hot", model=model).inc()
+            schedule_cache_hit(policy, cache_key, hot_cache.response_fresh_until(cache_key))
+            return hot_response
         
-        best_match = None
-        best_similarity = 0.0
+        # Gerar embedding da pergunta atual (prompts repetidos vêm da camada quente)
+        current_embedding = hot_cache.get_embedding(prompt)
+        if current_embedding is None:
+            with stage_timer("embedding_encode", model), start_span("embedding_model.encode"):
+                current_embedding = await encode_text(prompt)
+            if current_embedding is None:
+                return None
+            hot_cache.put_embedding(prompt, current_embedding, CACHE_TTL)
         
-        print(f"🔍 [SEMANTIC SEARCH] Buscando entre {len(embedding_keys)} perguntas armazenadas...")
+        # Trazer entradas novas de outras réplicas (no máximo uma vez por SEMANTIC_SYNC_INTERVAL)
+        with stage_timer("semantic_sync", model):
+            await semantic_index.sync(redis_client, CACHE_TTL, records_client=redis_records)
         
-        for emb_key in embedding_keys:
-            try:
-                # Recuperar embedding armazenado
-                stored_data = await redis_client.get(emb_key)
-                if not stored_data:
-                    continue
-                    
-                stored_info = json.loads(stored_data)
-                if stored_info.get("model") != model:
-                    continue
-                
-                stored_embedding = np.array(stored_info["embedding"])
-                
-                # Calcular similaridade
-                similarity = cosine_similarity(current_embedding, stored_embedding)
-                
-                if similarity > best_similarity and similarity >= similarity_threshold:
-                    best_similarity = similarity
-                    best_match = {
-                        "cache_key": stored_info["cache_key"],
-                        "similarity": similarity,
-                        "original_prompt": stored_info["prompt"]
-                    }
-                    
-            except Exception as e:
-                print(f"⚠️ [SEMANTIC] Erro ao processar {emb_key}: {e}")
-                continue
+        # Candidatos pelo BM25 do prompt (ou varredura int8) + similaridade exata, limiar adaptado ao modelo
+        search_start = time.perf_counter()
+        best_match = semantic_index.search(index_partition(model, bucket, namespace), semantic_index.codec.reduce(current_embedding),
+                                           similarity_threshold, prompt)
+        observe_stage("semantic_search", model, time.perf_counter() - search_start)
         
         if best_match:
+            # O acerto conta para a entrada servida: paráfrases populares não parecem frias ao TinyLFU
+            if best_match.cache_key != cache_key:
+                policy.record_access(best_match.cache_key)
+            hot_response = hot_cache.get_response(best_match.cache_key)
+            if hot_response is not None:
+                CACHE_HITS.labels(tier="hot", model=model).inc()
+                logger.info("Semantic hit (hot)", extra={"similarity": round(best_match.similarity, 3), "similar_to": log_payload(best_match.prompt)})
+                schedule_cache_hit(policy, best_match.cache_key, hot_cache.response_fresh_until(best_match.cache_key))
+                return hot_response
             # Buscar resposta no cache
             try:
-                cached_data = await redis_client.get(best_match["cache_key"])
+                cached_data = await redis_records.get(best_match.cache_key)
                 if cached_data:
-                    cache_info = json.loads(cached_data)
-                    print(f"🎯 [SEMANTIC HIT] Similaridade: {best_similarity:.3f}")
-                    print(f"📝 [SIMILAR TO] '{best_match['original_prompt'][:50]}...'")
+                    cache_info = unpack_record(cached_data)
+                    fresh_until = policy.fresh_until(cache_info, CACHE_TTL)
+                    if fresh_until <= time.time():
+                        # Vencida (TTL suave), mas ainda dentro do duro: servir e reconstruir em segundo plano
+                        CACHE_HITS.labels(tier="stale", model=model).inc()
+                        logger.info("Semantic hit (stale)", extra={"similarity": round(best_match.similarity, 3), "similar_to": log_payload(best_match.prompt)})
+                        schedule_cache_refresh(best_match.cache_key, cache_info)
+                        return cache_info["response"]
+                    CACHE_HITS.labels(tier="semantic", model=model).inc()
+                    logger.info("Semantic hit", extra={"similarity": round(best_match.similarity, 3), "dense": round(best_match.dense, 3),
+                                                       "lexical": round(best_match.lexical, 3), "similar_to": log_payload(best_match.prompt)})
+                    hot_cache.put_response(best_match.cache_key, cache_info["response"], fresh_until)
+                    schedule_cache_hit(policy, best_match.cache_key, fresh_until, cache_info)
                     return cache_info["response"]
+                # Resposta expirou/foi removida do Redis: tirar do índice
+                semantic_index.remove(best_match.embedding_key)
             except Exception as e:
-                print(f"🔴 [SEMANTIC] Erro ao recuperar resposta: {e}")
+                logger.error("Erro ao recuperar resposta do cache: %s", e)
         
-        print(f"❌ [SEMANTIC MISS] Nenhuma pergunta similar encontrada (threshold: {similarity_threshold})")
+        CACHE_MISSES.labels(tier="semantic", model=model).inc()
+        logger.debug("Semantic miss", extra={"threshold": similarity_threshold})
         return None
         
     except Exception as e:
-        print(f"🔴 [SEMANTIC] Erro na busca semântica: {e}")
+        logger.error("Erro na busca semântica: %s", e)
         return None
 
 def is_valid_response(response: str) -> bool:
@@ -265,51 +528,71 @@ def is_valid_response(response: str) -> bool:
         
     return True
 
-async def cache_response_with_embedding(prompt: str, model: str, response: str):
+async def cache_response_with_embedding(prompt: str, model: str, response: str, temperature: float = 0.7,
+                                        max_tokens: int = 512, refresh: bool = False, namespace: str = DEFAULT_NAMESPACE):
     """Armazena resposta no cache Redis com embedding para busca semântica - apenas se for uma resposta válida"""
-    print(f"🔥🔥🔥 [CACHE_FUNCTION] CHAMADA! Resposta: '{response[:30]}...'")
-    
-    if not redis_client or not embedding_model:
-        print(f"🔥🔥🔥 [CACHE_FUNCTION] Redis ou embedding não disponível")
+    policy = cache_namespaces.policy(namespace)
+    if not redis_client or not embeddings_available() or policy is None:
+        logger.debug("Cache indisponível (Redis ou embeddings)")
         return
     
     # ✅ VALIDAÇÃO: Só armazenar respostas válidas no cache
     is_valid = is_valid_response(response)
-    print(f"🔍 [VALIDATION] Resposta: '{response[:50]}...'")
-    print(f"🔍 [VALIDATION] É válida: {is_valid}")
     
     if not is_valid:
-        print(f"⚠️ [CACHE SKIP] Resposta inválida não será armazenada!")
+        logger.warning("Resposta inválida não será armazenada", extra={"response": log_payload(response)})
         return
     
     try:
-        # Cache da resposta (tradicional)
-        cache_key = get_cache_key(prompt, model)
-        cache_data = {
-            "response": response,
-            "timestamp": time.time(),
-            "prompt": prompt,
-            "model": model
-        }
-        await redis_client.setex(cache_key, CACHE_TTL, json.dumps(cache_data))
+        bucket = param_bucket(temperature, max_tokens)
+        cache_key = get_cache_key(prompt, model, bucket, namespace)
+        embedding_key = get_embedding_key(cache_key)
+        partition = index_partition(model, bucket, namespace)
+        current_embedding = hot_cache.get_embedding(prompt)
+        if current_embedding is None:
+            with stage_timer("embedding_encode", model), start_span("embedding_model.encode"):
+                current_embedding = await encode_text(prompt)
+            if current_embedding is None:
+                return
         
-        # Armazenar embedding para busca semântica
-        embedding_key = get_embedding_key(prompt)
-        current_embedding = embedding_model.encode(prompt)
+        # Resposta + embedding reduzido (float16), no formato compacto de src/cache_records.py
+        reduced = semantic_index.codec.reduce(current_embedding)
+        now = time.time()
+        fresh_until = now + CACHE_TTL
+        hard_ttl = policy.hard_ttl(CACHE_TTL)
+        expires_at = now + hard_ttl
+        cache_data, embedding_data = build_records(
+            prompt, model, response, temperature, max_tokens, cache_key, partition,
+            semantic_index.codec.to_bytes(reduced), semantic_index.codec.codec_id, now, fresh_until, expires_at, namespace
+        )
         
-        embedding_data = {
-            "embedding": current_embedding.tolist(),
-            "prompt": prompt,
-            "model": model,
-            "cache_key": cache_key,
-            "timestamp": time.time()
-        }
-        await redis_client.setex(embedding_key, CACHE_TTL, json.dumps(embedding_data))
+        # Admissão (TinyLFU) dentro da cota do namespace; vítimas saem de todas as réplicas
+        size = len(cache_data) + len(embedding_data)
+        admitted, eviction = await policy.admit(redis_client, cache_key, size, refresh=refresh)
+        for key in eviction.embedding_keys:
+            semantic_index.remove(key)
+        # Outras réplicas podem ter a versão anterior desta chave (ou as vítimas) na camada quente
+        await hot_cache.publish_invalidation(redis_client, [cache_key, *eviction.cache_keys], eviction.embedding_keys)
+        if not admitted:
+            return
         
-        print(f"💾 [SEMANTIC CACHE] Resposta válida armazenada")
+        pipe = redis_records.pipeline(transaction=False)
+        pipe.setex(cache_key, hard_ttl, cache_data)
+        pipe.setex(embedding_key, hard_ttl, embedding_data)
+        await pipe.execute()
+        await policy.track(redis_client, cache_key, embedding_key, size, expires_at)
+        await cache_namespaces.register(redis_client, namespace)
+        hot_cache.put_response(cache_key, response, fresh_until)
+        
+        # Publicar no log de sincronização do índice (e descartar o que já expirou, inclusive TTLs estendidos)
+        await redis_client.zadd(INDEX_LOG_KEY, {embedding_key: now})
+        await redis_client.zremrangebyscore(INDEX_LOG_KEY, "-inf", now - cache_policy.hard_ttl(cache_policy.max_ttl))
+        semantic_index.add(embedding_key, partition, reduced.astype(np.float16), cache_key, prompt, expires_at)
+        
+        logger.debug("Resposta armazenada no cache semântico")
         
     except Exception as e:
-        print(f"🔴 [SEMANTIC] Erro ao armazenar: {e}")
+        logger.error("Erro ao armazenar no cache semântico: %s", e)
 
 def select_best_model(messages: List[ChatMessage], requested_model: str = "auto") -> str:
     """Seleciona o melhor modelo DeepSeek baseado no contexto"""
@@ -344,83 +627,190 @@ def select_best_model(messages: List[ChatMessage], requested_model: str = "auto"
     # Para textos simples e respostas rápidas, usar DeepSeek 1.3B
     return "deepseek-coder:1.3b"
 
-async def call_ollama_async(prompt: str, model: str = "deepseek-coder:1.3b", temperature: float = 0.7, max_tokens: int = 512) -> str:
-    """Chama o Ollama de forma assíncrona com otimizações para modelos DeepSeek"""
-    try:
-        print(f"🔥 [ASYNC] Chamando Ollama com modelo: {model}")
-        
-        # Parâmetros otimizados para modelos DeepSeek
-        base_options = {
-            "temperature": temperature,
-            "num_predict": max_tokens,
-            "repeat_penalty": 1.1,
-            "top_k": 40,
-            "top_p": 0.9,
-            "repeat_last_n": 64,
-            "penalize_newline": False,
+def build_ollama_options(model: str, temperature: float, max_tokens: int) -> dict:
+    """Parâmetros de geração otimizados para modelos DeepSeek"""
+    base_options = {
+        "temperature": temperature,
+        "num_predict": max_tokens,
+        "repeat_penalty": 1.1,
+        "top_k": 40,
+        "top_p": 0.9,
+        "repeat_last_n": 64,
+        "penalize_newline": False,
+    }
+    
+    # Configurações específicas por modelo
+    if "1.3b" in model.lower():
+        # DeepSeek 1.3B - otimizado para velocidade
+        return {
+            **base_options,
+            "num_ctx": 2048,      # Contexto menor para velocidade
+            "num_batch": 512,     # Batch size para modelos pequenos
+            "num_thread": 6,      # Menos threads para modelo pequeno
         }
-        
-        # Configurações específicas por modelo
-        if "1.3b" in model.lower():
-            # DeepSeek 1.3B - otimizado para velocidade
-            options = {
-                **base_options,
-                "num_ctx": 2048,      # Contexto menor para velocidade
-                "num_batch": 512,     # Batch size para modelos pequenos
-                "num_thread": 6,      # Menos threads para modelo pequeno
-            }
-        elif "6.7b" in model.lower():
-            # DeepSeek 6.7B - otimizado para qualidade
-            options = {
-                **base_options,
-                "num_ctx": 4096,      # Contexto maior para melhor qualidade
-                "num_batch": 256,     # Batch menor para modelo grande
-                "num_thread": 8,      # Mais threads para modelo grande
-            }
+    elif "6.7b" in model.lower():
+        # DeepSeek 6.7B - otimizado para qualidade
+        return {
+            **base_options,
+            "num_ctx": 4096,      # Contexto maior para melhor qualidade
+            "num_batch": 256,     # Batch menor para modelo grande
+            "num_thread": 8,      # Mais threads para modelo grande
+        }
+    else:
+        # Configuração padrão para outros modelos
+        return {
+            **base_options,
+            "num_ctx": 2048,
+            "num_batch": 512,
+            "num_thread": 8,
+        }
+
+async def post_ollama_async(endpoint: str, payload: dict, affinity_key: Optional[str] = None) -> tuple:
+    """Envia payload ao pool de backends Ollama; retorna (resultado JSON, None) ou (None, mensagem de erro)"""
+    return await backend_pool.post(endpoint, payload, affinity_key=affinity_key)
+
+async def call_ollama_async(prompt: str, model: str = "deepseek-coder:1.3b", temperature: float = 0.7, max_tokens: int = 512) -> tuple:
+    """
+    Chama o Ollama de forma assíncrona com otimizações para modelos DeepSeek
+    Retorna (resposta, None) ou ("", mensagem de erro do pool de backends)
+    """
+    logger.debug("Chamando Ollama", extra={"model": model})
+    
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": warmup_manager.keep_alive_for(model),
+        "options": build_ollama_options(model, temperature, max_tokens)
+    }
+    
+    with start_span("call_ollama_async", {"llm.model": model, "llm.max_tokens": max_tokens}) as span:
+        result, error = await post_ollama_async("/api/generate", payload)
+        if error:
+            span.set_attribute("error", error)
+            return "", error
+        span.set_attributes({
+            "llm.prompt_tokens": result.get("prompt_eval_count", 0),
+            "llm.completion_tokens": result.get("eval_count", 0),
+        })
+    return result.get("response", "").strip(), None
+
+async def call_ollama_chat_async(messages: List[ChatMessage], model: str = "deepseek-coder:1.3b", temperature: float = 0.7, max_tokens: int = 512, session_id: Optional[str] = None) -> tuple:
+    """
+    Chama o Ollama reaproveitando o prefixo da conversa já processado,
+    de forma que turnos longos só paguem o prompt-eval da mensagem nova.
+    Retorna (resposta, None) ou ("", mensagem de erro do pool de backends)
+    """
+    logger.debug("Chamando Ollama (sessão de chat)", extra={"model": model, "mode": CHAT_SESSION_MODE})
+    
+    history = [{"role": msg.role, "content": msg.content} for msg in messages]
+    options = build_ollama_options(model, temperature, max_tokens)
+    keep_alive = warmup_manager.keep_alive_for(model)
+    
+    affinity_key = chat_session_store.session_key(model, history, session_id)
+    if CHAT_SESSION_MODE == "context":
+        # /api/generate com os tokens de context do turno anterior
+        state = chat_session_store.lookup(model, history, session_id)
+        if state:
+            prompt = format_messages_for_ollama(messages[state.message_count:])
+            logger.debug("Reaproveitando context", extra={"messages": state.message_count})
         else:
-            # Configuração padrão para outros modelos
-            options = {
-                **base_options,
-                "num_ctx": 2048,
-                "num_batch": 512,
-                "num_thread": 8,
-            }
+            prompt = format_messages_for_ollama(messages)
         
         payload = {
             "model": model,
             "prompt": prompt,
             "stream": False,
+            "keep_alive": keep_alive,
             "options": options
         }
+        if state:
+            payload["context"] = state.context.tolist()
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{OLLAMA_URL}/api/generate",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=180)  # Timeout aumentado para 3 minutos
-            ) as response:
-                
-                print(f"🌐 [ASYNC] Status da resposta: {response.status}")
-                
-                if response.status == 200:
-                    result = await response.json()
-                    return result.get("response", "").strip()
-                else:
-                    error_text = await response.text()
-                    print(f"❌ [ASYNC] Erro HTTP: {error_text}")
-                    return f"Erro na chamada do Ollama: {response.status}"
-                    
-    except asyncio.TimeoutError:
-        print(f"⏰ [ASYNC] Timeout na requisição para modelo {model}")
-        return f"Timeout na requisição para o modelo {model}"
-    except Exception as e:
-        print(f"❌ [ASYNC] Exceção: {e}")
-        return f"Erro ao conectar com Ollama: {str(e)}"
+        with start_span("call_ollama_async", {"llm.model": model, "llm.session_mode": "context"}) as span:
+            result, error = await post_ollama_async("/api/generate", payload, affinity_key)
+            if error:
+                span.set_attribute("error", error)
+                return "", error
+            span.set_attributes({
+                "llm.prompt_tokens": result.get("prompt_eval_count", 0),
+                "llm.completion_tokens": result.get("eval_count", 0),
+                "llm.context_reused": state is not None,
+            })
+        response_text = result.get("response", "").strip()
+        chat_session_store.store(
+            model,
+            history + [{"role": "assistant", "content": response_text}],
+            result.get("context"),
+            session_id
+        )
+        return response_text, None
+    
+    # /api/chat: o Ollama reaproveita o cache KV do prefixo da conversa
+    payload = {
+        "model": model,
+        "messages": history,
+        "stream": False,
+        "keep_alive": keep_alive,
+        "options": options
+    }
+    with start_span("call_ollama_async", {"llm.model": model, "llm.session_mode": "chat"}) as span:
+        result, error = await post_ollama_async("/api/chat", payload, affinity_key)
+        if error:
+            span.set_attribute("error", error)
+            return "", error
+        span.set_attributes({
+            "llm.prompt_tokens": result.get("prompt_eval_count", 0),
+            "llm.completion_tokens": result.get("eval_count", 0),
+        })
+    return result.get("message", {}).get("content", "").strip(), None
+
+async def generate_for_request(request: ChatCompletionRequest, prompt: str, model: str) -> tuple:
+    """Gera a resposta no Ollama (reaproveitando a sessão em conversas com vários turnos); retorna (texto, erro)"""
+    if CHAT_SESSION_MODE != "off" and len(request.messages) > 1:
+        return await call_ollama_chat_async(request.messages, model, request.temperature, request.max_tokens, request.session_id)
+    return await call_ollama_async(prompt, model, request.temperature, request.max_tokens)
+
+async def generate_with_fallback(request: ChatCompletionRequest, prompt: str, model: str,
+                                 namespace: str = DEFAULT_NAMESPACE, allow_cache: bool = True) -> tuple:
+    """
+    Gera no modelo pedido; se falhar (ou tiver falhado há pouco, pelo cache negativo),
+    tenta o modelo reserva e depois uma resposta aproximada do cache. Retorna (texto, backend)
+    """
+    # Falha decidida pelo erro estruturado do pool, nunca pelo texto da resposta
+    error_key = get_cache_key(prompt, model, param_bucket(request.temperature, request.max_tokens), namespace)
+    error = await negative_cache.get(redis_client, error_key)
+    if error is None:
+        response_text, error = await generate_for_request(request, prompt, model)
+        if error is None:
+            return response_text, f"ollama-{model}"
+        await negative_cache.put(redis_client, error_key, error)
+    else:
+        logger.info("Falha recente memorizada, sem chamar o backend", extra={"model": model, "error": error})
+    
+    fallback = fallback_models.get(model)
+    if fallback and fallback != model:
+        response_text, fallback_error = await generate_for_request(request, prompt, fallback)
+        if fallback_error is None:
+            FALLBACK_RESPONSES.labels(model=model, kind="model").inc()
+            logger.warning("Resposta do modelo reserva", extra={"model": model, "fallback": fallback, "error": error})
+            return response_text, f"fallback-{fallback}"
+    
+    if allow_cache and FALLBACK_SIMILARITY:
+        approximate = await find_similar_cached_response(prompt, model, FALLBACK_SIMILARITY, request.temperature,
+                                                         request.max_tokens, namespace)
+        if approximate:
+            FALLBACK_RESPONSES.labels(model=model, kind="approximate_cache").inc()
+            logger.warning("Resposta aproximada do cache", extra={"model": model, "error": error})
+            return approximate, f"approximate-cache-{model}"
+    
+    FALLBACK_RESPONSES.labels(model=model, kind="none").inc()
+    return error, f"ollama-{model}"
 
 def call_ollama(prompt: str, model: str = "deepseek-coder:1.3b", temperature: float = 0.7, max_tokens: int = 512) -> str:
     """Versão síncrona mantida para compatibilidade com modelos DeepSeek"""
     try:
-        print(f"🔥 Chamando Ollama com modelo: {model}")
+        logger.debug("Chamando Ollama (síncrono)", extra={"model": model})
         
         payload = {
             "model": model,
@@ -438,17 +828,16 @@ def call_ollama(prompt: str, model: str = "deepseek-coder:1.3b", temperature: fl
             timeout=180
         )
         
-        print(f"🌐 Status da resposta: {response.status_code}")
         
         if response.status_code == 200:
             result = response.json()
             return result.get("response", "").strip()
         else:
-            print(f"❌ Erro HTTP: {response.text}")
+            logger.error("Erro HTTP do Ollama", extra={"status": response.status_code})
             return f"Erro na chamada do Ollama: {response.status_code}"
             
     except Exception as e:
-        print(f"❌ Exceção: {e}")
+        logger.error("Erro ao chamar Ollama: %s", e)
         return f"Erro ao conectar com Ollama: {str(e)}"
 
 def generate_mock_response(messages: List[ChatMessage]) -> str:
@@ -465,17 +854,92 @@ def generate_mock_response(messages: List[ChatMessage]) -> str:
     import random
     return random.choice(mock_responses)
 
-@app.on_event("startup")
-async def startup_event():
-    """Inicializa Redis e verifica conectividade"""
-    # Inicializar Redis
-    await init_redis()
+def preload_shared_models():
+    """
+    Carrega os modelos somente leitura de forma síncrona, antes do fork dos
+    workers (src/gunicorn_conf.py), para compartilhá-los por copy-on-write
+    """
+    global embedding_model
+    load_fine_tuned_model()
+    if embedding_client.enabled and not EMBEDDING_LOCAL_FALLBACK:
+        return  # Embeddings vêm do microserviço compartilhado
+    try:
+        embedding_model = load_embedding_encoder()
+        logger.info("Modelo semântico pré-carregado", extra={"model": EMBEDDING_MODEL_NAME, "backend": EMBEDDING_BACKEND})
+    except Exception as e:
+        logger.error("Erro ao pré-carregar modelo de embeddings: %s", e)
+
+async def init_backends() -> bool:
+    """Verifica backends Ollama, mantém health checks periódicos e aquece modelos"""
+    await backend_pool.check_health()
+    backend_pool.start_health_checks()
     
-    # Verificar Ollama
     if check_ollama():
-        print("✅ Ollama detectado e funcionando")
-    else:
-        print("⚠️ Ollama não disponível - usando respostas mock")
+        logger.info("Ollama detectado e funcionando")
+        # Aquecer modelos em segundo plano (não bloqueia a prontidão)
+        asyncio.create_task(warmup_manager.warm_up())
+        return True
+    logger.warning("Ollama não disponível - usando respostas mock")
+    return False
+
+async def warm_cache_on_startup():
+    """Pré-aquece o cache depois do boot; o lock garante uma réplica por vez"""
+    await startup.wait()
+    if not redis_client or not embeddings_available():
+        logger.warning("Pré-aquecimento do cache ignorado: Redis ou embeddings indisponíveis")
+        return
+    if not await redis_client.set(WARM_LOCK_KEY, hot_cache.origin, nx=True, ex=3600):
+        logger.info("Pré-aquecimento do cache já em andamento em outra réplica")
+        return
+
+    async def generate(entry):
+        response, error = await call_ollama_async(entry.prompt, entry.model, entry.temperature, entry.max_tokens)
+        return response if error is None else None
+
+    try:
+        entries = await asyncio.to_thread(load_sources, warm_sources(), warm_models())
+        warmer = CacheWarmer(redis_client, redis_records, encode_texts, generate, semantic_index.codec, cache_policy)
+        stats = await warmer.warm(entries)
+        logger.info("Pré-aquecimento do cache concluído", extra={"entries": len(entries), **stats})
+    except Exception as e:
+        logger.error("Erro no pré-aquecimento do cache: %s", e)
+    finally:
+        await redis_client.delete(WARM_LOCK_KEY)
+
+startup.register("redis", init_redis)
+startup.register("embeddings", load_embedding_model)
+startup.register("fine_tuned", lambda: asyncio.to_thread(load_fine_tuned_model))
+startup.register("backends", init_backends)
+
+@app.on_event("startup")
+async def startup_event():
+    """Dispara o carregamento paralelo dos componentes (a API atende em modo degradado até lá)"""
+    startup.start()
+    if CACHE_WARM_ON_STARTUP:
+        asyncio.create_task(warm_cache_on_startup())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Fecha a sessão HTTP do serviço de embeddings, envia os acertos pendentes e grava o snapshot do índice"""
+    await embedding_client.close()
+    if redis_client:
+        await flush_cache_hits()
+    if SEMANTIC_SNAPSHOT_DIR and redis_client:
+        try:
+            await save_semantic_index_snapshot()
+        except Exception as e:
+            logger.warning("Falha ao gravar snapshot do índice semântico: %s", e)
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness: o processo está de pé e o event loop responde"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: componentes exigidos carregados (STARTUP_READY_REQUIRES)"""
+    status = startup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
 
 @app.get("/")
 async def root():
@@ -486,48 +950,104 @@ async def root():
         "backend": ollama_status,
         "model": "deepseek-coder:1.3b" if check_ollama() else "mock",
         "models_available": ["deepseek-coder:1.3b", "deepseek-coder:6.7b"],
+        "backends": backend_pool.status(),
+        "hedging": backend_pool.hedge_policy.stats(),
+        "error_budget": backend_pool.error_budget.stats(),
+        "negative_cache": negative_cache.stats(),
+        "warmup": warmup_manager.status(),
+        "chat_sessions": chat_session_store.stats(),
+        "traffic_capture": traffic_recorder.status(),
+        "startup": startup.status(),
+        "embedding_service": embedding_client.status(),
+        "semantic_index": semantic_index.stats(),
+        "hot_cache": hot_cache.stats(),
+        "cache_policy": await cache_policy.stats(redis_client),
+        "cache_namespaces": await cache_namespaces.stats(redis_client),
+        "cache_records": format_info(),
+        "cache_buckets": cache_bucket_stats.stats(),
         "api_version": "1.0.0"
     }
 
+@app.delete("/v1/cache")
+async def purge_cache(model: Optional[str] = None, namespace: Optional[str] = None):
+    """Remove respostas do cache (todas, de um modelo e/ou de um namespace) em todas as réplicas"""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis indisponível")
+    cache_keys, embedding_keys = [], []
+    logged = await redis_client.zrange(INDEX_LOG_KEY, 0, -1)
+    for start in range(0, len(logged), 500):
+        chunk = logged[start:start + 500]
+        for embedding_key, raw in zip(chunk, await redis_records.mget(chunk)):
+            record = unpack_record(raw) if raw else {}
+            if model and record.get("model") != model:
+                continue
+            if namespace and record.get("namespace", DEFAULT_NAMESPACE) != namespace:
+                continue
+            embedding_keys.append(embedding_key)
+            if record.get("cache_key"):
+                cache_keys.append(record["cache_key"])
+    for start in range(0, len(embedding_keys), 500):
+        chunk = embedding_keys[start:start + 500]
+        await redis_client.delete(*chunk)
+        await redis_client.zrem(INDEX_LOG_KEY, *chunk)
+    for start in range(0, len(cache_keys), 500):
+        await redis_client.delete(*cache_keys[start:start + 500])
+    for key_ns in {key_namespace(key) for key in cache_keys}:
+        policy = cache_namespaces.policy(key_ns)
+        if policy:
+            await policy.forget(redis_client, [key for key in cache_keys if key_namespace(key) == key_ns])
+    for key in embedding_keys:
+        semantic_index.remove(key)
+    await hot_cache.publish_invalidation(redis_client, cache_keys, embedding_keys, everything=model is None and namespace is None, model=model)
+    logger.info("Cache purgado", extra={"model": model, "namespace": namespace, "entries": len(embedding_keys)})
+    return {"purged": len(embedding_keys), "model": model, "namespace": namespace}
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas no formato Prometheus"""
+    for model in set(warmup_manager.pending) | set(warmup_manager.resident_until):
+        QUEUE_DEPTH.labels(model=model).set(warmup_manager.pending.get(model, 0))
+    for backend in backend_pool.backends.values():
+        BACKEND_OUTSTANDING.labels(backend=backend.url).set(backend.outstanding)
+    return Response(content=render_metrics(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
 @app.get("/v1/models")
 async def list_models():
     """Lista modelos disponíveis (compatível com OpenAI)"""
     available_models = []
     
-    # Verificar quais modelos estão instalados no Ollama
+    # Modelos instalados nos backends Ollama, pelo health check periódico do pool (sem I/O aqui)
     try:
-        response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
+        ollama_models = backend_pool.installed_models()
         
-        if response.status_code == 200:
-            data = response.json()  
-            ollama_models = data.get("models", [])
+        if not ollama_models:
+            raise RuntimeError("Nenhum backend respondeu")
+        
+        for full_name, size in ollama_models.items():
             
-            for model in ollama_models:
-                full_name = model["name"]
-                
-                # Mapear nomes para IDs limpos - com foco nos modelos DeepSeek
-                if full_name == "deepseek-coder:1.3b":
-                    model_id = "deepseek-1.3b"
-                elif full_name == "deepseek-coder:6.7b":
-                    model_id = "deepseek-6.7b"
-                elif full_name == "mistral:latest":
-                    model_id = "mistral"
-                elif full_name == "llama3.2:3b":
-                    model_id = "llama3.2"
-                else:
-                    # Fallback genérico
-                    model_id = full_name.split(":")[0]
-                
-                model_entry = {
-                    "id": model_id,
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "local",
-                    "size": model.get("size", 0)
-                }
+            # Mapear nomes para IDs limpos - com foco nos modelos DeepSeek
+            if full_name == "deepseek-coder:1.3b":
+                model_id = "deepseek-1.3b"
+            elif full_name == "deepseek-coder:6.7b":
+                model_id = "deepseek-6.7b"
+            elif full_name == "mistral:latest":
+                model_id = "mistral"
+            elif full_name == "llama3.2:3b":
+                model_id = "llama3.2"
+            else:
+                # Fallback genérico
+                model_id = full_name.split(":")[0]
+            
+            model_entry = {
+                "id": model_id,
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "local",
+                "size": size
+            }
+            
+            available_models.append(model_entry)
                 
-                available_models.append(model_entry)
-                    
     except Exception as e:
         # Fallback para modelos DeepSeek padrão
         available_models.extend([
@@ -553,15 +1073,17 @@ async def list_models():
     return result
 
 @app.post("/v1/chat/completions")
-async def chat_completions(request: ChatCompletionRequest):
+async def chat_completions(request: ChatCompletionRequest, http_request: Request):
     """Endpoint principal de chat (compatível com OpenAI)"""
+    try:
+        namespace = resolve_namespace(http_request.headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     try:
         start_time = time.time()
         
-        print(f"🔥 DEBUG: Iniciando chat_completions")
-        print(f"🔥 DEBUG: request.model = '{request.model}'")
-        print(f"🔥 DEBUG: Mensagens recebidas: {len(request.messages)}")
+        logger.debug("chat_completions", extra={"requested_model": request.model, "messages": len(request.messages)})
         
         # Extrair última mensagem do usuário para teste de fine-tuning
         user_message = None
@@ -575,7 +1097,9 @@ async def chat_completions(request: ChatCompletionRequest):
             fine_tuned_result = try_fine_tuned_response(user_message)
             
         if fine_tuned_result:
-            print(f"🧠 DEBUG: Usando resposta fine-tuned (confiança: {fine_tuned_result['confidence']:.3f})")
+            CACHE_HITS.labels(tier="fine_tuned", model="fine-tuned").inc()
+            REQUEST_LATENCY.labels(model="fine-tuned", backend="fine-tuned").observe(time.time() - start_time)
+            logger.info("Resposta fine-tuned", extra={"domain": fine_tuned_result["domain"], "confidence": round(fine_tuned_result["confidence"], 3), "elapsed": round(time.time() - start_time, 3)})
             response_text = fine_tuned_result['response']
             backend_used = f"fine-tuned-{fine_tuned_result['domain']}"
             
@@ -609,50 +1133,67 @@ async def chat_completions(request: ChatCompletionRequest):
                 "response_time": time.time() - start_time
             })
             
+            traffic_recorder.record(request, "fine-tuned", backend_used, time.time() - start_time)
             return response_dict
         
         # 2. FALLBACK PARA OLLAMA se fine-tuned não funcionar ou não existir
-        print(f"🔥 DEBUG: Usando Ollama como fallback")
+        if user_message:
+            CACHE_MISSES.labels(tier="fine_tuned", model="fine-tuned").inc()
         
         if check_ollama():
-            print(f"🔥 DEBUG: Ollama está disponível")
             # Selecionar modelo apropriado
             selected_model = select_best_model(request.messages, request.model)
-            print(f"🔥 DEBUG: Modelo após seleção: '{selected_model}'")
+            logger.debug("Modelo selecionado", extra={"model": selected_model})
             
-            # Usar Ollama de forma assíncrona com cache Redis semântico
-            prompt = format_messages_for_ollama(request.messages)
-            print(f"🔥 DEBUG: Prompt formatado: '{prompt[:100]}...'")
+            # Registrar tráfego e pré-carregar o modelo enquanto o cache é consultado
+            warmup_manager.begin_request(selected_model)
+            warmup_manager.schedule_preload(selected_model)
             
-            # Buscar cache semântico primeiro
-            cached_response = await find_similar_cached_response(prompt, selected_model)
-            
-            if cached_response:
-                response_text = cached_response
-                backend_used = f"semantic-cache-{selected_model}"
-            else:
-                response_text = await call_ollama_async(
-                    prompt, 
-                    selected_model, 
-                    request.temperature, 
-                    request.max_tokens
-                )
-                # Armazenar no cache Redis com embedding
-                await cache_response_with_embedding(prompt, selected_model, response_text)
-                backend_used = f"ollama-{selected_model}"
+            try:
+                # Usar Ollama de forma assíncrona com cache Redis semântico
+                prompt = format_messages_for_ollama(request.messages)
+                logger.debug("Prompt formatado", extra={"prompt": log_payload(prompt)})
+                
+                # Buscar cache semântico primeiro (exceto requisições criativas ou com cache_control)
+                plan = cache_plan(request.temperature, request.max_tokens, request.cache_control)
+                cached_response = None
+                if plan.lookup:
+                    cached_response = await find_similar_cached_response(
+                        prompt, selected_model, temperature=request.temperature, max_tokens=request.max_tokens,
+                        namespace=namespace
+                    )
+                    cache_bucket_stats.record(plan.bucket, cached_response is not None)
+                    cache_namespaces.record(namespace, cached_response is not None)
+                
+                if cached_response:
+                    response_text = cached_response
+                    backend_used = f"semantic-cache-{selected_model}"
+                else:
+                    # Falhas do modelo pedido caem no modelo reserva ou numa resposta aproximada do cache
+                    response_text, backend_used = await generate_with_fallback(
+                        request, prompt, selected_model, namespace, allow_cache=plan.lookup
+                    )
+                    # Armazenar no cache Redis com embedding (só respostas do próprio modelo)
+                    if plan.store and backend_used == f"ollama-{selected_model}":
+                        await cache_response_with_embedding(prompt, selected_model, response_text, request.temperature,
+                                                            request.max_tokens, namespace=namespace)
+            finally:
+                warmup_manager.end_request(selected_model)
+                # Deixar pronto o modelo previsto para as próximas requisições
+                warmup_manager.schedule_preload()
         else:
-            print(f"🔥 DEBUG: Ollama não disponível, usando mock")
+            logger.warning("Ollama não disponível, usando mock")
             # Usar resposta mock
             response_text = generate_mock_response(request.messages)
             backend_used = "mock"
             selected_model = "mock"
         
         generation_time = time.time() - start_time
+        current_span().set_attributes({"llm.model": selected_model, "llm.backend": backend_used})
+        REQUEST_LATENCY.labels(model=selected_model, backend=backend_used.split(f"-{selected_model}")[0]).observe(generation_time)
         
-        print(f"🔤 Mensagens: {len(request.messages)} mensagem(s)")
-        print(f"🤖 Modelo selecionado: {selected_model}")
-        print(f"⚡ Resposta gerada em {generation_time:.2f}s usando {backend_used}")
-        print(f"📝 Resposta: {response_text[:100]}...")
+        logger.info("Resposta gerada", extra={"model": selected_model, "backend": backend_used, "messages": len(request.messages), "elapsed": round(generation_time, 3), "response": log_payload(response_text)})
+        traffic_recorder.record(request, selected_model, backend_used, generation_time)
         
         # Criar resposta compatível com OpenAI
         completion_response = {
@@ -680,20 +1221,28 @@ async def chat_completions(request: ChatCompletionRequest):
         return completion_response
         
     except Exception as e:
-        print(f"❌ Erro durante geração: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro durante geração: %s", e)
+        traffic_recorder.record(request, request.model, "error", time.time() - start_time, status=500)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat/completions")
-async def chat_completions_simple(request: ChatCompletionRequest):
+async def chat_completions_simple(request: ChatCompletionRequest, http_request: Request):
     """Endpoint alternativo sem /v1"""
-    return await chat_completions(request)
+    return await chat_completions(request, http_request)
 
 if __name__ == "__main__":
     print("🚀 Iniciando Simple LLM Server...")
     print("🔌 Tentando conectar com Ollama...")
     
+    # Vários workers (0 = todos os núcleos): gunicorn com modelos pré-carregados no master (copy-on-write)
+    if int(os.getenv("API_WORKERS", "1")) != 1:
+        os.chdir(project_root)
+        os.execvp(sys.executable, [
+            sys.executable, "-m", "gunicorn",
+            "-c", str(current_dir / "gunicorn_conf.py"),
+            "src.simple_llm_server:app",
+        ])
+    
     # Configurar servidor
     uvicorn.run(
         app,
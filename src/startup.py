@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Inicialização preguiçosa e paralela dos componentes pesados da API
+
+Cada componente (Redis, modelo de embeddings, modelo fine-tuned, backends
+Ollama) é carregado numa tarefa própria em segundo plano, sem bloquear o
+servidor. Enquanto caches/modelos não ficam prontos, a API atende em modo
+degradado (direto no Ollama). /health/live responde assim que o processo sobe;
+/health/ready quando os componentes exigidos (STARTUP_READY_REQUIRES) terminam.
+"""
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.structured_logging import get_logger
+
+# Componentes que precisam terminar para a API se declarar pronta
+STARTUP_READY_REQUIRES = [c.strip() for c in os.getenv("STARTUP_READY_REQUIRES", "backends").split(",") if c.strip()]
+
+logger = get_logger("startup")
+
+
+@dataclass
+class ComponentState:
+    """Estado de carregamento de um componente"""
+    name: str
+    status: str = "pending"          # pending, loading, ready, failed
+    started_at: Optional[float] = None
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+
+class StartupOrchestrator:
+    """Carrega componentes concorrentemente e acompanha prontidão"""
+
+    def __init__(self, ready_requires=None):
+        self.ready_requires = ready_requires if ready_requires is not None else STARTUP_READY_REQUIRES
+        self._loaders: Dict[str, Callable[[], Awaitable[bool]]] = {}
+        self.components: Dict[str, ComponentState] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.started_at = time.time()
+
+    def register(self, name: str, loader: Callable[[], Awaitable[bool]]):
+        """Registra um componente; o loader retorna False se ficou indisponível"""
+        self._loaders[name] = loader
+        self.components[name] = ComponentState(name)
+
+    async def _run(self, name: str):
+        state = self.components[name]
+        state.status = "loading"
+        state.started_at = time.time()
+        try:
+            ok = await self._loaders[name]()
+            state.status = "ready" if ok is not False else "failed"
+        except Exception as e:
+            state.status = "failed"
+            state.error = str(e)
+            logger.error("Falha ao carregar componente %s: %s", name, e)
+        state.duration = round(time.time() - state.started_at, 3)
+        logger.info("Componente carregado", extra={"component": name, "status": state.status, "duration": state.duration})
+
+    def start(self):
+        """Dispara todos os componentes em segundo plano (não bloqueia)"""
+        self.started_at = time.time()
+        for name in self._loaders:
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._run(name))
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda todos os componentes (útil em testes e scripts)"""
+        if not self._tasks:
+            return True
+        done, pending = await asyncio.wait(self._tasks.values(), timeout=timeout)
+        return not pending
+
+    def is_done(self, name: str) -> bool:
+        state = self.components.get(name)
+        return state is not None and state.status in ("ready", "failed")
+
+    def is_ready(self) -> bool:
+        """Pronta quando os componentes exigidos terminaram (com sucesso ou não)"""
+        return all(self.is_done(name) for name in self.ready_requires if name in self.components)
+
+    def is_degraded(self) -> bool:
+        """Algum componente ainda carregando ou indisponível"""
+        return any(state.status != "ready" for state in self.components.values())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.is_ready(),
+            "degraded": self.is_degraded(),
+            "uptime": round(time.time() - self.started_at, 1),
+            "ready_requires": self.ready_requires,
+            "components": {
+                name: {"status": s.status, "duration": s.duration, "error": s.error}
+                for name, s in self.components.items()
+            },
+        }
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Logging estruturado e assíncrono para o caminho crítico da API
+
+- Registros enfileirados (QueueHandler) e formatados/escritos numa thread separada
+- Saída JSON (ou texto) com nível, logger, request_id e campos extras
+- Amostragem com limite de taxa para mensagens DEBUG
+- Conteúdo de prompts/respostas omitido por padrão (LOG_PAYLOADS=false)
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()               # json ou text
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "false").lower() == "true"
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "100"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))   # Fração das mensagens DEBUG mantidas
+LOG_DEBUG_MAX_PER_SECOND = int(os.getenv("LOG_DEBUG_MAX_PER_SECOND", "20"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# ID da requisição corrente (definido pelo middleware da API)
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+# Atributos padrão de LogRecord (o restante vira campo estruturado)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Anexa o request_id do contexto atual ao registro"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Amostra mensagens DEBUG e limita quantas passam por segundo"""
+
+    def __init__(self, sample_rate: float = LOG_DEBUG_SAMPLE_RATE, max_per_second: int = LOG_DEBUG_MAX_PER_SECOND):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return False
+
+        with self._lock:
+            now = int(time.time())
+            if now != self._window:
+                self._window = now
+                self._count = 0
+            self._count += 1
+            if self._count > self.max_per_second:
+                self.dropped += 1
+                return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legível para desenvolvimento local"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = {k: v for k, v in record.__dict__.items() if k not in _RESERVED and not k.startswith("_")}
+        if extras:
+            line += " " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return line
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que não formata a mensagem na thread chamadora:
+    a formatação e a escrita acontecem na thread do QueueListener
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Sob pressão, descartar em vez de bloquear a requisição
+            pass
+
+
+_listener: Optional[QueueListener] = None
+_configured = False
+
+
+def setup_logging():
+    """Configura (uma única vez) o logger raiz da aplicação"""
+    global _listener, _configured
+    if _configured:
+        return
+    _configured = True
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(DebugSamplingFilter())
+
+    app_logger = logging.getLogger("llm")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(queue_handler)
+    app_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    restart_listener_after_fork(_listener, queue_handler, LOG_QUEUE_SIZE)
+
+
+def restart_listener_after_fork(listener: QueueListener, handler: QueueHandler, maxsize: int):
+    """
+    A thread do QueueListener não sobrevive ao fork (workers do gunicorn):
+    no processo filho, recria a fila (cujos locks podem ter sido copiados
+    travados) e inicia uma nova thread
+    """
+    if not hasattr(os, "register_at_fork"):
+        return
+
+    def after_in_child():
+        fresh: queue.Queue = queue.Queue(maxsize=maxsize)
+        handler.queue = fresh
+        listener.queue = fresh
+        listener._thread = None
+        listener.start()
+
+    os.register_at_fork(after_in_child=after_in_child)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger da aplicação (hierarquia "llm.*")"""
+    setup_logging()
+    return logging.getLogger(f"llm.{name}")
+
+
+def log_payload(text: Optional[str]) -> str:
+    """Conteúdo de prompt/resposta para log: omitido por padrão, truncado se LOG_PAYLOADS=true"""
+    if text is None:
+        return ""
+    if not LOG_PAYLOADS:
+        return f"<{len(text)} chars>"
+    return text[:LOG_PAYLOAD_CHARS]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tracing opcional com OpenTelemetry
+
+Um trace por chamada a /v1/chat/completions, com spans filhos para o modelo
+fine-tuned, o encode de embeddings, cada comando Redis e as chamadas ao Ollama.
+Exportação para um coletor OTLP local, para arquivo (JSON por linha) ou console.
+Sem OTEL_ENABLED=true ou sem o pacote `opentelemetry-sdk`, os spans são no-op.
+"""
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from src.structured_logging import get_logger
+
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "llm-api")
+OTEL_EXPORTER = os.getenv("OTEL_EXPORTER", "otlp").lower()          # otlp, file ou console
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
+OTEL_TRACE_FILE = os.getenv("OTEL_TRACE_FILE", "traces.jsonl")
+
+logger = get_logger("tracing")
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+    )
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+_tracer = None
+
+
+class _NoopSpan:
+    """Span vazio usado quando o tracing está desativado"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+if OTEL_AVAILABLE:
+    class FileSpanExporter(SpanExporter):
+        """Grava cada span finalizado como uma linha JSON"""
+
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans) -> "SpanExportResult":
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n")
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+
+def _build_exporter():
+    if OTEL_EXPORTER == "file":
+        return FileSpanExporter(OTEL_TRACE_FILE)
+    if OTEL_EXPORTER == "console":
+        return ConsoleSpanExporter()
+
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=OTEL_EXPORTER_OTLP_ENDPOINT, insecure=True)
+
+
+def setup_tracing():
+    """Configura o TracerProvider global (chamado uma vez na inicialização)"""
+    global _tracer
+    if _tracer is not None or not OTEL_ENABLED:
+        return
+    if not OTEL_AVAILABLE:
+        logger.warning("OTEL_ENABLED=true, mas opentelemetry-sdk não está instalado")
+        return
+
+    try:
+        provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+        provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("llm-api")
+        logger.info("Tracing OpenTelemetry ativo", extra={"exporter": OTEL_EXPORTER})
+    except Exception as e:
+        logger.error("Falha ao configurar tracing: %s", e)
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[dict] = None, headers=None):
+    """
+    Abre um span filho do span corrente (ou raiz, continuando um `traceparent`
+    recebido em `headers`)
+    """
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    context = extract(headers) if headers is not None else None
+    with _tracer.start_as_current_span(name, context=context, attributes=attributes or {}) as span:
+        yield span
+
+
+def current_span():
+    """Span ativo no contexto atual (no-op se o tracing estiver desativado)"""
+    if _tracer is None:
+        return _NOOP_SPAN
+    return trace.get_current_span()
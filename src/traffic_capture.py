@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Captura amostrada do tráfego da API para replay em benchmarks
+
+Cada requisição amostrada vira uma linha JSON compacta num log rotativo
+(arquivos antigos comprimidos com gzip): horário, modelo, mensagens (hash ou
+conteúdo), camada que respondeu e latência. A escrita acontece numa thread
+separada, fora do caminho da requisição. Com vários workers (gunicorn), cada
+processo filho grava (e rotaciona) o próprio arquivo, `traffic.<pid>.jsonl`:
+rotacionar o mesmo arquivo a partir de vários processos perde registros.
+Reproduzir com: python benchmarks/replay_traffic.py logs/traffic*.jsonl*
+"""
+import os
+import gzip
+import json
+import time
+import queue
+import random
+import atexit
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from src.structured_logging import get_logger
+
+TRAFFIC_CAPTURE_ENABLED = os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() == "true"
+TRAFFIC_CAPTURE_FILE = os.getenv("TRAFFIC_CAPTURE_FILE", "logs/traffic.jsonl")
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+TRAFFIC_CAPTURE_CONTENT = os.getenv("TRAFFIC_CAPTURE_CONTENT", "hash").lower()   # hash ou full
+TRAFFIC_CAPTURE_MAX_MB = float(os.getenv("TRAFFIC_CAPTURE_MAX_MB", "50"))
+TRAFFIC_CAPTURE_BACKUPS = int(os.getenv("TRAFFIC_CAPTURE_BACKUPS", "5"))
+
+logger = get_logger("traffic")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def tier_from_backend(backend: str) -> str:
+    """Camada que respondeu, a partir do rótulo de backend da API"""
+    if backend.startswith("fine-tuned"):
+        return "fine_tuned"
+    if backend.startswith("semantic-cache"):
+        return "semantic"
+    if backend.startswith("approximate-cache"):
+        return "approximate_cache"
+    if backend.startswith("fallback"):
+        return "fallback_model"
+    if backend.startswith("ollama"):
+        return "ollama"
+    return backend or "error"
+
+
+def worker_path(path: str, pid: int) -> str:
+    """Arquivo de captura de um worker: logs/traffic.jsonl -> logs/traffic.<pid>.jsonl"""
+    base = Path(path)
+    return str(base.with_name(f"{base.stem}.{pid}{base.suffix}"))
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class TrafficRecorder:
+    """Grava requisições amostradas em JSON lines com rotação por tamanho"""
+
+    def __init__(self, path: str = TRAFFIC_CAPTURE_FILE, enabled: bool = TRAFFIC_CAPTURE_ENABLED,
+                 sample_rate: float = TRAFFIC_CAPTURE_SAMPLE_RATE, content: str = TRAFFIC_CAPTURE_CONTENT):
+        self.path = path
+        self.base_path = path
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.full_content = content == "full"
+        self.recorded = 0
+        self._handler: Optional[QueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+        if enabled:
+            self._start()
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """Worker do gunicorn: a thread de escrita não sobrevive ao fork; recomeçar num arquivo próprio"""
+        atexit.unregister(self._listener.stop)
+        self.path = worker_path(self.base_path, os.getpid())
+        self._start()
+
+    def _start(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            self.path,
+            maxBytes=int(TRAFFIC_CAPTURE_MAX_MB * 1024 * 1024),
+            backupCount=TRAFFIC_CAPTURE_BACKUPS,
+            encoding="utf-8",
+            delay=True,   # O master pré-fork não chega a criar o arquivo
+        )
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = _gzip_rotator
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        self._handler = QueueHandler(queue.Queue(maxsize=10000))
+        self._listener = QueueListener(self._handler.queue, handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+        logger.info("Captura de tráfego ativa", extra={"path": self.path, "sample_rate": self.sample_rate})
+
+    def _messages(self, messages: List[Dict]) -> List[Dict]:
+        if self.full_content:
+            return [{"role": m["role"], "content": m["content"]} for m in messages]
+        # Só hash e tamanho: preserva a distribuição de repetições sem guardar conteúdo
+        return [{"role": m["role"], "h": text_hash(m["content"]), "len": len(m["content"])} for m in messages]
+
+    def record(self, request: Any, model: str, backend: str, latency: float, status: int = 200):
+        """
+        Registra uma requisição (se amostrada); nunca levanta exceção. `request` pode ser o
+        modelo pydantic: só é serializado quando a requisição entra na amostra
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        try:
+            if not isinstance(request, dict):
+                request = request.dict()
+            messages = request.get("messages", [])
+            entry = {
+                "ts": round(time.time(), 3),
+                "model": request.get("model"),
+                "routed": model,
+                "msgs": self._messages(messages),
+                "conv": text_hash(json.dumps([[m["role"], m["content"]] for m in messages], ensure_ascii=False)),
+                "temp": request.get("temperature"),
+                "max_tokens": request.get("max_tokens"),
+                "tier": tier_from_backend(backend),
+                "lat": round(latency, 4),
+                "status": status,
+            }
+            if request.get("session_id"):
+                entry["sid"] = text_hash(request["session_id"])
+            record = logging.makeLogRecord({"msg": json.dumps(entry, ensure_ascii=False, separators=(",", ":"))})
+            self._handler.queue.put_nowait(record)
+            self.recorded += 1
+        except queue.Full:
+            pass
+        except Exception as e:
+            logger.debug("Falha ao capturar tráfego: %s", e)
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path if self.enabled else None,
+            "sample_rate": self.sample_rate,
+            "content": "full" if self.full_content else "hash",
+            "recorded": self.recorded,
+        }
+
+
+def read_capture(paths: List[str]) -> List[Dict]:
+    """Lê capturas (.jsonl e rotacionadas .gz) ordenadas pelo horário"""
+    entries = []
+    for path in paths:
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+    entries.sort(key=lambda e: e["ts"])
+    return entries
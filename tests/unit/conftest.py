@@ -0,0 +1,36 @@
+"""
+Testes unitários com pytest (sem Ollama; Redis via fakeredis)
+
+    python -m pytest tests/unit -q
+
+Os scripts manuais desta pasta chamam a API em localhost ao serem importados
+e ficam fora da coleta do pytest (execute-os com `python tests/unit/<script>.py`).
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+collect_ignore = ["debug_redis.py", "test_auto_selection.py", "test_models.py", "test_simple.py", "test_simple_fixed.py"]
+
+
+@pytest.fixture
+def fake_redis():
+    """Fábrica de clientes fakeredis (texto ou binário) sobre o mesmo servidor em memória"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+
+    def client(decode_responses: bool = True):
+        return fakeredis.FakeAsyncRedis(server=server, decode_responses=decode_responses)
+
+    return client
+
+
+@pytest.fixture
+def run():
+    """Executa uma corrotina num loop novo (os clientes fakeredis devem ser criados dentro dela)"""
+    return asyncio.run
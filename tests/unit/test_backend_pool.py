@@ -0,0 +1,95 @@
+"""Seleção, afinidade e ejeção de backends Ollama (src/backend_pool.py)"""
+import time
+
+import pytest
+
+from src.backend_pool import BACKEND_EJECT_AFTER, BackendPool, OllamaBackend
+from src.error_budget import ERROR_BUDGET_MIN_REQUESTS
+
+MODEL = "deepseek-coder:6.7b"
+
+
+@pytest.fixture
+def pool():
+    pool = BackendPool("http://localhost:11434")
+    pool.backends = {
+        url: OllamaBackend(url=url, capacity=2)
+        for url in ("http://gpu1:11434", "http://gpu2:11434", "http://gpu3:11434")
+    }
+    pool.error_budget.enabled = True
+    return pool
+
+
+def test_selects_the_least_loaded_backend(pool):
+    pool.backends["http://gpu1:11434"].outstanding = 2
+    pool.backends["http://gpu2:11434"].outstanding = 1
+    assert pool.select(MODEL).url == "http://gpu3:11434"
+
+
+def test_load_is_relative_to_capacity(pool):
+    pool.backends["http://gpu1:11434"].capacity = 8
+    pool.backends["http://gpu1:11434"].outstanding = 2
+    for url in ("http://gpu2:11434", "http://gpu3:11434"):
+        pool.backends[url].outstanding = 1
+    assert pool.select(MODEL).url == "http://gpu1:11434"
+
+
+def test_affinity_key_is_stable_among_ties(pool):
+    chosen = {pool.select(MODEL, affinity_key="conversa-1").url for _ in range(20)}
+    assert len(chosen) == 1
+
+
+def test_announced_models_restrict_routing(pool):
+    pool.backends["http://gpu1:11434"].models = ["deepseek-coder:1.3b"]
+    pool.backends["http://gpu2:11434"].models = ["deepseek-coder:1.3b"]
+    assert pool.select(MODEL).url == "http://gpu3:11434"
+    assert pool.urls_for_model(MODEL) == ["http://gpu3:11434"]
+
+
+def test_exclude_skips_backends_already_tried(pool):
+    tried = ("http://gpu1:11434", "http://gpu2:11434")
+    assert pool.select(MODEL, exclude=tried).url == "http://gpu3:11434"
+    assert pool.select(MODEL, exclude=tried + ("http://gpu3:11434",)) is None
+
+
+def test_consecutive_failures_eject_the_backend(pool):
+    backend = pool.backends["http://gpu1:11434"]
+    for _ in range(BACKEND_EJECT_AFTER):
+        pool.record_failure(backend, MODEL)
+    assert not backend.available()
+    assert all(pool.select(MODEL).url != backend.url for _ in range(20))
+
+    backend.ejected_until = time.time() - 1
+    assert backend.available()
+
+
+def test_success_resets_the_failure_streak(pool):
+    backend = pool.backends["http://gpu1:11434"]
+    for _ in range(BACKEND_EJECT_AFTER - 1):
+        pool.record_failure(backend, MODEL)
+    pool.record_success(backend)
+    pool.record_failure(backend, MODEL)
+    assert backend.available()
+
+
+def test_open_error_budget_pair_is_avoided(pool):
+    for _ in range(ERROR_BUDGET_MIN_REQUESTS):
+        pool.error_budget.record("http://gpu1:11434", MODEL, ok=False)
+    assert all(pool.select(MODEL).url != "http://gpu1:11434" for _ in range(20))
+
+
+def test_exhausted_budget_everywhere_is_reported(pool):
+    for url in pool.backends:
+        for _ in range(ERROR_BUDGET_MIN_REQUESTS):
+            pool.error_budget.record(url, MODEL, ok=False)
+    assert pool.select(MODEL) is None
+    assert "orçamento de erros" in pool.unavailable_error(MODEL)
+    assert pool.select("deepseek-coder:1.3b") is not None
+
+
+def test_installed_models_come_from_the_polled_lists(pool):
+    pool.backends["http://gpu1:11434"].installed = ["deepseek-coder:1.3b"]
+    pool.backends["http://gpu1:11434"].sizes = {"deepseek-coder:1.3b": 776}
+    pool.backends["http://gpu2:11434"].installed = [MODEL]
+    pool.backends["http://gpu2:11434"].healthy = False
+    assert pool.installed_models() == {"deepseek-coder:1.3b": 776}
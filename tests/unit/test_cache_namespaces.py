@@ -0,0 +1,94 @@
+"""Resolução de namespaces do cache e limite de vagas (src/cache_namespaces.py)"""
+import time
+
+import pytest
+
+from src import cache_namespaces
+from src.cache_keys import DEFAULT_NAMESPACE
+from src.cache_namespaces import CACHE_NAMESPACE_HEADER, CacheNamespaces, allowed_namespaces, resolve_namespace
+from src.cache_policy import CachePolicy
+
+ALLOWED = allowed_namespaces("n8n,suporte", "vendas=64")
+
+
+@pytest.fixture
+def header_mode(monkeypatch):
+    monkeypatch.setattr(cache_namespaces, "CACHE_NAMESPACE_FROM_API_KEY", False)
+
+
+@pytest.fixture
+def api_key_mode(monkeypatch):
+    monkeypatch.setattr(cache_namespaces, "CACHE_NAMESPACE_FROM_API_KEY", True)
+
+
+def namespaces(**kwargs) -> CacheNamespaces:
+    return CacheNamespaces(CachePolicy(max_bytes=1000, sketch_width=1024), **kwargs)
+
+
+def test_allowed_set_includes_quotas_and_default():
+    assert ALLOWED == {"n8n", "suporte", "vendas", DEFAULT_NAMESPACE}
+    assert allowed_namespaces("*", "") is None
+
+
+def test_header_namespace_must_be_allowed(header_mode):
+    assert resolve_namespace({}, ALLOWED) == DEFAULT_NAMESPACE
+    assert resolve_namespace({CACHE_NAMESPACE_HEADER: " N8N "}, ALLOWED) == "n8n"
+    assert resolve_namespace({CACHE_NAMESPACE_HEADER: "vendas"}, ALLOWED) == "vendas"
+    with pytest.raises(ValueError):
+        resolve_namespace({CACHE_NAMESPACE_HEADER: "qualquer-um"}, ALLOWED)
+    assert resolve_namespace({CACHE_NAMESPACE_HEADER: "qualquer-um"}, None) == "qualquer-um"
+
+
+def test_invalid_header_is_rejected(header_mode):
+    with pytest.raises(ValueError):
+        resolve_namespace({CACHE_NAMESPACE_HEADER: "../outro"}, None)
+
+
+def test_api_key_decides_the_namespace(api_key_mode):
+    headers = {"Authorization": "Bearer segredo-1"}
+    namespace = resolve_namespace(headers, ALLOWED)
+    assert namespace.startswith("key-")
+    assert resolve_namespace({"Authorization": "Bearer segredo-2"}, ALLOWED) != namespace
+    assert resolve_namespace({**headers, CACHE_NAMESPACE_HEADER: namespace}, ALLOWED) == namespace
+    with pytest.raises(ValueError):
+        resolve_namespace({**headers, CACHE_NAMESPACE_HEADER: "n8n"}, ALLOWED)
+    assert resolve_namespace({}, ALLOWED) == DEFAULT_NAMESPACE
+
+
+def test_new_namespaces_get_their_own_quota():
+    spaces = namespaces(quotas={"vendas": 5000}, default_quota=2000)
+    assert spaces.policy("vendas").max_bytes == 5000
+    assert spaces.policy("n8n").max_bytes == 2000
+    assert spaces.policy(DEFAULT_NAMESPACE) is spaces.default_policy
+    assert spaces.policy("n8n").hits_key != spaces.default_policy.hits_key
+
+
+def test_limit_refuses_until_an_idle_namespace_is_reclaimed():
+    spaces = namespaces(quotas={}, max_namespaces=2, idle_seconds=60)
+    assert spaces.policy("a") is not None
+    assert spaces.policy("b") is None
+    assert spaces.refused == 1
+
+    spaces.last_used["a"] = time.time() - 120
+    assert spaces.policy("b") is not None
+    assert "a" not in spaces.policies and spaces.reclaimed == 1
+
+
+def test_namespace_with_pending_hits_is_not_reclaimed():
+    spaces = namespaces(quotas={}, max_namespaces=2, idle_seconds=60)
+    spaces.policy("a").count_hit("k")
+    spaces.last_used["a"] = time.time() - 120
+    assert spaces.policy("b") is None
+
+
+def test_refused_namespaces_do_not_accumulate_stats():
+    spaces = namespaces(quotas={}, max_namespaces=1)
+    spaces.record("fora", hit=True)
+    spaces.record(DEFAULT_NAMESPACE, hit=True)
+    assert spaces.lookups == {DEFAULT_NAMESPACE: 1}
+
+
+def test_worst_case_bytes_counts_only_reachable_namespaces():
+    spaces = namespaces(quotas={"vendas": 5000}, default_quota=2000, max_namespaces=10)
+    assert spaces.worst_case_bytes(from_api_key=False, allowed=ALLOWED) == 1000 + 5000 + 2 * 2000
+    assert spaces.worst_case_bytes(from_api_key=True, allowed=ALLOWED) == 1000 + 5000 + 8 * 2000
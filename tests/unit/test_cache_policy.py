@@ -0,0 +1,118 @@
+"""Admissão TinyLFU, orçamento em bytes e TTL adaptativo do cache (src/cache_policy.py)"""
+import time
+
+from src.cache_policy import CachePolicy
+from src.cache_records import pack_record, unpack_record
+
+
+def policy(**kwargs) -> CachePolicy:
+    options = {"ttl": 60, "max_ttl": 600, "extension": 60, "stale_ttl": 30, "max_bytes": 0, "min_freq": 1, "sketch_width": 1024}
+    options.update(kwargs)
+    return CachePolicy(**options)
+
+
+def test_infrequent_prompts_are_rejected(fake_redis, run):
+    cache = policy(min_freq=2)
+
+    async def scenario():
+        redis_client = fake_redis()
+        first, _ = await cache.admit(redis_client, "k1", 100)
+        cache.record_access("k1")
+        cache.record_access("k1")
+        second, _ = await cache.admit(redis_client, "k1", 100)
+        return first, second
+
+    assert run(scenario()) == (False, True)
+    assert cache.rejected == 1 and cache.admitted == 1
+
+
+def test_budget_evicts_a_less_frequent_victim(fake_redis, run):
+    cache = policy(max_bytes=1000)
+
+    async def scenario():
+        redis_client = fake_redis()
+        await cache.track(redis_client, "velha", "emb:velha", 800, time.time() + 60)
+        cache.record_access("nova")
+        cache.record_access("nova")
+        admitted, eviction = await cache.admit(redis_client, "nova", 400)
+        return admitted, eviction, int(await redis_client.get(cache.bytes_key))
+
+    admitted, eviction, used = run(scenario())
+    assert admitted
+    assert eviction.cache_keys == ["velha"] and eviction.embedding_keys == ["emb:velha"]
+    assert used == 0
+
+
+def test_budget_keeps_a_more_frequent_victim(fake_redis, run):
+    cache = policy(max_bytes=1000)
+
+    async def scenario():
+        redis_client = fake_redis()
+        await cache.track(redis_client, "popular", "emb:popular", 800, time.time() + 60)
+        for _ in range(5):
+            cache.record_access("popular")
+        admitted, eviction = await cache.admit(redis_client, "nova", 400)
+        return admitted, eviction, await redis_client.zscore(cache.entries_key, "popular")
+
+    admitted, eviction, score = run(scenario())
+    assert not admitted and not eviction.cache_keys
+    assert score is not None
+
+
+def test_on_hit_extends_fresh_and_hard_ttl(fake_redis, run):
+    cache = policy()
+    now = time.time()
+    info = {"response": "ok", "timestamp": now, "fresh_until": now + 60}
+
+    async def scenario():
+        redis_client, records = fake_redis(), fake_redis(decode_responses=False)
+        await records.set("k", pack_record(info))
+        cache.count_hit("k")
+        cache.count_hit("k")
+        extended = await cache.on_hit(redis_client, records, "k", info)
+        return extended, unpack_record(await records.get("k")), await records.ttl("k")
+
+    (fresh_until, expires_at, embedding_key), stored, ttl = run(scenario())
+    assert fresh_until == now + 60 + 2 * 60
+    assert expires_at == fresh_until + 30
+    assert embedding_key is None
+    assert stored["hits"] == 2 and stored["fresh_until"] == fresh_until
+    assert ttl > 180
+    assert not cache.pending_hits
+
+
+def test_capped_entry_is_not_reread_until_it_expires(fake_redis, run):
+    cache = policy(max_ttl=60)
+    now = time.time()
+    info = {"response": "ok", "timestamp": now - 30, "fresh_until": now + 30}
+
+    async def scenario():
+        cache.count_hit("k")
+        return await cache.on_hit(fake_redis(), fake_redis(decode_responses=False), "k", info)
+
+    assert run(scenario()) is None
+    assert not cache.needs_extension("k", now + 30)
+
+
+def test_needs_extension_only_near_the_end_of_freshness():
+    cache = policy()
+    assert not cache.needs_extension("k", time.time() + 300)
+    assert cache.needs_extension("k", time.time() + 10)
+    assert not policy(extension=0).needs_extension("k", time.time() + 10)
+
+
+def test_hits_are_flushed_in_one_batch(fake_redis, run):
+    cache = policy()
+    for _ in range(50):
+        cache.count_hit("a")
+    cache.count_hit("b")
+
+    async def scenario():
+        redis_client = fake_redis()
+        sent = await cache.flush_hits(redis_client)
+        again = await cache.flush_hits(redis_client)
+        return sent, again, await redis_client.hgetall(cache.hits_key)
+
+    sent, again, hits = run(scenario())
+    assert (sent, again) == (2, 0)
+    assert hits == {"a": "50", "b": "1"}
@@ -0,0 +1,75 @@
+"""Orçamento de erros por (modelo, backend): abrir, testar e fechar (src/error_budget.py)"""
+import time
+
+from src.error_budget import ERROR_BUDGET_COOLDOWN, ERROR_BUDGET_MIN_REQUESTS, ErrorBudget
+
+BACKEND = "http://gpu1:11434"
+MODEL = "deepseek-coder:6.7b"
+
+
+def trip(budget: ErrorBudget):
+    for _ in range(ERROR_BUDGET_MIN_REQUESTS):
+        budget.record(BACKEND, MODEL, ok=False)
+
+
+def reopen(budget: ErrorBudget):
+    """Simula o fim do intervalo aberto"""
+    budget.pairs[(BACKEND, MODEL)].open_until = time.time() - 1
+
+
+def test_opens_after_error_rate_with_minimum_requests():
+    budget = ErrorBudget(enabled=True)
+    budget.record(BACKEND, MODEL, ok=False)
+    assert not budget.is_open(BACKEND, MODEL)
+    trip(budget)
+    assert budget.is_open(BACKEND, MODEL)
+    # Só o par com falhas: outro modelo no mesmo backend segue liberado
+    assert not budget.is_open(BACKEND, "deepseek-coder:1.3b")
+
+
+def test_successes_keep_the_pair_closed():
+    budget = ErrorBudget(enabled=True)
+    for ok in (True, True, True, False):
+        budget.record(BACKEND, MODEL, ok=ok)
+    assert not budget.is_open(BACKEND, MODEL)
+
+
+def test_single_probe_after_cooldown_then_close_on_success():
+    budget = ErrorBudget(enabled=True)
+    trip(budget)
+    reopen(budget)
+    assert not budget.is_open(BACKEND, MODEL)
+
+    budget.acquire(BACKEND, MODEL)          # Chamada de teste em andamento
+    assert budget.is_open(BACKEND, MODEL)   # Nenhuma outra passa enquanto isso
+
+    budget.record(BACKEND, MODEL, ok=True)
+    assert not budget.is_open(BACKEND, MODEL)
+    assert budget.pairs[(BACKEND, MODEL)].cooldown == ERROR_BUDGET_COOLDOWN
+
+
+def test_failed_probe_reopens_with_doubled_cooldown():
+    budget = ErrorBudget(enabled=True)
+    trip(budget)
+    reopen(budget)
+    budget.acquire(BACKEND, MODEL)
+    budget.record(BACKEND, MODEL, ok=False)
+    state = budget.pairs[(BACKEND, MODEL)]
+    assert budget.is_open(BACKEND, MODEL)
+    assert state.cooldown == 2 * ERROR_BUDGET_COOLDOWN
+    assert state.open_until > time.time() + ERROR_BUDGET_COOLDOWN
+
+
+def test_cancelled_probe_is_released():
+    budget = ErrorBudget(enabled=True)
+    trip(budget)
+    reopen(budget)
+    budget.acquire(BACKEND, MODEL)
+    budget.release(BACKEND, MODEL)
+    assert not budget.is_open(BACKEND, MODEL)
+
+
+def test_disabled_budget_never_opens():
+    budget = ErrorBudget(enabled=False)
+    trip(budget)
+    assert not budget.is_open(BACKEND, MODEL)
@@ -0,0 +1,77 @@
+"""Fusão léxica + densa e limiar adaptativo do cache semântico (src/hybrid_retrieval.py)"""
+import numpy as np
+import pytest
+
+from src.hybrid_retrieval import (
+    NOISE_MIN_SAMPLES, SEMANTIC_LEXICAL_WEIGHT, SEMANTIC_SHORT_PROMPT_PENALTY, SEMANTIC_THRESHOLD_MAX,
+    AdaptiveThreshold, LexicalIndex, fuse, tokenize,
+)
+
+
+def calibrated(noise: float, max_drop: float = 0.0, model: str = "m") -> AdaptiveThreshold:
+    threshold = AdaptiveThreshold(enabled=True, max_drop=max_drop)
+    rng = np.random.default_rng(0)
+    threshold.observe(model, noise + rng.normal(0, 0.01, NOISE_MIN_SAMPLES + 10))
+    return threshold
+
+
+def test_fuse_never_penalizes_missing_lexical_overlap():
+    dense = np.array([0.80, 0.80, 0.80])
+    lexical = np.array([0.0, 0.5, 1.0])
+    fused = fuse(dense, lexical)
+    assert fused[0] == pytest.approx(0.80)
+    assert fused[1] == pytest.approx(0.80)
+    assert fused[2] == pytest.approx(0.80 + SEMANTIC_LEXICAL_WEIGHT * 0.5)
+
+
+def test_fuse_is_capped_and_passes_dense_through_without_lexical():
+    assert fuse(np.array([0.99]), np.array([1.0]))[0] <= 1.0
+    dense = np.array([0.3, 0.7])
+    assert fuse(dense, None) is dense
+
+
+def test_threshold_is_base_until_enough_noise_samples():
+    threshold = AdaptiveThreshold(enabled=True)
+    threshold.observe("m", np.full(NOISE_MIN_SAMPLES - 1, 0.9))
+    assert threshold.threshold("m", 0.85, query_terms=10) == 0.85
+
+
+def test_low_noise_never_lowers_the_requested_threshold_by_default():
+    # Ruído ~0,53: sem MAX_DROP, prompts longos continuam exigindo o limiar pedido
+    threshold = calibrated(0.53)
+    assert threshold.threshold("m", 0.85, query_terms=10) == pytest.approx(0.85)
+    assert threshold.threshold("m", 0.75, query_terms=10) == pytest.approx(0.75)
+
+
+def test_high_noise_raises_the_threshold_up_to_the_ceiling():
+    threshold = calibrated(0.84)
+    raised = threshold.threshold("m", 0.85, query_terms=10)
+    assert 0.85 < raised <= SEMANTIC_THRESHOLD_MAX
+    assert calibrated(0.99).threshold("m", 0.85, query_terms=10) == pytest.approx(SEMANTIC_THRESHOLD_MAX)
+
+
+def test_short_prompts_pay_the_penalty():
+    threshold = calibrated(0.53)
+    assert threshold.threshold("m", 0.85, query_terms=2) == pytest.approx(0.85 + SEMANTIC_SHORT_PROMPT_PENALTY)
+
+
+def test_lowering_is_opt_in_and_only_for_long_prompts():
+    threshold = calibrated(0.53, max_drop=0.1)
+    assert threshold.threshold("m", 0.85, query_terms=10) == pytest.approx(0.75)
+    assert threshold.threshold("m", 0.85, query_terms=2) == pytest.approx(0.85 + SEMANTIC_SHORT_PROMPT_PENALTY)
+
+
+def test_disabled_threshold_returns_base():
+    threshold = AdaptiveThreshold(enabled=False)
+    threshold.observe("m", np.full(NOISE_MIN_SAMPLES + 10, 0.95))
+    assert threshold.threshold("m", 0.85, query_terms=2) == 0.85
+
+
+def test_lexical_index_scores_shared_terms():
+    index = LexicalIndex()
+    index.add(0, "trocar o óleo da moto")
+    index.add(1, "trocar o pneu da moto")
+    index.add(2, "relatório financeiro do trimestre")
+    scores, best = index.scores(tokenize("óleo da moto"), 3)
+    assert best > 0
+    assert scores[0] > scores[1] > scores[2] == 0
@@ -0,0 +1,90 @@
+"""Cache negativo e modelo reserva na geração (generate_with_fallback em src/simple_llm_server.py)"""
+import pytest
+
+from src import simple_llm_server as server
+from src.negative_cache import NegativeCache
+
+MODEL = "deepseek-coder:6.7b"
+FALLBACK = "deepseek-coder:1.3b"
+
+
+@pytest.fixture
+def backend(monkeypatch, fake_redis):
+    """Substitui o pool por respostas programadas; devolve o histórico de chamadas por modelo"""
+    calls = []
+    replies = {}
+
+    async def generate_for_request(request, prompt, model):
+        calls.append(model)
+        return replies[model]
+
+    monkeypatch.setattr(server, "generate_for_request", generate_for_request)
+    monkeypatch.setattr(server, "fallback_models", {MODEL: FALLBACK})
+    monkeypatch.setattr(server, "negative_cache", NegativeCache(ttl=30))
+    monkeypatch.setattr(server, "FALLBACK_SIMILARITY", 0)
+    monkeypatch.setattr(server, "redis_client", None)
+    return calls, replies
+
+
+def request() -> server.ChatCompletionRequest:
+    return server.ChatCompletionRequest(model=MODEL, messages=[server.ChatMessage(role="user", content="quanto custa?")])
+
+
+def generate(fake_redis, run, namespace="a"):
+    async def scenario():
+        server.redis_client = fake_redis()
+        return await server.generate_with_fallback(request(), "quanto custa?", MODEL, namespace)
+    return run(scenario())
+
+
+def test_answer_that_looks_like_an_error_is_served(backend, fake_redis, run):
+    calls, replies = backend
+    replies[MODEL] = ("O plano custa R$ 500; o erro 404 some após o deploy.", None)
+    text, source = generate(fake_redis, run)
+    assert source == f"ollama-{MODEL}"
+    assert "R$ 500" in text
+    assert calls == [MODEL]
+    assert server.negative_cache.stored == 0
+
+
+def test_pool_error_is_memoized_and_falls_back(backend, fake_redis, run):
+    calls, replies = backend
+    replies[MODEL] = ("", "Erro na chamada do Ollama: 503")
+    replies[FALLBACK] = ("resposta do reserva", None)
+
+    assert generate(fake_redis, run) == ("resposta do reserva", f"fallback-{FALLBACK}")
+    assert generate(fake_redis, run) == ("resposta do reserva", f"fallback-{FALLBACK}")
+    # A segunda requisição pula o modelo que acabou de falhar
+    assert calls == [MODEL, FALLBACK, FALLBACK]
+    assert server.negative_cache.hits == 1
+
+
+def test_memoized_error_is_per_namespace(backend, fake_redis, run):
+    calls, replies = backend
+    replies[MODEL] = ("", "Erro na chamada do Ollama: 503")
+    replies[FALLBACK] = ("resposta do reserva", None)
+    generate(fake_redis, run, namespace="a")
+
+    replies[MODEL] = ("resposta do modelo pedido", None)
+    assert generate(fake_redis, run, namespace="b") == ("resposta do modelo pedido", f"ollama-{MODEL}")
+
+
+def test_error_is_returned_when_fallback_also_fails(backend, fake_redis, run):
+    calls, replies = backend
+    replies[MODEL] = ("", "Erro na chamada do Ollama: 503")
+    replies[FALLBACK] = ("", "Erro ao conectar com Ollama: nenhum backend disponível")
+    assert generate(fake_redis, run) == ("Erro na chamada do Ollama: 503", f"ollama-{MODEL}")
+
+
+def test_negative_cache_entries_expire(fake_redis, run):
+    cache = NegativeCache(ttl=30)
+
+    async def scenario():
+        redis_client = fake_redis()
+        await cache.put(redis_client, "k", "Erro na chamada do Ollama: 503")
+        return await cache.get(redis_client, "k"), await redis_client.ttl("llm_cache:error:k")
+
+    error, ttl = run(scenario())
+    assert error == "Erro na chamada do Ollama: 503"
+    assert 0 < ttl <= 30
+    assert run(NegativeCache(ttl=0).get(None, "k")) is None